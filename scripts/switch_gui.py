@@ -5,6 +5,7 @@ import sys
 from PyQt5.QtWidgets import QApplication
 
 import switchtool.ui as switch_ui
+from switchtool import sdfconfig
 from switchtool.switch.switch import SWITCH_NAME_TO_SURVEYER
 
 """
@@ -48,6 +49,12 @@ def main():
         help="Timeout for switch refresh (hours, default 1)",
     )
 
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Forget the cached sdfconfig information and look everything up again",
+    )
+
     parser.add_argument(
         "-v",
         "--verbose",
@@ -70,6 +77,8 @@ def main():
     # In the terminal
     if log_level < logging.INFO:
         logging.basicConfig(level=log_level)
+    if kwargs["refresh"]:
+        sdfconfig.refresh()
     creds = read_creds()
 
     # Launch GUI
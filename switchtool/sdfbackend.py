@@ -0,0 +1,317 @@
+"""
+Where the sdfconfig functions get their answers from.
+
+CliBackend runs the sdfconfig command, as the tool always has.  For machines
+off the SLAC network, or where sdfconfig is slow, an inventory of sdfconfig
+records can stand in for it:
+
+* InventoryBackend answers from a JSON file of records, like the output of
+  "sdfconfig search --json", or a CSV file with a header of the same fields.
+
+* FakeBackend holds its records in memory, and waits a configurable time on
+  each call like sdfconfig would, for testing and benchmarking.
+
+The backend is chosen with the SWITCHTOOL_SDFCONFIG_BACKEND environment
+variable, see make_backend, or with sdfconfig.set_backend.
+"""
+
+import abc
+import csv
+import json
+import os
+import re
+import subprocess
+import threading
+import time
+
+BACKEND = os.environ.get("SWITCHTOOL_SDFCONFIG_BACKEND", "cli")
+
+# Seconds to take sdfconfig as unusable for after it said so, before running
+# it again
+CONFIG_ERROR_TTL = 60
+
+# What sdfconfig says on stderr when it can't be used at all, rather than
+# that it found nothing
+_CONFIG_ERROR = re.compile(
+    r"not configured|credential|authenticat|unauthori[sz]ed|permission denied"
+    r"|token|kerberos|ticket",
+    re.IGNORECASE,
+)
+
+# What sdfconfig says when it looked and found nothing
+_NOT_FOUND = re.compile(
+    r"not found|no match|no such|no entr|no record|does not exist", re.IGNORECASE
+)
+
+
+class NotFoundError(RuntimeError):
+    """
+    sdfconfig has no entry for what was looked up.
+    """
+
+
+class NotConfiguredError(RuntimeError):
+    """
+    sdfconfig can't be used at all, e.g. it isn't configured for the user.
+    """
+
+
+def short_name(name):
+    """
+    The hostname of a host entry, without the domain if it has one.
+    """
+    name = name.strip()
+    return name.rsplit(".", 1)[0] if "." in name else name
+
+
+def macs_of(record):
+    """
+    The lower case MAC addresses of an sdfconfig record, which may list
+    several in its "Ethernet Address".
+    """
+    field = record.get("Ethernet Address") or ""
+    return field.replace(",", " ").lower().split()
+
+
+class Backend(abc.ABC):
+    """
+    The lookups the sdfconfig functions need.
+
+    Each raises NotFoundError when there is nothing to find,
+    NotConfiguredError when the backend can't be used, and RuntimeError when
+    a lookup failed otherwise.  cached says whether the
+    answers should be kept in the sdfcache on disk.
+    """
+
+    cached = False
+
+    @abc.abstractmethod
+    def host_for_mac(self, mac_addr):
+        """
+        The hostname of a MAC address.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def hosts_for_macs(self, mac_addrs):
+        """
+        {lower case mac_addr: hostname} of the MAC addresses found.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def view(self, hostname):
+        """
+        The record of a host, as a dictionary.
+        """
+        raise NotImplementedError
+
+    @abc.abstractmethod
+    def records_for_subnets(self, subnets):
+        """
+        The records of every host on subnets.
+        """
+        raise NotImplementedError
+
+
+class CliBackend(Backend):
+    """
+    Run the sdfconfig command.
+
+    When sdfconfig says it isn't configured, or isn't there, every lookup
+    fails at once for CONFIG_ERROR_TTL seconds rather than running it again.
+    Only an empty answer, or sdfconfig saying it found nothing, is a
+    NotFoundError, any other failure is a RuntimeError that isn't remembered.
+    """
+
+    cached = True
+
+    def __init__(self, command="sdfconfig"):
+        self.command = command
+        self._config_error_until = 0.0
+
+    def reset(self):
+        """
+        Try running sdfconfig again, even if it recently failed.
+        """
+        self._config_error_until = 0.0
+
+    def _run(self, *args):
+        """
+        Run sdfconfig, returning its output.
+        """
+        if time.monotonic() < self._config_error_until:
+            raise NotConfiguredError("sdfconfig is not configured for user")
+        try:
+            proc = subprocess.run(
+                [self.command, *args], capture_output=True, universal_newlines=True
+            )
+        except OSError as exc:
+            self._config_error_until = time.monotonic() + CONFIG_ERROR_TTL
+            raise NotConfiguredError("Unable to run sdfconfig") from exc
+        if proc.returncode == 0:
+            return proc.stdout
+        if _CONFIG_ERROR.search(proc.stderr):
+            self._config_error_until = time.monotonic() + CONFIG_ERROR_TTL
+            raise NotConfiguredError("sdfconfig is not configured for user")
+        output = (proc.stderr.strip() or proc.stdout.strip()).splitlines()
+        if not output or _NOT_FOUND.search(output[-1]):
+            raise NotFoundError("sdfconfig {:} found nothing".format(" ".join(args)))
+        raise RuntimeError(
+            "sdfconfig {:} failed: {:}".format(" ".join(args), output[-1])
+        )
+
+    def _answer(self, *args):
+        """
+        The output of sdfconfig, raising NotFoundError if there is none.
+        """
+        info = self._run(*args)
+        if not info.strip():
+            raise NotFoundError("sdfconfig {:} found nothing".format(" ".join(args)))
+        return info
+
+    def _records(self, *args):
+        info = self._run(*args)
+        records = json.loads(info) if info.strip() else []
+        return [records] if isinstance(records, dict) else records
+
+    def host_for_mac(self, mac_addr):
+        fqdn = self._answer("search", "--brief", "--type", "mac", mac_addr)
+        return fqdn.strip().rsplit(".", 1)[0]
+
+    def hosts_for_macs(self, mac_addrs):
+        found = {}
+        for record in self._records("search", "--json", "--type", "mac", *mac_addrs):
+            host = short_name(record["Name"])
+            for mac_addr in macs_of(record):
+                found[mac_addr] = host
+        return found
+
+    def view(self, hostname):
+        return json.loads(self._answer("view", "--json", f"{hostname}.pcdsn"))
+
+    def records_for_subnets(self, subnets):
+        return self._records("search", "--json", "--type", "subnet", *subnets)
+
+
+class InventoryBackend(Backend):
+    """
+    Answer from a list of sdfconfig records.
+
+    Parameters
+    ----------
+    records : list[dict] or str
+        The records, or a JSON or CSV file of them.  Each has the "Name" of
+        its host, and may have its "Ethernet Address", "Subnet Name",
+        "Description" and any other fields of "sdfconfig view".
+    """
+
+    def __init__(self, records=()):
+        if isinstance(records, str):
+            records = self.read(records)
+        self._hosts = {}
+        self._macs = {}
+        for record in records:
+            host = short_name(record["Name"])
+            self._hosts[host] = dict(record)
+            for mac_addr in macs_of(record):
+                self._macs[mac_addr] = host
+
+    @staticmethod
+    def read(path):
+        """
+        The records of a JSON or CSV inventory file.
+        """
+        with open(path, newline="") as f:
+            if path.lower().endswith(".csv"):
+                return list(csv.DictReader(f))
+            records = json.load(f)
+        return [records] if isinstance(records, dict) else records
+
+    def host_for_mac(self, mac_addr):
+        try:
+            return self._macs[mac_addr.lower()]
+        except KeyError:
+            raise NotFoundError("No entry for {:}".format(mac_addr)) from None
+
+    def hosts_for_macs(self, mac_addrs):
+        macs = (mac_addr.lower() for mac_addr in mac_addrs)
+        return {
+            mac_addr: self._macs[mac_addr]
+            for mac_addr in macs
+            if mac_addr in self._macs
+        }
+
+    def view(self, hostname):
+        try:
+            return dict(self._hosts[hostname])
+        except KeyError:
+            raise NotFoundError("No entry for {:}".format(hostname)) from None
+
+    def records_for_subnets(self, subnets):
+        subnets = set(subnets)
+        return [
+            dict(record)
+            for record in self._hosts.values()
+            if record.get("Subnet Name") in subnets
+        ]
+
+
+class FakeBackend(InventoryBackend):
+    """
+    An inventory in memory, that takes latency seconds to answer each call.
+
+    The number of calls is counted in calls, to compare how many lookups
+    different ways of resolving a switch need.
+    """
+
+    def __init__(self, records=(), latency=0.0):
+        super().__init__(records)
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def host_for_mac(self, mac_addr):
+        self._call()
+        return super().host_for_mac(mac_addr)
+
+    def hosts_for_macs(self, mac_addrs):
+        self._call()
+        return super().hosts_for_macs(mac_addrs)
+
+    def view(self, hostname):
+        self._call()
+        return super().view(hostname)
+
+    def records_for_subnets(self, subnets):
+        self._call()
+        return super().records_for_subnets(subnets)
+
+
+def make_backend(spec=None):
+    """
+    Create the backend described by spec, BACKEND by default:
+
+    * "cli" runs sdfconfig.
+    * "file:PATH" answers from the JSON or CSV inventory at PATH.
+    * "fake", "fake:SECONDS" or "fake:SECONDS:PATH" is a FakeBackend, empty or
+      with the inventory at PATH, taking SECONDS to answer each call.
+    """
+    spec = BACKEND if spec is None else spec
+    kind, _, rest = spec.partition(":")
+    if kind == "cli":
+        return CliBackend()
+    if kind == "file" and rest:
+        return InventoryBackend(rest)
+    if kind == "fake":
+        latency, _, path = rest.partition(":")
+        return FakeBackend(
+            InventoryBackend.read(path) if path else (), float(latency or 0)
+        )
+    raise ValueError("Unknown sdfconfig backend {!r}".format(spec))
@@ -0,0 +1,194 @@
+"""
+A cache of sdfconfig answers on disk, shared by every switchtool process.
+
+Each sdfconfig call forks a subprocess, and the in-process caches start out
+empty for every GUI launch and script.  The answers are kept in a SQLite
+database instead, so a warm start can resolve a whole switch without running
+sdfconfig at all.  Each entry is kept for the TTL of its kind.
+
+The database is CACHE_FILE, which can be moved with the
+SWITCHTOOL_SDFCONFIG_CACHE environment variable, or turned off by setting it
+to an empty string.  sdfconfig.refresh() throws cached answers away.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+module_logger = logging.getLogger(__name__)
+
+CACHE_FILE = os.environ.get(
+    "SWITCHTOOL_SDFCONFIG_CACHE",
+    os.path.join(
+        os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"),
+        "switchtool",
+        "sdfconfig.sqlite",
+    ),
+)
+
+# Seconds an answer is kept for, by kind: hostnames of MAC addresses,
+# sdfconfig view records of hosts, and the MAC addresses and hosts sdfconfig
+# found nothing for, which are more likely to be added soon
+TTL = {
+    "mac": 24 * 3600,
+    "view": 24 * 3600,
+    "missing": 10 * 60,
+}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    expires REAL NOT NULL,
+    PRIMARY KEY (kind, key)
+)
+"""
+
+
+class SdfconfigCache:
+    """
+    sdfconfig answers in a SQLite database, by kind and key.
+
+    Several processes can use the database at once: it is in WAL mode, so
+    readers don't wait on a writer, and writers wait their turn for up to
+    timeout seconds.  Each thread gets its own connection.  Errors of the
+    database are logged and treated as misses, the cache is never a reason
+    for a lookup to fail.
+
+    Parameters
+    ----------
+    path : str
+        The database file, created if needed.
+
+    ttl : dict, optional
+        {kind: seconds} to keep answers for, TTL by default.
+
+    timeout : float, optional
+        Seconds to wait for another process writing to the database.
+    """
+
+    def __init__(self, path, ttl=None, timeout=5.0):
+        self.path = path
+        self.ttl = dict(TTL if ttl is None else ttl)
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as db:
+            db.execute("DELETE FROM entries WHERE expires <= ?", (time.time(),))
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(_SCHEMA)
+            self._local.db = db
+        return db
+
+    def get_many(self, kind, keys):
+        """
+        The {key: value} of the keys with an answer that hasn't expired.
+        """
+        keys = list(keys)
+        found = {}
+        try:
+            db = self._connect()
+            # Within the limit on the parameters of a statement
+            for i in range(0, len(keys), 500):
+                batch = keys[i : i + 500]
+                rows = db.execute(
+                    "SELECT key, value FROM entries WHERE kind = ? AND expires > ?"
+                    " AND key IN (%s)" % ", ".join("?" * len(batch)),
+                    [kind, time.time()] + batch,
+                )
+                found.update((key, json.loads(value)) for key, value in rows)
+        except sqlite3.Error as exc:
+            module_logger.warning("Unable to read sdfconfig cache: %s", exc)
+        return found
+
+    def get(self, kind, key):
+        """
+        The answer for key, raising KeyError if there is none.
+        """
+        return self.get_many(kind, [key])[key]
+
+    def put_many(self, kind, items, ttl=None):
+        """
+        Keep the {key: value} answers in items, for ttl seconds or the TTL of
+        their kind.
+        """
+        expires = time.time() + (self.ttl[kind] if ttl is None else ttl)
+        try:
+            with self._connect() as db:
+                db.executemany(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?)",
+                    [
+                        (kind, key, json.dumps(value), expires)
+                        for key, value in items.items()
+                    ],
+                )
+        except sqlite3.Error as exc:
+            module_logger.warning("Unable to write sdfconfig cache: %s", exc)
+
+    def put(self, kind, key, value, ttl=None):
+        self.put_many(kind, {key: value}, ttl=ttl)
+
+    def invalidate(self, kind=None, keys=None):
+        """
+        Throw away the answers for keys of a kind, all of a kind, or all.
+        """
+        try:
+            with self._connect() as db:
+                if kind is None:
+                    db.execute("DELETE FROM entries")
+                elif keys is None:
+                    db.execute("DELETE FROM entries WHERE kind = ?", (kind,))
+                else:
+                    db.executemany(
+                        "DELETE FROM entries WHERE kind = ? AND key = ?",
+                        [(kind, key) for key in keys],
+                    )
+        except sqlite3.Error as exc:
+            module_logger.warning("Unable to clear sdfconfig cache: %s", exc)
+
+    def __len__(self):
+        try:
+            (count,) = (
+                self._connect()
+                .execute(
+                    "SELECT COUNT(*) FROM entries WHERE expires > ?", (time.time(),)
+                )
+                .fetchone()
+            )
+        except sqlite3.Error:
+            return 0
+        return count
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """
+    The SdfconfigCache at CACHE_FILE, None if it is turned off or can't be
+    opened.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None and CACHE_FILE:
+            try:
+                _cache = SdfconfigCache(CACHE_FILE)
+            except (OSError, sqlite3.Error) as exc:
+                module_logger.warning(
+                    "Not caching sdfconfig in %s: %s", CACHE_FILE, exc
+                )
+                _cache = False
+        # False when turned off, the cache itself may be empty
+        return _cache if _cache is not False else None
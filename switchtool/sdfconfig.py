@@ -5,32 +5,260 @@ for the core features of the switchtool gui.
 This does not implement every feature from the older
 netconfig module.
 
+The answers come from the sdfconfig command, or a stand-in for it, see
+sdfbackend.  They are also kept on disk by sdfcache, for the next process to
+use, and can come from a snapshot of many records instead, see use_index.
+
 The netconfig tool is deprecated and pending removal
 at time of writing.
 """
 
+import concurrent.futures
 import functools
-import json
-import subprocess
+import logging
+import threading
+import time
+
+from .sdfbackend import NotConfiguredError, NotFoundError, make_backend
+from .sdfcache import TTL, get_cache
+
+module_logger = logging.getLogger(__name__)
+
+# Hostnames found for MAC addresses, by get_host_for_mac and get_hosts_for_macs
+_HOST_FOR_MAC = {}
+
+# The most MAC addresses given to a single sdfconfig search
+SEARCH_BATCH = 200
+
+# Whether the backend in use searches for many MAC addresses at once, until
+# that fails, see get_hosts_for_macs
+_BATCH_SEARCH = True
+
+# The most sdfconfig lookups run at the same time
+LOOKUP_JOBS = 8
+
+# The sdfbackend.Backend in use, see get_backend
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+
+# {(kind, key): time.monotonic()} until which sdfconfig is taken to have
+# nothing for the key, so unknown MAC addresses and hosts aren't searched for
+# on every refresh
+_NOT_FOUND = {}
+
+
+def get_backend():
+    """
+    The sdfbackend.Backend answering the lookups, made from
+    sdfbackend.BACKEND when first needed.
+    """
+    global _BACKEND
+    with _BACKEND_LOCK:
+        if _BACKEND is None:
+            _BACKEND = make_backend()
+        return _BACKEND
+
+
+def set_backend(backend):
+    """
+    Answer the lookups with an sdfbackend.Backend from now on.
+
+    What was learned from the previous backend is forgotten, in this process.
+    """
+    global _BACKEND, _BATCH_SEARCH
+    with _BACKEND_LOCK:
+        _BACKEND = backend
+    _BATCH_SEARCH = True
+    _HOST_FOR_MAC.clear()
+    _NOT_FOUND.clear()
+    sdfconfig_view.cache_clear()
+
+
+def _get_cache():
+    """
+    The disk cache, if the backend is worth caching.
+    """
+    return get_cache() if get_backend().cached else None
+
+
+def _not_found(kind, keys):
+    """
+    The keys of a kind that sdfconfig recently found nothing for.
+    """
+    now = time.monotonic()
+    known = {key for key in keys if _NOT_FOUND.get((kind, key), 0) > now}
+    rest = [key for key in keys if key not in known]
+    cache = _get_cache()
+    if cache is not None and rest:
+        for key, expires in cache.get_many("missing-" + kind, rest).items():
+            _NOT_FOUND[(kind, key)] = now + expires - time.time()
+            known.add(key)
+    return known
+
+
+def _note_not_found(kind, keys):
+    """
+    Remember that sdfconfig found nothing for keys, for TTL["missing"].
+    """
+    keys = list(keys)
+    if not keys:
+        return
+    ttl = TTL["missing"]
+    for key in keys:
+        _NOT_FOUND[(kind, key)] = time.monotonic() + ttl
+    cache = _get_cache()
+    if cache is not None:
+        expires = time.time() + ttl
+        cache.put_many("missing-" + kind, dict.fromkeys(keys, expires), ttl=ttl)
+
+
+def _map_lookups(func, keys):
+    """
+    Call func(key) for each of keys, LOOKUP_JOBS at a time, so the waits on
+    the sdfconfig subprocesses overlap.
+
+    Returns the results in the order of keys, raising the first exception in
+    that order if any call raised.
+    """
+    keys = list(keys)
+    if len(keys) < 2:
+        return [func(key) for key in keys]
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=min(LOOKUP_JOBS, len(keys))
+    ) as executor:
+        return list(executor.map(func, keys))
+
+
+# The sdfindex.SdfconfigIndex to answer from, see use_index
+_INDEX = None
+_INDEX_FALLBACK = True
+_UNKNOWN = object()
+
+
+def use_index(index, fallback=True):
+    """
+    Answer lookups from an sdfindex.SdfconfigIndex, or stop with None.
+
+    With fallback, what the index doesn't know is still looked up with
+    sdfconfig, otherwise it is treated as not found.
+    """
+    global _INDEX, _INDEX_FALLBACK
+    _INDEX, _INDEX_FALLBACK = index, fallback
+
+
+def _from_index(lookup, key):
+    """
+    The answer of the index in use, _UNKNOWN if sdfconfig has to be asked.
+    """
+    index = _INDEX
+    if index is None:
+        return _UNKNOWN
+    try:
+        return getattr(index, lookup)(key)
+    except KeyError:
+        if _INDEX_FALLBACK:
+            return _UNKNOWN
+        raise RuntimeError("{:} is not in the sdfconfig index".format(key))
 
 
-@functools.lru_cache(maxsize=1000)
 def get_host_for_mac(mac_addr: str) -> str:
     """
     Returns the hostname associated with a mac_addr
 
-    Returns an empty string if the mac as not found.
+    Raises NotFoundError if sdfconfig has no entry for the mac, which is
+    remembered for a while so it isn't searched for again each time.
 
     May raise if sdfconfig is not configured for the user.
     """
+    host = _from_index("host_for_mac", mac_addr)
+    if host is not _UNKNOWN:
+        return host
+    try:
+        return _HOST_FOR_MAC[mac_addr]
+    except KeyError:
+        pass
+    cache = _get_cache()
+    if cache is not None:
+        _HOST_FOR_MAC.update(cache.get_many("mac", [mac_addr]))
+        if mac_addr in _HOST_FOR_MAC:
+            return _HOST_FOR_MAC[mac_addr]
+    if _not_found("mac", [mac_addr]):
+        raise NotFoundError("No sdfconfig entry for {:}".format(mac_addr))
+    try:
+        _HOST_FOR_MAC[mac_addr] = get_backend().host_for_mac(mac_addr)
+    except NotFoundError:
+        _note_not_found("mac", [mac_addr])
+        raise
+    if cache is not None:
+        cache.put("mac", mac_addr, _HOST_FOR_MAC[mac_addr])
+    return _HOST_FOR_MAC[mac_addr]
+
+
+def _try_host_for_mac(mac_addr: str):
     try:
-        fqdn = subprocess.check_output(
-            ["sdfconfig", "search", "--brief", "--type", "mac", mac_addr],
-            universal_newlines=True,
-        )
-        return remove_domain(fqdn)
-    except subprocess.CalledProcessError as exc:
-        raise RuntimeError("sdfconfig is not configured for user") from exc
+        return get_host_for_mac(mac_addr)
+    except NotFoundError:
+        return None
+
+
+def get_hosts_for_macs(mac_addrs) -> dict[str, str]:
+    """
+    Returns {mac_addr: hostname} of the mac_addrs that sdfconfig knows.
+
+    The addresses not found before are searched for together, in a single
+    sdfconfig search for each SEARCH_BATCH of them, whose JSON records are
+    matched back to the addresses.  If that fails, for any other reason than
+    sdfconfig not being usable at all, the addresses are looked up one by one,
+    several at a time, from then on.
+
+    The addresses a batch search doesn't find aren't remembered as not found,
+    only those a lookup of the address itself didn't find are.
+
+    May raise if sdfconfig is not configured for the user.
+    """
+    global _BATCH_SEARCH
+    wanted = {mac_addr.lower(): mac_addr for mac_addr in mac_addrs}
+    index = _INDEX
+    indexed = {} if index is None else index.hosts_for_macs(wanted.values())
+    if index is not None and not _INDEX_FALLBACK:
+        return indexed
+    missing = [
+        m for m in wanted.values() if m not in indexed and m not in _HOST_FOR_MAC
+    ]
+    cache = _get_cache()
+    if cache is not None and missing:
+        _HOST_FOR_MAC.update(cache.get_many("mac", missing))
+        missing = [m for m in missing if m not in _HOST_FOR_MAC]
+    known_missing = _not_found("mac", missing)
+    missing = [m for m in missing if m not in known_missing]
+    for i in range(0, len(missing), SEARCH_BATCH):
+        batch = missing[i : i + SEARCH_BATCH]
+        if _BATCH_SEARCH:
+            try:
+                found = get_backend().hosts_for_macs(batch)
+            except NotConfiguredError:
+                raise
+            except NotFoundError:
+                continue
+            except (RuntimeError, ValueError, KeyError, TypeError) as exc:
+                module_logger.warning(
+                    "Searching sdfconfig for many mac addresses at once failed,"
+                    " looking them up one by one: %s",
+                    exc,
+                )
+                _BATCH_SEARCH = False
+            else:
+                found = {m: found[m.lower()] for m in batch if m.lower() in found}
+                _HOST_FOR_MAC.update(found)
+                if cache is not None:
+                    cache.put_many("mac", found)
+                continue
+        _map_lookups(_try_host_for_mac, batch)
+    return {
+        mac_addr: indexed[mac_addr] if mac_addr in indexed else _HOST_FOR_MAC[mac_addr]
+        for mac_addr in wanted.values()
+        if mac_addr in indexed or mac_addr in _HOST_FOR_MAC
+    }
 
 
 def get_description_for_host(hostname: str) -> str:
@@ -39,6 +267,9 @@ def get_description_for_host(hostname: str) -> str:
 
     May raise if sdfconfig is not configured for the user.
     """
+    description = _from_index("description_for_host", hostname)
+    if description is not _UNKNOWN:
+        return description
     return sdfconfig_view(hostname)["Description"]
 
 
@@ -50,7 +281,26 @@ def get_subnet_for_host(hostname: str) -> str:
 
     May raise if sdfconfig is not configured for the user.
     """
-    return sdfconfig_view(hostname)["Subnet Name"]
+    subnet = _from_index("subnet_for_host", hostname)
+    if subnet is not _UNKNOWN:
+        return subnet
+    try:
+        return sdfconfig_view(hostname)["Subnet Name"]
+    except NotFoundError:
+        return ""
+
+
+def get_subnets_for_hosts(hostnames) -> dict[str, str]:
+    """
+    Get the contents of the subnet field for many hostnames.
+
+    The hosts are looked up several at a time, and returned as
+    {hostname: subnet} in the order given.
+
+    May raise if sdfconfig is not configured for the user.
+    """
+    hostnames = list(dict.fromkeys(hostnames))
+    return dict(zip(hostnames, _map_lookups(get_subnet_for_host, hostnames)))
 
 
 def remove_domain(fqdn: str) -> str:
@@ -68,13 +318,56 @@ def sdfconfig_view(hostname: str) -> dict[str, str]:
     """
     Call sdfconfig view and parse as a dictionary.
 
+    Raises NotFoundError if there is no such host, which is remembered for a
+    while like the MAC addresses that aren't found.
+
     May raise if sdfconfig is not configured for the user.
     """
+    cache = _get_cache()
+    if cache is not None:
+        try:
+            return cache.get("view", hostname)
+        except KeyError:
+            pass
+    if _not_found("view", [hostname]):
+        raise NotFoundError("No sdfconfig entry for {:}".format(hostname))
     try:
-        info = subprocess.check_output(
-            ["sdfconfig", "view", "--json", f"{hostname}.pcdsn"],
-            universal_newlines=True,
-        )
-    except subprocess.CalledProcessError as exc:
-        raise RuntimeError("sdfconfig is not configured for user") from exc
-    return json.loads(info)
+        view = get_backend().view(hostname)
+    except NotFoundError:
+        _note_not_found("view", [hostname])
+        raise
+    if cache is not None:
+        cache.put("view", hostname, view)
+    return view
+
+
+def refresh(mac_addrs=None, hostnames=None):
+    """
+    Throw away cached sdfconfig answers, in this process and on disk.
+
+    With no arguments everything is thrown away, and a search for many MAC
+    addresses at once is tried again, otherwise only the answers for the given
+    MAC addresses and hostnames are thrown away.
+    """
+    global _BATCH_SEARCH
+    backend = get_backend()
+    if hasattr(backend, "reset"):
+        backend.reset()
+    sdfconfig_view.cache_clear()
+    cache = _get_cache()
+    if mac_addrs is None and hostnames is None:
+        _BATCH_SEARCH = True
+        _HOST_FOR_MAC.clear()
+        _NOT_FOUND.clear()
+        if cache is not None:
+            cache.invalidate()
+        return
+    for mac_addr in mac_addrs or ():
+        _HOST_FOR_MAC.pop(mac_addr, None)
+        _NOT_FOUND.pop(("mac", mac_addr), None)
+    for hostname in hostnames or ():
+        _NOT_FOUND.pop(("view", hostname), None)
+    if cache is not None:
+        for kind, keys in (("mac", mac_addrs), ("view", hostnames)):
+            cache.invalidate(kind, list(keys or ()))
+            cache.invalidate("missing-" + kind, list(keys or ()))
@@ -0,0 +1,184 @@
+"""
+A snapshot of the sdfconfig records of the hosts on our subnets.
+
+Rather than asking sdfconfig about each MAC address and host, fleet wide
+work can pull the records of every host on the PCDSN subnets once, with a
+single sdfconfig search or from an exported JSON file, and answer from
+in-memory indexes:
+
+    index = SdfconfigIndex.from_sdfconfig()
+    index.start_refresh(3600)
+    sdfconfig.use_index(index)
+
+Once in use, the sdfconfig functions, and so Switch, Vlan.survey and
+determine_type, answer from the index, only running sdfconfig for what it
+doesn't know.
+"""
+
+import json
+import logging
+import threading
+from pathlib import Path
+
+from .sdfbackend import macs_of, short_name
+from .sdfconfig import get_backend
+
+module_logger = logging.getLogger(__name__)
+
+SUBNETS_FILE = str(Path(__file__).parent.parent / "config" / "subnets.json")
+
+
+def pcdsn_subnets(path=SUBNETS_FILE):
+    """
+    The PCDSN-* subnets of the VLANs in a subnets.json file.
+    """
+    with open(path) as f:
+        subnets = json.load(f)
+    return sorted(
+        {s for s in subnets.values() if s is not None and s.startswith("PCDSN-")}
+    )
+
+
+class SdfconfigIndex:
+    """
+    MAC address -> host, host -> subnet and host -> description indexes of a
+    list of sdfconfig records.
+
+    Each record is a dict like those of "sdfconfig view --json", with at
+    least the "Name" of the host; "Ethernet Address", "Subnet Name" and
+    "Description" are indexed when present.
+
+    Parameters
+    ----------
+    records : list[dict], optional
+        The records to index.
+
+    source : callable, optional
+        Returns the records again, for refresh.
+    """
+
+    def __init__(self, records=(), source=None):
+        self._source = source
+        self._stop = None
+        self.load(records)
+
+    @classmethod
+    def from_file(cls, path):
+        """
+        Index the list of records in a JSON file, e.g. the output of
+        "sdfconfig search --json" saved for later.
+        """
+
+        def source():
+            with open(path) as f:
+                return json.load(f)
+
+        return cls(source(), source=source)
+
+    @classmethod
+    def from_sdfconfig(cls, subnets=None):
+        """
+        Index the hosts of subnets, pcdsn_subnets() by default, found with a
+        single sdfconfig search, or a single call of the sdfbackend in use.
+
+        May raise if sdfconfig is not configured for the user.
+        """
+        if subnets is None:
+            subnets = pcdsn_subnets()
+        subnets = list(subnets)
+
+        def source():
+            return get_backend().records_for_subnets(subnets)
+
+        return cls(source(), source=source)
+
+    def load(self, records):
+        """
+        Replace the indexes with those of records.
+        """
+        if isinstance(records, dict):
+            records = [records]
+        macs, subnets, descriptions = {}, {}, {}
+        for record in records:
+            host = short_name(record["Name"])
+            for mac_addr in macs_of(record):
+                macs[mac_addr] = host
+            if "Subnet Name" in record:
+                subnets[host] = record["Subnet Name"]
+            if "Description" in record:
+                descriptions[host] = record["Description"]
+        # Swapped in at once, for the threads looking things up meanwhile
+        self._indexes = (macs, subnets, descriptions)
+        module_logger.info(
+            "Indexed {:} hosts with {:} mac addresses".format(len(subnets), len(macs))
+        )
+
+    def refresh(self):
+        """
+        Load the records from the source of the index again.
+        """
+        if self._source is None:
+            raise RuntimeError("Index has no source to refresh from")
+        self.load(self._source())
+
+    def start_refresh(self, interval):
+        """
+        Refresh the index every interval seconds, on a background thread.
+
+        A failed refresh is logged, and the index kept as it was.
+        """
+        self.stop_refresh()
+        stop = self._stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.refresh()
+                except Exception as exc:
+                    module_logger.warning("Unable to refresh sdfconfig index: %s", exc)
+
+        threading.Thread(target=run, name="sdfconfig-index", daemon=True).start()
+
+    def stop_refresh(self):
+        """
+        Stop refreshing the index in the background.
+        """
+        if self._stop is not None:
+            self._stop.set()
+            self._stop = None
+
+    def __len__(self):
+        return len(self._indexes[0])
+
+    def host_for_mac(self, mac_addr):
+        """
+        The hostname of a MAC address, raising KeyError if it isn't known.
+        """
+        return self._indexes[0][mac_addr.lower()]
+
+    def hosts_for_macs(self, mac_addrs):
+        """
+        {mac_addr: hostname} of the mac_addrs that are known.
+        """
+        macs = self._indexes[0]
+        return {m: macs[m.lower()] for m in mac_addrs if m.lower() in macs}
+
+    def subnet_for_host(self, hostname):
+        """
+        The subnet of a host, raising KeyError if it isn't known.
+        """
+        return self._indexes[1][hostname]
+
+    def description_for_host(self, hostname):
+        """
+        The description of a host, raising KeyError if it isn't known.
+        """
+        return self._indexes[2][hostname]
+
+    def mac_hosts(self):
+        """
+        {mac_addr: (hostname, subnet)} of every MAC address, for a
+        mactable.HostIndex.
+        """
+        macs, subnets, _ = self._indexes
+        return {mac: (host, subnets.get(host)) for mac, host in macs.items()}
@@ -0,0 +1,486 @@
+"""
+asyncio versions of the command runners in command.py.
+
+These talk to the switches with the same prompts, pagination handling and
+vendor setup as the blocking runners, but every wait is a coroutine, so a
+single event loop can drive sessions to many switches at once:
+
+    results = await asyncio.gather(
+        *(AsyncRuckusCommandRunner(user, pw, None, 22, cmds).run(host)
+          for host in hosts)
+    )
+
+The SSH runners need the asyncssh package, which is optional: install the
+"async" extra, e.g. pip install switchtool[async], or asyncssh itself.
+"""
+
+import asyncio
+import collections
+import logging
+import re
+
+from . import command
+from .breaker import HOST_BREAKER
+from .cache import RESULT_CACHE
+from .settings import SSH_CONF
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncCommandRunner(command.PromptReader):
+    """
+    Run a list of commands on a switch over SSH from an event loop.
+
+    The arguments match command.CommandRunner.
+    """
+
+    breaker = HOST_BREAKER
+    cache = RESULT_CACHE
+    # Called for the enable password if we need it and weren't given it
+    ask_enablepw = None
+
+    def __init__(
+        self,
+        user,
+        pw,
+        enablepw,
+        port,
+        cmds,
+        prompt,
+        terminator,
+        timeout=None,
+        private_key=False,
+        priv=False,
+    ):
+        self.user = user
+        self.pw = pw
+        self.enablepw = enablepw
+        self.port = port
+        self.timeout = timeout
+        self.private_key = private_key
+        self.priv = priv
+        self.cmds = cmds or []
+        self.page_cont_pattern = re.compile(
+            "--More--, next page: Space, next line: Return key, quit: Control-c"
+        )
+        self.prompt_temp = prompt
+        self.prompt_pattern = None
+        self.terminator = terminator
+        self.recv_buf = 8192
+        # How long to wait for the rest of a partial line that isn't a prompt
+        self.partial_timeout = 0.6
+        self.mode = ""
+        self._rbuffer = bytearray()
+        self._lines = collections.deque()
+        self._prompt_line = ""
+        # Give up on a run that takes longer than this many seconds
+        self.deadline = SSH_CONF.get("deadline")
+        self.retries = SSH_CONF.get("connect_retries", 5)
+        self._conn = None
+        self._process = None
+
+    async def enter(self):
+        """
+        Set up the newly opened session.
+        """
+        pass
+
+    async def enable(self):
+        """
+        Get the privileges needed by our commands.
+        """
+        pass
+
+    async def exit(self):
+        try:
+            await self.exec_cmd("exit", False)
+        except EOFError:
+            # The switch hung up on us, as it should
+            pass
+
+    def _send(self, data):
+        self._process.stdin.write(data.encode("utf-8"))
+
+    async def _recv(self, timeout=None):
+        d = await asyncio.wait_for(self._process.stdout.read(self.recv_buf), timeout)
+        if not d:
+            raise EOFError("Channel closed by the switch")
+        return self._strip_erase(d)
+
+    async def _readline(self):
+        while True:
+            line = self._next_line()
+            if line is not None:
+                return line
+            # Wait for more.  If a partial line never gets finished, just
+            # return it!
+            timeout = self.partial_timeout if self._rbuffer else None
+            try:
+                self._feed(await self._recv(timeout))
+            except asyncio.TimeoutError:
+                return self._flush_partial()
+
+    async def exec_cmd(self, cmd, keepOutput=True):
+        logger.debug(">>> %s\\n" % cmd)
+        self._send("%s%s" % (cmd, self.terminator))
+        output = []
+
+        while not self._is_echo(await self._readline(), cmd):
+            pass
+
+        while True:
+            line = await self._readline()
+            if self.page_cont_pattern.match(line):
+                logger.debug("page continue seen")
+                self._send(" %s" % self.terminator)
+                logger.debug(">>> \\n")
+            elif self._is_end(line):
+                break
+            else:
+                output.append(line)
+        if keepOutput:
+            return "".join(output)
+
+    async def _connect(self, host):
+        """
+        Log in to host and open an interactive shell.
+        """
+        if asyncssh is None:
+            raise ImportError("The asyncio SSH runners need the asyncssh package")
+        if not self.breaker.allow(host):
+            raise command.HostDownError(
+                "%s failed to connect recently, skipping it" % host
+            )
+        # The connect seems to fail a lot, so retry like the blocking runners.
+        attempt = 0
+        while True:
+            try:
+                self._conn = await asyncio.wait_for(
+                    asyncssh.connect(
+                        host,
+                        port=self.port,
+                        username=self.user,
+                        password=self.pw,
+                        known_hosts=None,
+                        client_keys=None,
+                    ),
+                    self.timeout,
+                )
+                break
+            except asyncssh.PermissionDenied:
+                raise
+            except (OSError, asyncssh.Error, asyncio.TimeoutError) as exc:
+                delay = command.backoff_delay(attempt)
+                attempt += 1
+                if attempt >= self.retries:
+                    self.breaker.failure(host)
+                    raise command.ConnectError(
+                        "SSH connect to %s failed after %d attempts: %r"
+                        % (host, attempt, exc)
+                    ) from exc
+                logger.info(
+                    "SSH connect to %s failed, retry %d in %.1fs: %r",
+                    host,
+                    attempt,
+                    delay,
+                    exc,
+                )
+                await asyncio.sleep(delay)
+        self.breaker.success(host)
+        self._process = await self._conn.create_process(
+            term_type="vt100", encoding=None
+        )
+
+    async def run(self, host):
+        """
+        Runs the commands on host.
+
+        Returns the exit status and the combined output, like
+        command.CommandRunner.run.
+        """
+        status, outputs = await self.run_each(host)
+        return (status, "".join(outputs))
+
+    async def run_each(self, host):
+        """
+        Runs the commands on host in a single session.
+
+        Returns the exit status and a list with the output of each command.
+        """
+        if self.priv:
+            # Whatever is cached about host may be changed by our commands
+            self.cache.invalidate(host, self.port)
+        try:
+            return await asyncio.wait_for(self._run_each(host), self.deadline)
+        except asyncio.TimeoutError:
+            if self.deadline is None:
+                # A timeout of the run itself, e.g. connecting
+                raise
+            raise command.DeadlineExceeded(
+                "Gave up on %s after %g seconds" % (host, self.deadline)
+            )
+        finally:
+            if self.priv:
+                self.cache.invalidate(host, self.port)
+
+    async def _run_each(self, host):
+        self.prompt_pattern = re.compile(self.prompt_temp % (host, "(?P<mode>[#>])"))
+        await self._connect(host)
+        try:
+            # The first prompt tells whether we need to enable
+            while not self._is_bare_prompt(await self._readline()):
+                pass
+            await self.enter()
+            await self.enable()
+            outputs = [await self.exec_cmd(cmd) for cmd in self.cmds]
+            await self.exit()
+            try:
+                await asyncio.wait_for(self._process.wait_closed(), self.timeout)
+            except asyncio.TimeoutError:
+                pass
+            status = self._process.exit_status
+            return (status or 0, outputs)
+        finally:
+            self._conn.close()
+
+
+class AsyncAristaCommandRunner(AsyncCommandRunner):
+    def __init__(
+        self,
+        user,
+        pw,
+        enablepw,
+        port,
+        cmds,
+        timeout=None,
+        private_key=False,
+        priv=False,
+    ):
+        super().__init__(
+            user,
+            pw,
+            enablepw,
+            port,
+            cmds,
+            command.ARISTA_PROMPT,
+            "\n",
+            timeout,
+            private_key,
+            priv,
+        )
+        self.cmds = ["%s | no-more" % cmd for cmd in self.cmds]
+
+
+class AsyncCiscoCommandRunner(AsyncCommandRunner):
+    def __init__(
+        self,
+        user,
+        pw,
+        enablepw,
+        port,
+        cmds,
+        timeout=None,
+        private_key=False,
+        priv=False,
+    ):
+        super().__init__(
+            user,
+            pw,
+            enablepw,
+            port,
+            cmds,
+            command.CISCO_PROMPT,
+            "\n",
+            timeout,
+            private_key,
+            priv,
+        )
+
+    async def enter(self):
+        await self.exec_cmd("terminal length 0", False)
+
+
+class AsyncBrocadeCommandRunner(AsyncCommandRunner):
+    def __init__(
+        self,
+        user,
+        pw,
+        enablepw,
+        port,
+        cmds,
+        timeout=None,
+        private_key=False,
+        priv=False,
+    ):
+        super().__init__(
+            user,
+            pw,
+            enablepw,
+            port,
+            cmds,
+            command.BROCADE_PROMPT,
+            "\r\n",
+            timeout,
+            private_key,
+            priv,
+        )
+
+    async def exit(self):
+        self._send("exit%s" % self.terminator)
+        # give the switch a moment to hang up before sending a second exit
+        try:
+            await asyncio.wait_for(self._process.wait_closed(), 0.25)
+        except asyncio.TimeoutError:
+            self._send("exit%s" % self.terminator)
+
+
+class AsyncRuckusCommandRunner(AsyncCommandRunner):
+    def __init__(
+        self,
+        user,
+        pw,
+        enablepw,
+        port,
+        cmds,
+        timeout=None,
+        private_key=False,
+        priv=False,
+    ):
+        super().__init__(
+            user,
+            pw,
+            enablepw,
+            port,
+            cmds,
+            command.RUCKUS_PROMPT,
+            "\n",
+            timeout,
+            private_key,
+            priv,
+        )
+
+    async def enable(self):
+        # The mode is known from the first prompt of the session
+        if self.priv and self.mode == ">":
+            if self.enablepw is None and self.ask_enablepw is not None:
+                self.enablepw = self.ask_enablepw()
+            await self.exec_cmd("enable %s" % self.enablepw)
+            if self.mode != "#":
+                raise IOError("Bad enable password!")
+
+    async def exit(self):
+        self._send("exit%s" % self.terminator)
+        # give the switch a moment to hang up before sending a second exit
+        try:
+            await asyncio.wait_for(self._process.wait_closed(), 0.25)
+        except asyncio.TimeoutError:
+            self._send("exit%s" % self.terminator)
+
+
+# Telnet negotiation bytes
+IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+
+
+class AsyncTelnetCommandRunner(object):
+    """
+    Run a list of commands on a Digi PortServer/ConnectPort over telnet.
+
+    The arguments match command.TelnetCommandRunner.  Every telnet option
+    the Digi asks for is refused, like telnetlib does by default.
+    """
+
+    def __init__(self, user, pw, enablepw, port, cmds, timeout=None, priv=False):
+        self.user = user
+        self.pw = pw
+        self.port = port
+        self.timeout = timeout
+        self.cmds = cmds or []
+        self.tn_prompt = b"#> "
+        self.lo_prompt = b"login: "
+        self.pw_prompt = b"password: "
+        self._reader = None
+        self._writer = None
+        self._rbuffer = b""
+
+    def _filter(self, data):
+        """
+        Strip telnet commands out of data, refusing any option negotiation.
+        """
+        out = bytearray()
+        i = 0
+        while i < len(data):
+            b = data[i]
+            if b != IAC or i + 1 >= len(data):
+                out.append(b)
+                i += 1
+                continue
+            verb = data[i + 1]
+            if verb == IAC:
+                out.append(IAC)
+                i += 2
+            elif verb in (DO, DONT, WILL, WONT) and i + 2 < len(data):
+                reply = WONT if verb in (DO, DONT) else DONT
+                self._writer.write(bytes([IAC, reply, data[i + 2]]))
+                i += 3
+            elif verb == SB:
+                end = data.find(bytes([IAC, SE]), i)
+                i = len(data) if end < 0 else end + 2
+            else:
+                i += 2
+        return bytes(out)
+
+    async def _read_until(self, match, timeout=None):
+        """
+        Read until match is seen and return everything up to and including it.
+        """
+        while True:
+            idx = self._rbuffer.find(match)
+            if idx >= 0:
+                idx += len(match)
+                r, self._rbuffer = self._rbuffer[:idx], self._rbuffer[idx:]
+                return r
+            d = await asyncio.wait_for(self._reader.read(4096), timeout)
+            if not d:
+                r, self._rbuffer = self._rbuffer, b""
+                return r
+            self._rbuffer += self._filter(d)
+
+    def _write(self, text):
+        self._writer.write(("%s\n" % text).encode("utf-8"))
+
+    async def run(self, host):
+        """
+        Runs the commands on host.
+        """
+        output = []
+        self._reader, self._writer = await asyncio.wait_for(
+            asyncio.open_connection(host, self.port), self.timeout
+        )
+        try:
+            await self._read_until(self.lo_prompt, self.timeout)
+            self._write(self.user)
+            await self._read_until(self.pw_prompt, self.timeout)
+            self._write(self.pw)
+            await self._read_until(self.tn_prompt, self.timeout)
+            for cmd in self.cmds:
+                self._write(cmd)
+                # Skip the echo of the command
+                try:
+                    await self._read_until(("%s\r\n" % cmd).encode("utf-8"), 1)
+                except asyncio.TimeoutError:
+                    # Like telnetlib, take whatever came as the echo
+                    self._rbuffer = b""
+                cur_out = await self._read_until(self.tn_prompt)
+                if cur_out.endswith(self.tn_prompt):
+                    cur_out = cur_out[: -len(self.tn_prompt)]
+                # remove trailing \r is present
+                output.append(cur_out.decode("utf-8").rstrip("\r"))
+            self._write("exit")
+            return (0, "".join(output))
+        finally:
+            self._writer.close()
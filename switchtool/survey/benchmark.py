@@ -0,0 +1,153 @@
+"""
+Time the Surveyer parsers on synthetic switch output.
+
+The outputs of "show vlan", "show mac-address", "show inline power" and
+"show interfaces brief" are generated by fakeswitch for switches of
+increasing size, and fed to the _parse_* method of the surveyer for each
+vendor.  For each we report the time per parse and the memory it needs:
+
+    python -m switchtool.survey.benchmark --sizes 48 400 5000
+
+The size is both the number of ports and the number of MAC addresses.
+"""
+
+import argparse
+import math
+import timeit
+import tracemalloc
+
+from .fakeswitch import FakeSwitch
+from .survey import AristaSurveyer, BrocadeSurveyer, CiscoSurveyer, RuckusSurveyer
+
+SURVEYERS = {
+    "brocade": BrocadeSurveyer,
+    "ruckus": RuckusSurveyer,
+    "cisco": CiscoSurveyer,
+    "arista": AristaSurveyer,
+}
+
+# The parser for each table, and the FakeSwitch method generating its output
+TABLES = [
+    ("_parse_vlan", "show_vlan"),
+    ("_parse_mac", "show_mac"),
+    ("_parse_power", "show_power"),
+    ("_parse_labels", "show_labels"),
+]
+
+
+def synthetic_output(vendor, size):
+    """
+    The output lines of each command of a vendor switch with size ports/MACs.
+
+    Returns {parser name: lines}, with the "\\r\\n" line ends a runner yields.
+    Tables the vendor doesn't survey are left out, and the JSON is generated
+    for the commands asking for it.
+    """
+    surveyer = SURVEYERS[vendor](None, None, None)
+    units = math.ceil(size / 48)
+    switch = FakeSwitch(vendor, units=units, ports=math.ceil(size / units), macs=size)
+    cmds = {
+        "_parse_vlan": surveyer._vlan_cmd,
+        "_parse_mac": surveyer._mac_cmd,
+        "_parse_power": surveyer._pwr_cmd,
+        "_parse_labels": surveyer._lbl_cmd,
+    }
+    return {
+        parser: [
+            line + "\r\n"
+            for line in getattr(switch, show)(structured=cmds[parser].endswith("json"))
+        ]
+        for parser, show in TABLES
+        if cmds[parser] is not None
+    }
+
+
+def measure(parse, lines, repeat=5):
+    """
+    Time parse(lines), and trace the memory it allocates.
+
+    Returns the best time per call in seconds, the peak memory in bytes while
+    parsing, and the number of memory blocks the result keeps.
+    """
+    timer = timeit.Timer(lambda: parse(lines))
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat, number)) / number
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        result = parse(lines)
+        _, peak = tracemalloc.get_traced_memory()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+    del result
+    return best, peak, blocks
+
+
+def run(vendors, sizes, repeat=5):
+    """
+    Benchmark each parser of each vendor for each size.
+
+    Returns a list of (vendor, parser, size, lines, seconds, peak, blocks).
+    """
+    results = []
+    for vendor in vendors:
+        surveyer = SURVEYERS[vendor](None, None, None)
+        for size in sizes:
+            for parser, lines in synthetic_output(vendor, size).items():
+                seconds, peak, blocks = measure(
+                    getattr(surveyer, parser), lines, repeat
+                )
+                results.append(
+                    (vendor, parser, size, len(lines), seconds, peak, blocks)
+                )
+    return results
+
+
+def parse_cli():
+    parser = argparse.ArgumentParser(
+        description="Time the switch output parsers on synthetic output."
+    )
+    parser.add_argument(
+        "--vendors",
+        nargs="+",
+        choices=sorted(SURVEYERS),
+        default=sorted(SURVEYERS),
+        help="The switch types to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--sizes",
+        nargs="+",
+        type=int,
+        default=[48, 400, 5000],
+        help="The numbers of ports/MACs to benchmark (default: 48 400 5000)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Report the best of this many timings (default: 5)",
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_cli()
+    print(
+        "%-8s %-14s %6s %6s %10s %10s %8s"
+        % ("vendor", "parser", "size", "lines", "time (ms)", "peak (KiB)", "blocks")
+    )
+    for vendor, parser, size, lines, seconds, peak, blocks in run(
+        args.vendors, args.sizes, args.repeat
+    ):
+        print(
+            "%-8s %-14s %6d %6d %10.3f %10.1f %8d"
+            % (vendor, parser, size, lines, seconds * 1e3, peak / 1024, blocks)
+        )
+
+
+if __name__ == "__main__":
+    main()
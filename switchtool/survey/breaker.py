@@ -0,0 +1,112 @@
+"""
+The hosts that keep failing to connect, shared between command runners.
+
+Each runner spends its full connect timeout, and its retries, on a switch
+that is down.  Fleet scans would wait that long on every dead switch for
+every command, so the runners note each failed connect in HOST_BREAKER and
+skip the hosts it considers down.
+"""
+
+import logging
+import threading
+import time
+
+from .settings import SSH_CONF
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    Hosts that recently failed to connect, so that runners can skip them.
+
+    A host that fails to connect threshold times in a row is considered down
+    for reset seconds, and allow returns False for it, rather than having
+    every runner spend its full connect timeout and retries on it.  Once reset
+    seconds have passed a single runner is let through to try again; if that
+    fails too the host is down for another reset seconds.
+
+    Parameters
+    ----------
+    threshold : int, optional
+        Failed connects in a row before a host is considered down.
+
+    reset : float, optional
+        Seconds before trying a host that is down again.
+    """
+
+    def __init__(self, threshold=None, reset=None):
+        if threshold is None:
+            threshold = SSH_CONF.get("breaker_threshold", 3)
+        if reset is None:
+            reset = SSH_CONF.get("breaker_reset", 60)
+        self.threshold = threshold
+        self.reset = reset
+        # host: [failures in a row, time the host was found down]
+        self._hosts = {}
+        self._lock = threading.Lock()
+
+    def allow(self, host):
+        """
+        Whether a connect to host should be attempted.
+        """
+        with self._lock:
+            failures, down_at = self._hosts.get(host, (0, None))
+            if down_at is None:
+                return True
+            if time.monotonic() - down_at < self.reset:
+                return False
+            # Let this caller try, the others wait for another reset
+            self._hosts[host] = [failures, time.monotonic()]
+            logger.debug("Trying %s again", host)
+            return True
+
+    def success(self, host):
+        """
+        Note that host connected fine.
+        """
+        with self._lock:
+            self._hosts.pop(host, None)
+
+    def failure(self, host):
+        """
+        Note that connecting to host failed.
+        """
+        with self._lock:
+            entry = self._hosts.setdefault(host, [0, None])
+            entry[0] += 1
+            if entry[0] >= self.threshold:
+                if entry[1] is None:
+                    logger.warning(
+                        "%s failed to connect %d times, skipping it for %gs",
+                        host,
+                        entry[0],
+                        self.reset,
+                    )
+                entry[1] = time.monotonic()
+
+    def down(self):
+        """
+        The hosts currently considered down.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [
+                host
+                for host, (_, down_at) in self._hosts.items()
+                if down_at is not None and now - down_at < self.reset
+            ]
+
+    def clear(self, host=None):
+        """
+        Forget the failures of host, or of every host.
+        """
+        with self._lock:
+            if host is None:
+                self._hosts.clear()
+            else:
+                self._hosts.pop(host, None)
+
+
+# Shared by every command runner in the process
+HOST_BREAKER = CircuitBreaker()
@@ -0,0 +1,89 @@
+"""
+Recent output of the read-only commands, shared between command runners.
+
+A multi-step workflow surveys a switch several times in a row, e.g. to load
+it then check the port it is about to change.  The runners keep the output
+of each command in RESULT_CACHE for a few seconds, so these surveys don't
+all go back to the switch.
+"""
+
+import logging
+import threading
+import time
+
+from .settings import SSH_CONF
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Recent output of read-only commands, keyed by (host, port, command).
+
+    Output is served for ttl seconds after it was read.  Anything that runs
+    privileged commands on a switch must invalidate it, as the command runners
+    do, since the output may have changed.
+
+    Parameters
+    ----------
+    ttl : float, optional
+        Seconds the output of a command is kept for, 0 to not cache at all.
+    """
+
+    def __init__(self, ttl=None):
+        if ttl is None:
+            ttl = SSH_CONF.get("cache_ttl", 10)
+        self.ttl = ttl
+        # (host, port, command): (expiry time, output lines)
+        self._results = {}
+        self._lock = threading.Lock()
+
+    def get(self, host, port, cmd):
+        """
+        The output lines of cmd on the switch at host and port, None if not
+        cached or expired.
+        """
+        key = (host, port, cmd)
+        with self._lock:
+            expires, lines = self._results.get(key, (0, None))
+            if lines is not None and expires < time.monotonic():
+                del self._results[key]
+                return None
+        if lines is not None:
+            logger.debug("Cached output of %r on %s", cmd, host)
+        return lines
+
+    def put(self, host, port, cmd, lines):
+        """
+        Keep the output lines of cmd on the switch at host and port.
+        """
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._results[host, port, cmd] = (
+                time.monotonic() + self.ttl,
+                tuple(lines),
+            )
+
+    def invalidate(self, host=None, port=None):
+        """
+        Forget the output for the switch at host and port, for every port of
+        host, or for every host.
+        """
+        with self._lock:
+            if host is None:
+                self._results.clear()
+                return
+            for key in [
+                k
+                for k in self._results
+                if k[0] == host and (port is None or k[1] == port)
+            ]:
+                del self._results[key]
+
+    def __len__(self):
+        return len(self._results)
+
+
+# Shared by every command runner in the process
+RESULT_CACHE = ResultCache()
@@ -2,8 +2,13 @@
 
 ###!/usr/bin/env python
 import argparse
+import collections
+import concurrent.futures
+import functools
 import logging
+import random
 import re
+import select
 import socket
 import sys
 import telnetlib
@@ -14,6 +19,9 @@ import paramiko
 from paramiko.ssh_exception import SSHException
 
 from . import utils
+from .breaker import HOST_BREAKER
+from .cache import RESULT_CACHE
+from .pool import Session
 from .settings import (
     ARISTA_HOST,
     CISCO_HOST,
@@ -21,12 +29,52 @@ from .settings import (
     HOST_IGNORE,
     LOG_CONF,
     MOXA_HOST_IGNORE,
+    SSH_CONF,
 )
 
 LOG = logging.getLogger(LOG_CONF.get("logger_name", __name__))
 logger = logging.getLogger(__name__)
 
 
+class ConnectError(SSHException):
+    """
+    Raised when we can't log in to a switch, after retrying.
+    """
+
+
+class HostDownError(ConnectError):
+    """
+    Raised instead of connecting to a switch that failed too often recently.
+    """
+
+
+class DeadlineExceeded(SSHException):
+    """
+    Raised when a run takes longer than the deadline of its runner.
+    """
+
+
+def backoff_delay(attempt, base=None, cap=None):
+    """
+    The delay before retry number attempt (from 0), with full jitter.
+
+    The delay grows exponentially from base up to cap seconds, and a random
+    part of it is used so that many runners don't retry in lockstep.
+    """
+    if base is None:
+        base = SSH_CONF.get("retry_backoff", 0.5)
+    if cap is None:
+        cap = SSH_CONF.get("retry_backoff_max", 8.0)
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+# Prompt templates, filled in with the hostname and the pattern for the mode
+ARISTA_PROMPT = r"^%s(?:\.ARISTA)?%s(?P<cmd>.*)"
+CISCO_PROMPT = "^%s%s(?P<cmd>.*)"
+BROCADE_PROMPT = r"^SSH@%s(?:\([\w-]*\))?%s(?P<cmd>.*)"
+RUCKUS_PROMPT = r"^SSH@%s(?:\([-/\w]*\))?%s(?P<cmd>.*)"
+
+
 class TelnetCommandRunner(object):
     def __init__(self, user, pw, enablepw, port, cmds, timeout=None, priv=False):
         self.user = user
@@ -77,8 +125,148 @@ class TelnetCommandRunner(object):
         finally:
             self.tn.close()
 
+    def close(self):
+        """
+        Drop the connection, making a run in another thread give up.
+        """
+        self.tn.close()
+
+
+class PromptReader(object):
+    """
+    Line splitting and prompt matching shared by the blocking and asyncio runners.
+
+    Users _feed the bytes they receive into _rbuffer, and set prompt_pattern
+    and page_cont_pattern before reading.
+
+    _rbuffer is a bytearray that only ever holds the unfinished last line.
+    Every complete line that arrives is decoded in one go into _lines, rather
+    than slicing, copying and decoding the buffer once per line, which is
+    what dominated reading large MAC tables and configs.
+    """
+
+    # The backspaces the pagination uses to erase its --More-- prompt.  This
+    # is "^H" followed by a number of " ^H^H" followed by " ^H".
+    _erase_pattern = re.compile(b"(?:\x08| \x08)+")
+
+    _rbuffer: bytearray
+    _lines: collections.deque
+    _prompt_line = ""
+    mode = ""
+
+    @classmethod
+    def _strip_erase(cls, d):
+        """
+        Drop the backspaces the pagination uses to erase its --More-- prompt.
+        """
+        if b"\x08" not in d:
+            return d
+        return cls._erase_pattern.sub(b"", d)
+
+    def _feed(self, d):
+        """
+        Add received data to _rbuffer, moving the complete lines to _lines.
+        """
+        self._rbuffer += self._strip_erase(d)
+        end = self._rbuffer.rfind(b"\n")
+        if end < 0:
+            return
+        with memoryview(self._rbuffer) as view:
+            text = str(view[:end], "utf-8", "replace")
+        del self._rbuffer[: end + 1]
+        self._lines.extend([line + "\n" for line in text.split("\n")])
+
+    def _unread(self):
+        """
+        Take everything that hasn't been read yet, e.g. to hand a session on.
+        """
+        d = "".join(self._lines).encode("utf-8") + self._rbuffer
+        self._lines.clear()
+        self._rbuffer = bytearray()
+        return d
+
+    def _is_prompt(self, partial):
+        """
+        Whether an unterminated line is a prompt waiting for input.
+        """
+        if self.page_cont_pattern.match(partial):
+            return True
+        prompt_match = self.prompt_pattern.match(partial.rstrip())
+        return bool(prompt_match) and not prompt_match.group("cmd").strip()
+
+    def _next_line(self):
+        """
+        Take the next line or prompt out of _lines or _rbuffer, None if we need
+        more data.
+        """
+        if self._lines:
+            r = self._prompt_line + self._lines.popleft()
+            self._prompt_line = ""
+            logger.debug("<<< %s", r)
+            return r
+        if self._rbuffer:
+            partial = self._rbuffer.decode("utf-8", "replace")
+            if self._is_prompt(partial):
+                self._rbuffer.clear()
+                if not self.page_cont_pattern.match(partial):
+                    self._prompt_line = partial
+                logger.debug("<<< %s", partial)
+                return partial
+        return None
+
+    def _flush_partial(self):
+        """
+        Give up waiting for the end of a partial line and return it as is.
+        """
+        r = self._rbuffer.decode("utf-8", "replace")
+        self._rbuffer.clear()
+        logger.debug("<<< %s", r)
+        return r
+
+    def _is_echo(self, line, cmd):
+        """
+        Whether line is the prompt followed by the echo of cmd.
+        """
+        prompt_match = self.prompt_pattern.match(line.rstrip())
+        if prompt_match and prompt_match.group("cmd") == cmd:
+            logger.debug("Seen prompt and echo")
+            self.mode = prompt_match.group("mode")
+            return True
+        logger.debug(f"Not seen prompt and echo for {self.prompt_pattern}")
+        return False
+
+    def _is_bare_prompt(self, line):
+        """
+        Whether line is a prompt with no command after it, e.g. the first prompt
+        of a session, taking our mode from it.
+        """
+        prompt_match = self.prompt_pattern.match(line.rstrip())
+        if prompt_match and not prompt_match.group("cmd").strip():
+            self.mode = prompt_match.group("mode")
+            return True
+        return False
+
+    def _is_end(self, line):
+        """
+        Whether line is the prompt that ends the output of a command.
+        """
+        prompt_match = self.prompt_pattern.match(line)
+        if prompt_match:
+            logger.debug("prompt_match!")
+            self.mode = prompt_match.group("mode")
+            return True
+        logger.debug("no prompt match")
+        return False
+
+
+class CommandRunner(PromptReader):
+    # Shared record of the hosts that keep failing to connect
+    breaker = HOST_BREAKER
+    # Shared output of recent surveys, that privileged commands invalidate
+    cache = RESULT_CACHE
+    # Called for the enable password if we need it and weren't given it
+    ask_enablepw = None
 
-class CommandRunner(object):
     def __init__(
         self,
         user,
@@ -91,6 +279,7 @@ class CommandRunner(object):
         timeout=None,
         private_key=False,
         priv=False,
+        pool=None,
     ):
         self.user = user
         self.pw = pw
@@ -99,6 +288,7 @@ class CommandRunner(object):
         self.timeout = timeout
         self.private_key = private_key
         self.priv = priv
+        self.pool = pool
         self.cmds = cmds or []
         self.page_cont_pattern = re.compile(
             "--More--, next page: Space, next line: Return key, quit: Control-c"
@@ -107,21 +297,52 @@ class CommandRunner(object):
         self.prompt_pattern = None
         self.terminator = terminator
         self.recv_buf = 8192
+        # How long to wait for the rest of a partial line that isn't a prompt
+        self.partial_timeout = 0.6
         self.chan = None
         self.mode = ""
+        self.exit_status = None
+        # Give up on a run that takes longer than this many seconds
+        self.deadline = SSH_CONF.get("deadline")
+        self.retries = SSH_CONF.get("connect_retries", 5)
+        self._expires = None
+        self._closed = False
         self._config()
-        self._rbuffer = None
+        self._rbuffer = bytearray()
+        self._lines = collections.deque()
+        self._prompt_line = ""
 
     def _config(self):
         self.ssh = paramiko.SSHClient()
         self.ssh.load_system_host_keys()
         self.ssh.set_missing_host_key_policy(paramiko.AutoAddPolicy())
 
+    def close(self):
+        """
+        Drop the connection, making a run in another thread give up, even one
+        that is still connecting.
+        """
+        self._closed = True
+        self.ssh.close()
+
     def enter(self):
+        """
+        Set up a newly opened session.  Pooled sessions only do this once.
+        """
+        pass
+
+    def enable(self):
+        """
+        Get the privileges needed by our commands, run at the start of each run.
+        """
         pass
 
     def exit(self):
-        self.exec_cmd("exit", False)
+        try:
+            self.exec_cmd("exit", False)
+        except EOFError:
+            # The switch hung up on us, as it should
+            pass
 
     """
     OK, we're running afoul of how paramiko does readline here.  It's
@@ -135,135 +356,261 @@ class CommandRunner(object):
     tries to erase the line.
 
     Therefore, we define our own _recv, which does a recv and then gets
-    rid of "^H followed by a number of " ^H^H" followed by " ^H".
-
-    Then, we also have our own _readline, which does _recv and breaks
-    the results into lines.  If there is nothing to read when we have
-    a partial line, we just return the partial, assuming it's a prompt.
+    rid of "^H followed by a number of " ^H^H" followed by " ^H" in a
+    single regex pass.
+
+    Then, we also have our own _readline, which blocks on the channel until
+    there is data and breaks the results into lines.  A partial line is
+    returned as soon as it matches our prompt or the pagination prompt.  The
+    prompt is remembered and put in front of the next line, so that the echo
+    of the next command reads like "SSH@switch#show vlan".  If a partial line
+    doesn't match, we only return it once nothing more arrives.
     """
 
     def _recv(self):
         d = self.chan.recv(self.recv_buf)
-        if d[0] == 8:
-            d = d[1:]
-        while d[:3] == b" \b\b":
-            d = d[3:]
-        if d[:2] == b" \b":
-            d = d[2:]
-        return d
+        if not d:
+            raise EOFError("Channel closed by the switch")
+        return self._strip_erase(d)
 
-    def _readline(self):
-        # If we don't have any data, try to read some!
-        while self._rbuffer is None:
-            if self.chan.recv_ready():
-                self._rbuffer = self._recv()
-            else:
-                time.sleep(0.1)
+    def _wait(self, timeout):
+        """
+        Block until there is data on the channel, or until timeout expires.
+        """
+        readable, _, _ = select.select([self.chan], [], [], timeout)
+        return bool(readable)
 
+    def _time_left(self):
+        """
+        Seconds left before the deadline of this run, None if there is none.
+        """
+        if self._expires is None:
+            return None
+        return max(0.0, self._expires - time.monotonic())
+
+    def _readline(self):
         while True:
-            # If there is a newline in our data, return the first chunk.
-            try:
-                idx = self._rbuffer.index(b"\n")
-                r = self._rbuffer[0 : idx + 1].decode("utf-8")
-                if idx == len(self._rbuffer):
-                    self._rbuffer = None
-                else:
-                    self._rbuffer = self._rbuffer[idx + 1 :]
-                logger.debug("<<< %s" % r)
-                return r
-            except:
-                # If there isn't a newline, try to read more.  If there
-                # is no more, just return the partial line!
-                didread = False
-                for i in range(6):
-                    if self.chan.recv_ready():
-                        d = self._recv()
-                        self._rbuffer += d
-                        didread = True
-                        break
-                    else:
-                        time.sleep(0.1)
-                if not didread:
-                    r = self._rbuffer.decode("utf-8")
-                    self._rbuffer = None
-                    logger.debug("<<< %s" % r)
-                    return r
+            line = self._next_line()
+            if line is not None:
+                return line
+            # Wait for more.  If a partial line never gets finished, just
+            # return it!
+            timeout = self.partial_timeout if self._rbuffer else None
+            left = self._time_left()
+            if left is not None and (timeout is None or left < timeout):
+                timeout = left
+            if self._wait(timeout):
+                self._feed(self._recv())
+            elif self._time_left() == 0:
+                raise DeadlineExceeded(
+                    "Gave up waiting for the switch after %g seconds" % self.deadline
+                )
+            else:
+                return self._flush_partial()
 
     def exec_cmd(self, cmd, keepOutput=True):
-        seen_echo = False
-        seen_prompt = False
+        output = "".join(self.exec_cmd_iter(cmd))
+        if keepOutput:
+            return output
+
+    def exec_cmd_iter(self, cmd):
+        """
+        Run cmd and yield the lines of its output as they arrive.
+
+        The generator has to be exhausted before the next command is sent.
+        """
         logger.debug(">>> %s\\n" % cmd)
         self.chan.send("%s%s" % (cmd, self.terminator))
-        output = ""
 
-        while not seen_echo:
-            line = self._readline()
-            prompt_match = self.prompt_pattern.match(line.rstrip())
-            if prompt_match and prompt_match.group("cmd") == cmd:
-                logger.debug("Seen prompt and echo")
-                self.mode = prompt_match.group("mode")
-                seen_echo = True
-            else:
-                logger.debug(f"Not seen prompt and echo for {self.prompt_pattern}")
+        while not self._is_echo(self._readline(), cmd):
+            pass
 
-        while not seen_prompt:
+        while True:
             line = self._readline()
-            page_cont = self.page_cont_pattern.match(line)
-            if page_cont:
+            if self.page_cont_pattern.match(line):
                 logger.debug("page continue seen")
                 self.chan.send(" %s" % self.terminator)
                 logger.debug(">>> \\n")
+            elif self._is_end(line):
+                break
             else:
-                logger.debug("no page continue seen")
-                prompt_match = self.prompt_pattern.match(line)
-                if prompt_match:
-                    logger.debug("prompt_match!")
-                    self.mode = prompt_match.group("mode")
-                    seen_prompt = True
-                else:
-                    logger.debug("no prompt match")
-                    output += line
-        self.chan.send(" %s" % self.terminator)
-        if keepOutput:
-            return output
+                yield line
 
-    def run(self, host):
+    def _connect(self, host):
         """
-        Runs the command on the passed list of hosts
+        Log in to host and open an interactive shell.
         """
-        # Sigh... now we want to actually see if our prompt is '>' or '#' and enable if needed!
-        self.prompt_pattern = re.compile(self.prompt_temp % (host, "(?P<mode>[#>])"))
-        output = ""
-
-        # The connect seems to fail a lot.  Let's see if we can catch this at all
-        # and retry?
-        did_connect = False
-        for i in range(5):
+        if not self.breaker.allow(host):
+            raise HostDownError("%s failed to connect recently, skipping it" % host)
+        # The connect seems to fail a lot, so retry with a growing delay.
+        # A bad login or host key won't get better though.
+        attempt = 0
+        while True:
+            if self._closed:
+                raise ConnectError("Gave up connecting to %s, runner closed" % host)
+            timeout = self.timeout
+            left = self._time_left()
+            if left is not None:
+                timeout = left if timeout is None else min(timeout, left)
             try:
+                # The banner and login are bounded too, or a switch that
+                # accepts but never answers outlives the deadline
                 self.ssh.connect(
                     host,
                     self.port,
                     self.user,
                     self.pw,
-                    timeout=self.timeout,
+                    timeout=timeout,
+                    banner_timeout=timeout,
+                    auth_timeout=timeout,
                     look_for_keys=False,
                 )
-                did_connect = True
                 break
-            except:
-                print("SSH connect failed, retry %d!" % i)
-        if not did_connect:
-            print("SSH connect failed, aborting!")
-            sys.exit(0)
+            except (paramiko.AuthenticationException, paramiko.BadHostKeyException):
+                raise
+            except (SSHException, OSError) as exc:
+                if self._closed:
+                    raise ConnectError(
+                        "Gave up connecting to %s, runner closed" % host
+                    ) from exc
+                delay = backoff_delay(attempt)
+                attempt += 1
+                left = self._time_left()
+                if attempt >= self.retries or (left is not None and left <= delay):
+                    self.breaker.failure(host)
+                    raise ConnectError(
+                        "SSH connect to %s failed after %d attempts: %s"
+                        % (host, attempt, exc)
+                    ) from exc
+                logger.info(
+                    "SSH connect to %s failed, retry %d in %.1fs: %s",
+                    host,
+                    attempt,
+                    delay,
+                    exc,
+                )
+                time.sleep(delay)
+        if self._closed:
+            # Closed while the socket was still connecting
+            self.ssh.close()
+            raise ConnectError("Gave up connecting to %s, runner closed" % host)
+        self.breaker.success(host)
+        return Session(self.ssh, self.ssh.invoke_shell())
+
+    def _iter_session(self, session):
+        """
+        Run our commands in an open session, yielding (index, line) pairs.
+        """
+        self.ssh = session.ssh
+        self.chan = session.chan
+        self.mode = session.mode
+        self._rbuffer = bytearray()
+        self._lines = collections.deque()
+        self._feed(session.rbuffer)
+        self._prompt_line = session.prompt
+        if not session.entered:
+            # The first prompt tells whether we need to enable
+            while not self._is_bare_prompt(self._readline()):
+                pass
+            self.enter()
+            session.entered = True
+        self.enable()
+        for i, cmd in enumerate(self.cmds):
+            for line in self.exec_cmd_iter(cmd):
+                yield i, line
+        session.mode = self.mode
+        session.rbuffer = self._unread()
+        session.prompt = self._prompt_line
+
+    def run(self, host):
+        """
+        Runs the command on the passed list of hosts
+        """
+        status, outputs = self.run_each(host)
+        return (status, "".join(outputs))
+
+    def run_each(self, host):
+        """
+        Runs the commands on host in a single session.
 
+        Returns the exit status and a list with the output of each command,
+        in the same order as our commands.
+        """
+        outputs = [[] for cmd in self.cmds]
+        for i, line in self.iter_each(host):
+            outputs[i].append(line)
+        return (self.exit_status, ["".join(output) for output in outputs])
+
+    def iter_each(self, host):
+        """
+        Runs the commands on host in a single session, yielding output lines.
+
+        Each item is (index of the command in our commands, line), so the
+        output can be parsed while the switch is still sending it.  The exit
+        status is left in exit_status once the generator is exhausted.
+        """
+        if not self.priv:
+            yield from self._iter_each(host)
+            return
+        # Whatever is cached about host may be changed by our commands
+        self.cache.invalidate(host, self.port)
         try:
-            self.chan = self.ssh.invoke_shell()
+            yield from self._iter_each(host)
+        finally:
+            self.cache.invalidate(host, self.port)
 
-            self.enter()
-            for cmd in self.cmds:
-                output += self.exec_cmd(cmd)
+    def _iter_each(self, host):
+        # Sigh... now we want to actually see if our prompt is '>' or '#' and enable if needed!
+        self.prompt_pattern = re.compile(self.prompt_temp % (host, "(?P<mode>[#>])"))
+        if self.deadline is not None:
+            self._expires = time.monotonic() + self.deadline
+        if self.pool is None:
+            yield from self._iter_once(host)
+            return
+
+        key = (host, self.port, self.user, type(self).__name__)
+        session = self.pool.acquire(key)
+        while True:
+            reused = session is not None
+            if not reused:
+                session = self._connect(host)
+            started = False
+            try:
+                for item in self._iter_session(session):
+                    started = True
+                    yield item
+            except GeneratorExit:
+                # Abandoned halfway through, the session is in an unknown state
+                self.pool.discard(key, session)
+                raise
+            except Exception as exc:
+                dropped = reused and not started and not session.alive
+                self.pool.discard(key, session)
+                if not dropped or not isinstance(
+                    exc, (SSHException, EOFError, OSError)
+                ):
+                    raise
+                # The switch closed the pooled session under us, log in again
+                logger.info("Pooled session to %s dropped, reconnecting", host)
+                session = None
+                continue
+            self.pool.release(key, session)
+            self.exit_status = 0
+            return
+
+    def _iter_once(self, host):
+        """
+        Run our commands in a session of their own and log out afterwards.
+        """
+        session = self._connect(host)
+        try:
+            yield from self._iter_session(session)
             self.exit()
-            return (self.chan.recv_exit_status(), output)
+            self.exit_status = self.chan.recv_exit_status()
+        except (GeneratorExit, DeadlineExceeded):
+            # Abandoned halfway through, don't wait for the switch to hang up
+            self.ssh.close()
+            raise
         finally:
             # If we close without this, we sometimes get SSHExceptions when
             # trying to reconnect. Get the exit status, then read everything from
@@ -292,6 +639,7 @@ class AristaCommandRunner(CommandRunner):
         timeout=None,
         private_key=False,
         priv=False,
+        pool=None,
     ):
         super(AristaCommandRunner, self).__init__(
             user,
@@ -299,11 +647,12 @@ class AristaCommandRunner(CommandRunner):
             enablepw,
             port,
             cmds,
-            r"^%s(?:\.ARISTA)?%s(?P<cmd>.*)",
+            ARISTA_PROMPT,
             "\n",
             timeout,
             private_key,
             priv,
+            pool,
         )
         self.cmds = self._fix_cmds()
 
@@ -325,6 +674,7 @@ class CiscoCommandRunner(CommandRunner):
         timeout=None,
         private_key=False,
         priv=False,
+        pool=None,
     ):
         super(CiscoCommandRunner, self).__init__(
             user,
@@ -332,11 +682,12 @@ class CiscoCommandRunner(CommandRunner):
             enablepw,
             port,
             cmds,
-            "^%s%s(?P<cmd>.*)",
+            CISCO_PROMPT,
             "\n",
             timeout,
             private_key,
             priv,
+            pool,
         )
 
     def enter(self):
@@ -354,6 +705,7 @@ class BrocadeCommandRunner(CommandRunner):
         timeout=None,
         private_key=False,
         priv=False,
+        pool=None,
     ):
         super(BrocadeCommandRunner, self).__init__(
             user,
@@ -361,11 +713,12 @@ class BrocadeCommandRunner(CommandRunner):
             enablepw,
             port,
             cmds,
-            r"^SSH@%s(?:\([\w-]*\))?%s(?P<cmd>.*)",
+            BROCADE_PROMPT,
             "\r\n",
             timeout,
             private_key,
             priv,
+            pool,
         )
 
     def exit(self):
@@ -391,6 +744,7 @@ class RuckusCommandRunner(CommandRunner):
         timeout=None,
         private_key=False,
         priv=False,
+        pool=None,
     ):
         super(RuckusCommandRunner, self).__init__(
             user,
@@ -398,24 +752,26 @@ class RuckusCommandRunner(CommandRunner):
             enablepw,
             port,
             cmds,
-            r"^SSH@%s(?:\([-/\w]*\))?%s(?P<cmd>.*)",
+            RUCKUS_PROMPT,
             "\n",
             timeout,
             private_key,
             priv,
+            pool,
         )
 
-    def enter(self):
-        # This doesn't seem to work.  If we do this, we freeze during the output.
-        #     self.exec_cmd('skip', False)
-        #
-        if self.priv:
-            # We do this only to get the mode.
-            self.exec_cmd("show clock")
-            if self.mode == ">":
-                self.exec_cmd("enable %s" % self.enablepw)
-                if self.mode != "#":
-                    raise IOError("Bad enable password!")
+    # This doesn't seem to work.  If we do this, we freeze during the output.
+    #     def enter(self):
+    #         self.exec_cmd('skip', False)
+    #
+    def enable(self):
+        # The mode is known from the prompt of the session, new or pooled
+        if self.priv and self.mode == ">":
+            if self.enablepw is None and self.ask_enablepw is not None:
+                self.enablepw = self.ask_enablepw()
+            self.exec_cmd("enable %s" % self.enablepw)
+            if self.mode != "#":
+                raise IOError("Bad enable password!")
 
     def exit(self):
         self.chan.send("exit%s" % self.terminator)
@@ -506,12 +862,38 @@ def parse_cli():
     utils.add_ssh_opts(brocade_parser)
     utils.add_ssh_opts(arista_parser)
 
+    # Add the options for running on many hosts at once
+    for sub_parser in (cisco_parser, brocade_parser, arista_parser, digi_parser):
+        utils.add_fleet_opts(sub_parser)
+
     # Add the default logger options
     utils.add_log_opts(parser)
 
     return parser.parse_args()
 
 
+def run_host(cmd_run, host, started):
+    """
+    Run the commands of cmd_run on host, noting when we started in started.
+    """
+    started[host] = time.monotonic()
+    return cmd_run.run(host)
+
+
+def wait_host(future, started, host, deadline):
+    """
+    Wait for the run on host, giving up deadline seconds after it started.
+    """
+    while True:
+        try:
+            return future.result(timeout=0.5)
+        except concurrent.futures.TimeoutError:
+            start = started.get(host)
+            if deadline is not None and start is not None:
+                if time.monotonic() - start > deadline:
+                    raise
+
+
 def main():
     # grab the command line opts
     args = parse_cli()
@@ -529,18 +911,27 @@ def main():
         ", ".join(args.cmds),
     )
 
+    # Each host gets a runner of its own, so hosts can run at the same time
     if hasattr(args, "private_key"):
-        cmd_run = args.cmd_run(
+        make_cmd_run = functools.partial(
+            args.cmd_run,
             args.user,
             passwd,
+            None,
             args.port,
             args.cmds,
             timeout=args.timeout,
             private_key=args.private_key,
         )
     else:
-        cmd_run = args.cmd_run(
-            args.user, passwd, args.port, args.cmds, timeout=args.timeout
+        make_cmd_run = functools.partial(
+            args.cmd_run,
+            args.user,
+            passwd,
+            None,
+            args.port,
+            args.cmds,
+            timeout=args.timeout,
         )
 
     # if no hosts are specified try to get a list from netconfig
@@ -566,30 +957,53 @@ def main():
 
     fails = 0
     failed_hosts = []
+    started = {}
+    runs = {}
 
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(args.jobs, 1))
     for host in good_devices:
+        if args.subset is None or host in args.subset:
+            LOG.info("Running command(s) %s on %s", ", ".join(args.cmds), host)
+            cmd_run = make_cmd_run()
+            if hasattr(cmd_run, "deadline"):
+                cmd_run.deadline = args.deadline
+            runs[host] = (cmd_run, executor.submit(run_host, cmd_run, host, started))
+        else:
+            LOG.warning(
+                "Not running command(s) %s on %s since device type does not match",
+                ", ".join(args.cmds),
+                host,
+            )
+
+    # Output is printed per host, in the order of the host list
+    for host, (cmd_run, future) in runs.items():
         try:
-            if args.subset is None or host in args.subset:
-                LOG.info("Running command(s) %s on %s", ", ".join(args.cmds), host)
-                status_code, output = cmd_run.run(host)
-                if status_code == 0:
-                    sys.stdout.write(output)
-                    sys.stdout.flush()
-                else:
-                    LOG.warn("Commands returned non-zero status code")
-                    sys.stderr.write(output)
-                    sys.stderr.flush()
-            else:
-                LOG.warning(
-                    "Not running command(s) %s on %s since device type does not match",
-                    ", ".join(args.cmds),
-                    host,
+            status_code, output = wait_host(future, started, host, args.deadline)
+            if args.prefix:
+                output = "".join(
+                    "%s: %s" % (host, line) for line in output.splitlines(True)
                 )
-        except (SSHException, socket.error) as err:
+            if status_code == 0:
+                sys.stdout.write(output)
+                sys.stdout.flush()
+            else:
+                LOG.warn("Commands returned non-zero status code")
+                sys.stderr.write(output)
+                sys.stderr.flush()
+        except concurrent.futures.TimeoutError:
+            fails += 1
+            failed_hosts.append(host)
+            LOG.error("Timed out after %g seconds on %s", args.deadline, host)
+            LOG.error("Skipping running command on %s", host)
+            # Makes the worker give up, even mid connect, so the interpreter
+            # isn't left waiting for it at exit
+            cmd_run.close()
+        except (SSHException, socket.error, EOFError) as err:
             fails += 1
             failed_hosts.append(host)
             LOG.error("Failure connecting to %s: %s", host, err)
             LOG.error("Skipping running command on %s", host)
+    executor.shutdown(wait=False)
 
     if fails != 0:
         LOG.error(
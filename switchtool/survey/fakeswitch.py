@@ -0,0 +1,862 @@
+"""
+An SSH server that pretends to be one or more switches.
+
+This lets the survey code, and everything built on it, be run and timed
+without real hardware.  Each FakeSwitch answers the commands the surveyers
+and Switch send, with the prompts, pagination and enable mode of its
+vendor, and its tables can be made as big as a full stack:
+
+    switch = FakeSwitch("ruckus", units=12, macs=5000, enablepw="secret")
+    with FakeSwitchServer(switch) as server:
+        surveyer = RuckusSurveyer("pcds", "pw", "secret", port=server.port)
+        surveyer.collect_all(switch.hostname)
+
+Latency and faults (refused logins, dropped connections and commands that
+never finish) can be injected to see how the callers cope.  serve_fleet
+starts many switches on consecutive ports, and running this module starts
+a fleet from the command line.
+"""
+
+import argparse
+import json
+import logging
+import random
+import re
+import socket
+import threading
+import time
+
+import paramiko
+
+from .utils import convert_eth, short_interface
+
+logger = logging.getLogger(__name__)
+
+# The pagination prompt of the Brocade/Ruckus, as expected by the runners
+MORE_PROMPT = "--More--, next page: Space, next line: Return key, quit: Control-c"
+
+# The Brocade/Ruckus need a name without digits in "show vlan"
+VLAN_NAMES = ["DAQ", "CONTROLS", "DEVICES", "DETECTOR", "LASER", "MOTION", "CAMERA"]
+
+_host_key = None
+_host_key_lock = threading.Lock()
+
+
+def host_key():
+    """
+    The host key of the fake switches, generated once per process.
+    """
+    global _host_key
+    with _host_key_lock:
+        if _host_key is None:
+            _host_key = paramiko.RSAKey.generate(2048)
+        return _host_key
+
+
+class FakeSwitch:
+    """
+    The tables and command line of one emulated switch.
+
+    The state is shared by every session on the switch, so changes made with
+    privileged commands show up in later surveys.
+
+    Parameters
+    ----------
+    vendor : str
+        One of "brocade", "ruckus", "cisco" or "arista".
+
+    hostname : str, optional
+        The name in the prompt.  The runners expect this to be the host they
+        connected to.
+
+    units : int, optional
+        The number of units in the stack.
+
+    ports : int, optional
+        The number of ports on each unit.
+
+    macs : int, optional
+        The number of MAC addresses learnt, spread over the ports.  Defaults
+        to one per port.
+
+    vlans : int, optional
+        The number of VLANs, including the default VLAN.  The ports are spread
+        over the VLANs other than the default one.
+
+    user, pw : str, optional
+        The login accepted by the switch.  Any login is accepted if pw is None.
+
+    enablepw : str, optional
+        If set, sessions start in user mode and this is needed to "enable".
+
+    page_lines : int, optional
+        Lines of output between --More-- prompts, 0 to never paginate.
+        Defaults to 24 for the Brocade/Ruckus, which the runners page
+        through, and 0 for the others, which have paging turned off.
+
+    latency : float, optional
+        Seconds before the output of each command is sent.
+
+    refuse_rate, drop_rate, stall_rate : float, optional
+        Probability that a connection is refused, that a command drops the
+        connection halfway through its output, or that a command never
+        finishes.
+
+    seed : int, optional
+        Seed for the generated tables and the injected faults.
+    """
+
+    def __init__(
+        self,
+        vendor,
+        hostname="127.0.0.1",
+        units=1,
+        ports=48,
+        macs=None,
+        vlans=4,
+        user=None,
+        pw=None,
+        enablepw=None,
+        page_lines=None,
+        latency=0.0,
+        refuse_rate=0.0,
+        drop_rate=0.0,
+        stall_rate=0.0,
+        seed=0,
+    ):
+        if vendor not in ("brocade", "ruckus", "cisco", "arista"):
+            raise ValueError("{:} is not a valid switch type".format(vendor))
+        self.vendor = vendor
+        self.hostname = hostname
+        self.user = user
+        self.pw = pw
+        self.enablepw = enablepw
+        if page_lines is None:
+            page_lines = 24 if vendor in ("brocade", "ruckus") else 0
+        self.page_lines = page_lines
+        self.latency = latency
+        self.refuse_rate = refuse_rate
+        self.drop_rate = drop_rate
+        self.stall_rate = stall_rate
+        self.lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._build(units, ports, ports * units if macs is None else macs, vlans)
+
+    def _build(self, units, ports, macs, vlans):
+        """
+        Generate the port, VLAN, MAC, PoE and port-name tables.
+        """
+        rng = self._rng
+        self.ports = []
+        for unit in range(1, units + 1):
+            for n in range(1, ports + 1):
+                if self.vendor in ("brocade", "ruckus"):
+                    self.ports.append("%d/1/%d" % (unit, n))
+                elif self.vendor == "cisco":
+                    self.ports.append("Gi%d/%d" % (unit - 1, n))
+                else:
+                    self.ports.append("Et%d" % ((unit - 1) * ports + n))
+        # VLAN 1 is the default, the rest are numbered from 100 so that
+        # they have three digits in the Cisco/Arista MAC tables.
+        self.vlan_names = {
+            "1": "DEFAULT-VLAN" if self.vendor in ("brocade", "ruckus") else "default"
+        }
+        for i in range(vlans - 1):
+            name = VLAN_NAMES[i % len(VLAN_NAMES)]
+            if i >= len(VLAN_NAMES):
+                name += "-" + chr(ord("A") + i // len(VLAN_NAMES) - 1)
+            self.vlan_names[str(100 + i)] = name
+        data_vlans = [v for v in self.vlan_names if v != "1"] or ["1"]
+        self.port_vlan = {
+            port: data_vlans[i % len(data_vlans)] for i, port in enumerate(self.ports)
+        }
+        # MAC addresses, as (mac, port) in the order the switch lists them
+        self.macs = []
+        for i in range(macs):
+            port = self.ports[i % len(self.ports)]
+            mac = "%04x.%04x.%04x" % (0x0050, rng.getrandbits(16), i & 0xFFFF)
+            self.macs.append((mac, port))
+        used = {port for _, port in self.macs}
+        self.power = {}
+        self.labels = {}
+        for port in self.ports:
+            if port in used:
+                self.power[port] = ["On", rng.choice(["On", "Off", "Non-PD"])]
+                self.labels[port] = "dev-%s" % re.sub(r"\W", "-", port)
+            else:
+                self.power[port] = ["On", "Off"]
+
+    def chance(self, rate):
+        """
+        Whether a fault with probability rate happens this time.
+        """
+        if not rate:
+            return False
+        with self.lock:
+            return self._rng.random() < rate
+
+    def prompt(self, mode, context=None):
+        """
+        The prompt for a session in mode ('#' or '>') and config context.
+        """
+        context = "(%s)" % context if context else ""
+        if self.vendor in ("brocade", "ruckus"):
+            return "SSH@%s%s%s" % (self.hostname, context, mode)
+        return "%s%s%s" % (self.hostname, context, mode)
+
+    def interface_context(self, port):
+        if self.vendor == "brocade":
+            # The Brocade runner doesn't expect a "/" in the prompt
+            return "config-if-e1000"
+        return "config-if-e1000-%s" % port
+
+    # Output of the show commands.  Each returns a list of lines, the Arista
+    # ones as JSON if structured.
+
+    @staticmethod
+    def _json(data):
+        return json.dumps(data, indent=2).splitlines()
+
+    @staticmethod
+    def _interface(port):
+        """
+        The full name of an Arista port, as in the JSON output.
+        """
+        return "Ethernet" + port[2:]
+
+    def show_vlan(self, vlan_no=None, structured=False):
+        vlans = [v for v in self.vlan_names if vlan_no in (None, v)]
+        if structured:
+            return self._json(
+                {
+                    "vlans": {
+                        vlan: {
+                            "name": self.vlan_names[vlan],
+                            "status": "active",
+                            "dynamic": False,
+                            "interfaces": {
+                                self._interface(p): {"privatePromoted": False}
+                                for p in self._vlan_ports(vlan)
+                            },
+                        }
+                        for vlan in vlans
+                    },
+                    "sourceDetail": "",
+                }
+            )
+        if self.vendor in ("brocade", "ruckus"):
+            return self._brocade_vlan(vlans)
+        return self._table_vlan(vlans)
+
+    def _vlan_ports(self, vlan):
+        return [p for p in self.ports if self.port_vlan[p] == vlan]
+
+    def _brocade_vlan(self, vlans):
+        lines = [
+            "",
+            "Total PORT-VLAN entries: %d" % len(self.vlan_names),
+            "Maximum PORT-VLAN entries: 4095",
+            "",
+            "Legend: [Stk=Stack-Id, S=Slot]",
+            "",
+        ]
+        for vlan in vlans:
+            lines.append(
+                "PORT-VLAN %s, Name %s, Priority level0, Spanning tree Off"
+                % (vlan, self.vlan_names[vlan])
+            )
+            by_unit = {}
+            for port in self._vlan_ports(vlan):
+                unit, module, n = port.split("/")
+                by_unit.setdefault((unit, module), []).append(n)
+            if not by_unit:
+                lines.append(" Untagged Ports: None")
+            for (unit, module), nums in by_unit.items():
+                for i in range(0, len(nums), 16):
+                    lines.append(
+                        " Untagged Ports: (U%s/M%s) %s"
+                        % (unit, module, " ".join("%3s" % n for n in nums[i : i + 16]))
+                    )
+            lines.extend(
+                [
+                    "   Tagged Ports: None",
+                    "   Uplink Ports: None",
+                    " DualMode Ports: None",
+                    " Mac-Vlan Ports: None",
+                    "     Monitoring: None",
+                    "",
+                ]
+            )
+        return lines
+
+    def _table_vlan(self, vlans):
+        lines = [
+            "VLAN  Name                             Status    Ports",
+            "----- -------------------------------- --------- "
+            "-------------------------------",
+        ]
+        for vlan in vlans:
+            ports = self._vlan_ports(vlan)
+            rows = [", ".join(ports[i : i + 6]) for i in range(0, len(ports), 6)]
+            rows = [row + "," for row in rows[:-1]] + rows[-1:] or [""]
+            lines.append(
+                "%-5s %-32s %-9s %s" % (vlan, self.vlan_names[vlan], "active", rows[0])
+            )
+            lines.extend("%49s %s" % ("", row) for row in rows[1:])
+        return lines
+
+    def show_mac(self, vlan_no=None, port=None, structured=False):
+        macs = [
+            (mac, p)
+            for mac, p in self.macs
+            if port in (None, p) and vlan_no in (None, self.port_vlan[p])
+        ]
+        if structured:
+            entries = [
+                {
+                    "vlanId": int(self.port_vlan[p]),
+                    "macAddress": convert_eth(mac),
+                    "entryType": "dynamic",
+                    "interface": self._interface(p),
+                    "moves": 1,
+                    "lastMove": 1700000000.0,
+                }
+                for mac, p in macs
+            ]
+            return self._json(
+                {
+                    "unicastTable": {"tableEntries": entries},
+                    "multicastTable": {"tableEntries": []},
+                }
+            )
+        if self.vendor in ("brocade", "ruckus"):
+            lines = [
+                "Total active entries from all ports = %d" % len(macs),
+                "MAC-Address     Port           Type          VLAN",
+            ]
+            lines.extend(
+                "%-15s %-14s Dynamic       %s" % (mac, p, self.port_vlan[p])
+                for mac, p in macs
+            )
+            return lines
+        lines = [
+            "          Mac Address Table",
+            "-------------------------------------------",
+            "",
+            "Vlan    Mac Address       Type        Ports",
+            "----    -----------       --------    -----",
+        ]
+        lines.extend(
+            "%4s    %-14s    DYNAMIC     %s" % (self.port_vlan[p], mac, p)
+            for mac, p in macs
+        )
+        lines.append("Total Mac Addresses for this criterion: %d" % len(macs))
+        return lines
+
+    def show_power(self, port=None, structured=False):
+        if structured:
+            states = {"On": "powered", "Off": "detecting", "Non-PD": "detecting"}
+            return self._json(
+                {
+                    "poePorts": {
+                        self._interface(p): {
+                            "portPresent": True,
+                            "portState": states[oper] if admin == "On" else "disabled",
+                            "grantedPower": 30.0,
+                        }
+                        for p, (admin, oper) in self.power.items()
+                        if port in (None, p)
+                    }
+                }
+            )
+        lines = [
+            " Port   Admin    Oper    ---Power(mW)--- PD Type  PD Class  Pri  Fault/",
+            "        State    State   Consumed  Allocated                       Error",
+            "-" * 76,
+        ]
+        for p in self.ports:
+            if port in (None, p):
+                admin, oper = self.power[p]
+                used = "4100" if oper == "On" else "0"
+                lines.append(
+                    " %-6s %-8s %-7s %-9s 30000     802.3at  Class 4   3    n/a"
+                    % (p, admin, oper, used)
+                )
+        return lines
+
+    def show_labels(self, port=None, structured=False):
+        if structured:
+            macs = dict((p, mac) for mac, p in self.macs)
+            return self._json(
+                {
+                    "interfaceDescriptions": {
+                        self._interface(p): {
+                            "description": self.labels.get(p, ""),
+                            "interfaceStatus": "up" if p in macs else "down",
+                            "lineProtocolStatus": "up" if p in macs else "down",
+                        }
+                        for p in self.ports
+                        if port in (None, p)
+                    }
+                }
+            )
+        lines = [
+            "Port       Link    State   Dupl Speed Trunk Tag Pvid Pri MAC"
+            "             Name"
+        ]
+        macs = dict((p, mac) for mac, p in self.macs)
+        for p in self.ports:
+            if port in (None, p):
+                up = p in macs
+                lines.append(
+                    "%-10s %-7s %-7s %-4s %-5s None  No  %-4s 0   %-15s %s"
+                    % (
+                        p,
+                        "Up" if up else "Down",
+                        "Forward" if up else "None",
+                        "Full" if up else "None",
+                        "1G" if up else "None",
+                        self.port_vlan[p],
+                        macs.get(p, "609c.9f00.0000"),
+                        self.labels.get(p, ""),
+                    )
+                )
+        return lines
+
+
+class FakeShell:
+    """
+    The command line of one session on a FakeSwitch.
+    """
+
+    def __init__(self, switch, chan):
+        self.switch = switch
+        self.chan = chan
+        self.mode = ">" if switch.enablepw else "#"
+        self.enabled = False
+        # Stack of (context, port or VLAN) of the config modes we are in
+        self.contexts = []
+        self.paging = switch.page_lines
+        self._rbuffer = b""
+        self._skip_lf = False
+
+    def send(self, text):
+        self.chan.sendall(text.encode("utf-8"))
+
+    def readline(self):
+        """
+        Read a line of input, None once the client has gone away.
+        """
+        while True:
+            m = re.search(b"[\r\n]", self._rbuffer)
+            if m:
+                idx = m.start()
+                line = self._rbuffer[:idx].decode("utf-8", "replace")
+                self._skip_lf = self._rbuffer[idx : idx + 1] == b"\r"
+                self._rbuffer = self._rbuffer[idx + 1 :]
+                if self._skip_lf and self._rbuffer[:1] == b"\n":
+                    self._rbuffer = self._rbuffer[1:]
+                    self._skip_lf = False
+                return line
+            d = self.chan.recv(4096)
+            if not d:
+                return None
+            if self._skip_lf and d[:1] == b"\n":
+                d = d[1:]
+            self._skip_lf = False
+            self._rbuffer += d
+
+    def prompt(self):
+        context = self.contexts[-1][0] if self.contexts else None
+        return self.switch.prompt(self.mode, context)
+
+    def run(self):
+        """
+        Answer commands until the client exits or goes away.
+        """
+        self.send(self.prompt())
+        while not self.chan.closed:
+            line = self.readline()
+            if line is None:
+                return
+            self.send(line + "\r\n")
+            cmd = line.strip()
+            if not cmd:
+                self.send(self.prompt())
+                continue
+            if self.switch.latency:
+                time.sleep(self.switch.latency)
+            if self.switch.chance(self.switch.stall_rate):
+                logger.debug("%s: stalling on %r", self.switch.hostname, cmd)
+                while self.readline() is not None:
+                    pass
+                return
+            try:
+                with self.switch.lock:
+                    output = self.execute(cmd)
+            except EOFError:
+                return
+            if not self.output(output):
+                return
+            self.send(self.prompt())
+
+    def output(self, lines):
+        """
+        Send the lines of output, paginating if needed.
+
+        Returns False if the session ended while doing so.
+        """
+        if self.switch.chance(self.switch.drop_rate):
+            logger.debug("%s: dropping the connection", self.switch.hostname)
+            self.send("".join(line + "\r\n" for line in lines[: len(lines) // 2]))
+            self.chan.get_transport().close()
+            return False
+        # Send a page at a time, like the switch does
+        size = self.paging or max(len(lines), 1)
+        for start in range(0, len(lines), size):
+            page = "".join(line + "\r\n" for line in lines[start : start + size])
+            if start:
+                # Erase the --More-- prompt first
+                page = "\x08" + " \x08\x08" * (len(MORE_PROMPT) - 1) + " \x08" + page
+            if start + size < len(lines):
+                page += MORE_PROMPT
+            self.send(page)
+            if start + size < len(lines) and self.readline() is None:
+                return False
+        return True
+
+    def execute(self, cmd):
+        """
+        Run cmd, returning its output lines.
+        """
+        sw = self.switch
+        words = cmd.split()
+        # The Arista runner turns off paging with every command
+        if words[-2:] == ["|", "no-more"]:
+            words = words[:-2]
+        structured = sw.vendor == "arista" and words[-2:] == ["|", "json"]
+        if structured:
+            words = words[:-2]
+        cmd = " ".join(words)
+
+        if cmd == "exit":
+            if self.contexts:
+                self.contexts.pop()
+            elif self.enabled:
+                self.mode = ">"
+                self.enabled = False
+            else:
+                self.chan.close()
+                raise EOFError
+            return []
+        if words[0] == "enable":
+            if sw.enablepw is None or words[1:] == [sw.enablepw]:
+                if self.mode == ">":
+                    self.enabled = True
+                self.mode = "#"
+                return []
+            return ["Error - Invalid password"]
+        if cmd in ("terminal length 0", "skip-page-display"):
+            self.paging = 0
+            return []
+        if cmd == "show clock":
+            return [time.strftime("%H:%M:%S.000 GMT+00 %a %b %d %Y", time.gmtime())]
+
+        m = re.match(r"show vlan(?: (\d+))?$", cmd)
+        if m:
+            return sw.show_vlan(m.group(1), structured)
+        m = re.match(
+            r"show mac(?:-address| address-table)"
+            r"(?: vlan (\d+)| ethernet (\S+)| interface (\S+))?$",
+            cmd,
+        )
+        if m:
+            port = m.group(2) or m.group(3)
+            port = port and short_interface(port)
+            return sw.show_mac(m.group(1), port, structured)
+        m = re.match(r"show poe(?: interface (\S+))?$", cmd)
+        if m and structured:
+            return sw.show_power(m.group(1) and short_interface(m.group(1)), True)
+        m = re.match(r"show interfaces(?: (\S+))? description$", cmd)
+        if m and structured:
+            return sw.show_labels(m.group(1) and short_interface(m.group(1)), True)
+        m = re.match(r"show inline power(?: (\S+))?$", cmd)
+        if m and sw.vendor == "ruckus":
+            return sw.show_power(m.group(1))
+        m = re.match(r"show interfaces brief(?: ethernet (\S+))?$", cmd)
+        if m and sw.vendor == "ruckus":
+            return sw.show_labels(m.group(1))
+
+        # Everything else needs privileges
+        if self.mode != "#":
+            return ["Invalid input -> %s" % cmd, "Type ? for a list"]
+        return self.configure(words)
+
+    def configure(self, words):
+        """
+        Run a privileged command, changing the switch tables.
+        """
+        sw = self.switch
+        cmd = " ".join(words)
+        context, target = self.contexts[-1] if self.contexts else (None, None)
+        negate = words[0] == "no"
+        if negate:
+            words = words[1:]
+
+        if cmd == "write memory":
+            return ["Write startup-config done."]
+        if not self.contexts and words[:1] in (["config"], ["configure"]):
+            self.contexts.append(("config", None))
+            return []
+        if context == "config" and words[0] == "interface" and words[-1] in sw.ports:
+            self.contexts.append((sw.interface_context(words[-1]), words[-1]))
+            return []
+        if context == "config" and words[0] == "vlan" and len(words) == 2:
+            if words[1] not in sw.vlan_names:
+                sw.vlan_names[words[1]] = "NEW"
+            self.contexts.append(("config-vlan-%s" % words[1], words[1]))
+            return []
+        if context and context.startswith("config-vlan") and words[0] == "untag":
+            port = words[-1]
+            if port in sw.ports:
+                sw.port_vlan[port] = "1" if negate else target
+                return []
+        if context and context.startswith("config-if") and target:
+            if words == ["inline", "power"]:
+                sw.power[target][1] = "Off" if negate else "On"
+                sw.power[target][0] = "Off" if negate else "On"
+                return []
+            if words[0] == "port-name":
+                if negate:
+                    sw.labels.pop(target, None)
+                else:
+                    sw.labels[target] = "_".join(words[1:])
+                return []
+        return ["Invalid input -> %s" % cmd, "Type ? for a list"]
+
+
+class _ServerInterface(paramiko.ServerInterface):
+    def __init__(self, switch):
+        self.switch = switch
+        self.shell_requested = threading.Event()
+
+    def get_allowed_auths(self, username):
+        return "password"
+
+    def check_auth_password(self, username, password):
+        sw = self.switch
+        if sw.pw is None or (sw.user in (None, username) and password == sw.pw):
+            return paramiko.AUTH_SUCCESSFUL
+        return paramiko.AUTH_FAILED
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(
+        self, channel, term, width, height, pixelwidth, pixelheight, modes
+    ):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        self.shell_requested.set()
+        return True
+
+
+class FakeSwitchServer:
+    """
+    Serve a FakeSwitch over SSH from a background thread.
+
+    Parameters
+    ----------
+    switch : FakeSwitch
+        The switch to serve.
+
+    address : str, optional
+        The address to listen on.
+
+    port : int, optional
+        The port to listen on, by default any free port.  The port picked is
+        in the port attribute once started.
+    """
+
+    def __init__(self, switch, address="127.0.0.1", port=0):
+        self.switch = switch
+        self.address = address
+        self.port = port
+        self._sock = None
+        self._thread = None
+        self._transports = set()
+        self._lock = threading.Lock()
+
+    def start(self):
+        host_key()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.address, self.port))
+        self._sock.listen(128)
+        self.port = self._sock.getsockname()[1]
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        logger.info(
+            "Serving %s switch %s on %s:%d",
+            self.switch.vendor,
+            self.switch.hostname,
+            self.address,
+            self.port,
+        )
+        return self
+
+    def stop(self):
+        """
+        Stop listening and drop every open session.
+        """
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        with self._lock:
+            transports = list(self._transports)
+        for transport in transports:
+            transport.close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _serve(self):
+        while self._sock is not None:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return
+            if self.switch.chance(self.switch.refuse_rate):
+                logger.debug("%s: refusing a connection", self.switch.hostname)
+                conn.close()
+                continue
+            threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+    def _handle(self, conn):
+        # Don't let Nagle hold back the pages and prompts
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        transport = paramiko.Transport(conn)
+        with self._lock:
+            self._transports.add(transport)
+        try:
+            transport.add_server_key(host_key())
+            server = _ServerInterface(self.switch)
+            transport.start_server(server=server)
+            chan = transport.accept(20)
+            if chan is None or not server.shell_requested.wait(10):
+                return
+            FakeShell(self.switch, chan).run()
+        except (EOFError, OSError, paramiko.SSHException):
+            logger.debug("Session on %s ended", self.switch.hostname, exc_info=True)
+        finally:
+            transport.close()
+            with self._lock:
+                self._transports.discard(transport)
+
+
+def serve_fleet(switches, address="127.0.0.1", base_port=0):
+    """
+    Start a FakeSwitchServer for each switch.
+
+    The switches are served on consecutive ports from base_port, or on any
+    free ports if base_port is 0.  Returns the started servers.
+    """
+    servers = []
+    for i, switch in enumerate(switches):
+        port = base_port + i if base_port else 0
+        servers.append(FakeSwitchServer(switch, address, port).start())
+    return servers
+
+
+def parse_cli():
+    parser = argparse.ArgumentParser(
+        description="Serve fake switches over SSH, for testing and benchmarking."
+    )
+    parser.add_argument(
+        "vendor", choices=["brocade", "ruckus", "cisco", "arista"], help="Switch type"
+    )
+    parser.add_argument(
+        "-n", "--count", type=int, default=1, help="The number of switches to serve"
+    )
+    parser.add_argument(
+        "-a", "--address", default="127.0.0.1", help="The address to listen on"
+    )
+    parser.add_argument(
+        "-p",
+        "--base-port",
+        type=int,
+        default=2200,
+        help="The port of the first switch, the others follow (default: 2200)",
+    )
+    parser.add_argument(
+        "--hostname", help="The name in the prompts (default: the address)"
+    )
+    parser.add_argument("--units", type=int, default=1, help="Units in each stack")
+    parser.add_argument("--ports", type=int, default=48, help="Ports on each unit")
+    parser.add_argument("--macs", type=int, help="MAC addresses on each switch")
+    parser.add_argument("--vlans", type=int, default=4, help="VLANs on each switch")
+    parser.add_argument("-u", "--user", help="The login user (default: any)")
+    parser.add_argument("--pswd", help="The login password (default: any)")
+    parser.add_argument("--enablepw", help="Start in user mode, with this enable")
+    parser.add_argument("--page-lines", type=int, help="Lines between --More--")
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="Seconds before each output"
+    )
+    parser.add_argument(
+        "--refuse-rate", type=float, default=0.0, help="Chance of refusing a login"
+    )
+    parser.add_argument(
+        "--drop-rate", type=float, default=0.0, help="Chance a command drops"
+    )
+    parser.add_argument(
+        "--stall-rate", type=float, default=0.0, help="Chance a command hangs"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--log", default="INFO", help="Log level (default: INFO)", type=str.upper
+    )
+    return parser.parse_args()
+
+
+def main():
+    args = parse_cli()
+    logging.basicConfig(level=args.log)
+    switches = [
+        FakeSwitch(
+            args.vendor,
+            hostname=args.hostname or args.address,
+            units=args.units,
+            ports=args.ports,
+            macs=args.macs,
+            vlans=args.vlans,
+            user=args.user,
+            pw=args.pswd,
+            enablepw=args.enablepw,
+            page_lines=args.page_lines,
+            latency=args.latency,
+            refuse_rate=args.refuse_rate,
+            drop_rate=args.drop_rate,
+            stall_rate=args.stall_rate,
+            seed=args.seed + i,
+        )
+        for i in range(args.count)
+    ]
+    servers = serve_fleet(switches, args.address, args.base_port)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for server in servers:
+            server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+A compact table of the MAC addresses seen across many switches.
+
+The Switch objects keep their devices in nested dicts keyed by strings,
+which is fine for one switch but slow and bulky for site wide questions.
+MacTable holds the MAC address table of a whole fleet as columns of numpy
+arrays instead: the MAC addresses as 48-bit integers, and the switch names
+and ports interned to small integers.  It can be joined against a HostIndex,
+a snapshot of the sdfconfig MAC address -> host -> subnet mapping, with
+array operations:
+
+    table = MacTable.from_snapshots(
+        {host: surveyer.collect_all(host) for host in hosts}
+    )
+    index = HostIndex.from_sdfconfig(SdfconfigIndex.from_sdfconfig())
+    for entry in table.misplaced(index, vlan_subnets):
+        print(entry.host, "belongs on", entry.subnet)
+"""
+
+import collections
+
+import numpy as np
+
+Entry = collections.namedtuple("Entry", ["switch", "port", "vlan", "mac"])
+Misplaced = collections.namedtuple(
+    "Misplaced", ["switch", "port", "vlan", "mac", "host", "subnet"]
+)
+
+
+def mac_to_int(mac):
+    """
+    Convert a MAC address, "xx:xx:xx:xx:xx:xx" or "xxxx.xxxx.xxxx", to an int.
+    """
+    return int(mac.replace(":", "").replace(".", ""), 16)
+
+
+def int_to_mac(value):
+    """
+    Convert an int back to a "xx:xx:xx:xx:xx:xx" MAC address.
+    """
+    h = "%012x" % value
+    return ":".join(h[i : i + 2] for i in range(0, 12, 2))
+
+
+class Interner:
+    """
+    Give each distinct value a small integer id, in order of appearance.
+    """
+
+    def __init__(self, values=()):
+        self.values = []
+        self.ids = {}
+        for value in values:
+            self.intern(value)
+
+    def intern(self, value):
+        """
+        The id of value, adding it if it is new.
+        """
+        try:
+            return self.ids[value]
+        except KeyError:
+            self.ids[value] = len(self.values)
+            self.values.append(value)
+            return self.ids[value]
+
+    def __getitem__(self, i):
+        return self.values[i]
+
+    def __len__(self):
+        return len(self.values)
+
+
+class HostIndex:
+    """
+    A snapshot of which host each MAC address belongs to, and its subnet.
+
+    Parameters
+    ----------
+    hosts : dict
+        {mac_address: (host, subnet)}
+    """
+
+    def __init__(self, hosts):
+        self.hosts = Interner()
+        self.subnets = Interner()
+        macs = np.fromiter((mac_to_int(m) for m in hosts), np.uint64, len(hosts))
+        host = np.fromiter(
+            (self.hosts.intern(h) for h, _ in hosts.values()), np.int32, len(hosts)
+        )
+        subnet = np.fromiter(
+            (self.subnets.intern(s) for _, s in hosts.values()), np.int32, len(hosts)
+        )
+        # Sorted by MAC address, for searchsorted
+        order = np.argsort(macs)
+        self.macs = macs[order]
+        self.host = host[order]
+        self.subnet = subnet[order]
+
+    @classmethod
+    def from_sdfconfig(cls, index):
+        """
+        Build the index from an sdfindex.SdfconfigIndex.
+        """
+        return cls(index.mac_hosts())
+
+    def __len__(self):
+        return len(self.macs)
+
+    def lookup(self, macs):
+        """
+        The row of each of an array of MAC addresses, -1 for those not known.
+        """
+        if not len(self.macs):
+            return np.full(len(macs), -1, np.intp)
+        rows = np.searchsorted(self.macs, macs)
+        rows[rows == len(self.macs)] = 0
+        return np.where(self.macs[rows] == macs, rows, -1)
+
+
+class MacTable:
+    """
+    The MAC addresses found on the untagged ports of many switches.
+
+    The columns are numpy arrays, one entry per MAC address: mac holds the
+    address as an integer, switch and port the ids of the names in the
+    switches and ports Interners, and vlan the VLAN number.
+    """
+
+    def __init__(self, mac, switch, port, vlan, switches, ports):
+        self.mac = mac
+        self.switch = switch
+        self.port = port
+        self.vlan = vlan
+        self.switches = switches
+        self.ports = ports
+
+    @classmethod
+    def from_rows(cls, rows, switches, ports):
+        """
+        Build a table from (mac, switch id, port id, vlan) integer rows.
+        """
+        rows = np.array(rows, np.uint64).reshape(-1, 4)
+        return cls(
+            rows[:, 0],
+            rows[:, 1].astype(np.int32),
+            rows[:, 2].astype(np.int32),
+            rows[:, 3].astype(np.uint16),
+            switches,
+            ports,
+        )
+
+    @classmethod
+    def from_snapshots(cls, snapshots):
+        """
+        Build a table from {switch name: snapshot}, with the "vlan" and "mac"
+        tables of Surveyer.collect_all in each snapshot.
+
+        MAC addresses on tagged ports, that are in no VLAN table, are left
+        out like Switch does.
+        """
+        switches, ports = Interner(), Interner()
+        rows = []
+        for name, snapshot in snapshots.items():
+            switch = switches.intern(name)
+            vlan_of = {
+                port: int(vlan_no)
+                for vlan_no, vlan_ports in snapshot["vlan"].items()
+                for port in vlan_ports
+            }
+            for port, mac in snapshot["mac"].items():
+                vlan = vlan_of.get(port)
+                if vlan is not None:
+                    rows.append((mac_to_int(mac), switch, ports.intern(port), vlan))
+        return cls.from_rows(rows, switches, ports)
+
+    @classmethod
+    def from_switches(cls, switches):
+        """
+        Build a table from Switch objects, as of their last update.
+        """
+        return cls.from_snapshots(
+            {
+                switch.name: {
+                    "vlan": {vlan._vlan_no: vlan.ports for vlan in switch._vlan},
+                    "mac": switch._mac,
+                }
+                for switch in switches
+            }
+        )
+
+    def __len__(self):
+        return len(self.mac)
+
+    def __iter__(self):
+        for mac, switch, port, vlan in zip(self.mac, self.switch, self.port, self.vlan):
+            yield Entry(
+                self.switches[switch], self.ports[port], str(vlan), int_to_mac(mac)
+            )
+
+    def select(self, mask):
+        """
+        The table of the entries selected by a boolean or index array.
+        """
+        return MacTable(
+            self.mac[mask],
+            self.switch[mask],
+            self.port[mask],
+            self.vlan[mask],
+            self.switches,
+            self.ports,
+        )
+
+    def join(self, index):
+        """
+        The (host, subnet) ids in the HostIndex of each entry, -1 if unknown.
+        """
+        if not len(index):
+            return np.full(len(self), -1, np.int32), np.full(len(self), -1, np.int32)
+        rows = index.lookup(self.mac)
+        known = rows >= 0
+        host = np.where(known, index.host[rows], -1)
+        subnet = np.where(known, index.subnet[rows], -1)
+        return host, subnet
+
+    def misplaced(self, index, vlan_subnets):
+        """
+        Find the known devices that are on the wrong subnet.
+
+        Parameters
+        ----------
+        index : HostIndex
+            The sdfconfig MAC address -> host -> subnet snapshot.
+
+        vlan_subnets : dict
+            {vlan_no: subnet}, like config/subnets.json.  Devices on VLANs
+            missing from it, or with a null subnet, are not checked.
+
+        Returns
+        -------
+        misplaced : list[Misplaced]
+            The entries of the devices, with the subnet they belong on.
+        """
+        host, subnet = self.join(index)
+        # The subnet id of each VLAN number: -1 if not checked, -2 if no host
+        # of the index is on its subnet.
+        expected = np.full(4096, -1, np.int32)
+        for vlan_no, name in vlan_subnets.items():
+            if name is None:
+                continue
+            expected[int(vlan_no)] = index.subnets.ids.get(name, -2)
+        vlan_subnet = expected[self.vlan]
+        rows = np.flatnonzero(
+            (host >= 0) & (vlan_subnet != -1) & (vlan_subnet != subnet)
+        )
+        return [
+            Misplaced(
+                self.switches[self.switch[i]],
+                self.ports[self.port[i]],
+                str(self.vlan[i]),
+                int_to_mac(self.mac[i]),
+                index.hosts[host[i]],
+                index.subnets[subnet[i]],
+            )
+            for i in rows
+        ]
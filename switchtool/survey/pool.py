@@ -0,0 +1,163 @@
+"""
+Pool of authenticated interactive SSH sessions, shared between command runners.
+
+Opening a session on a switch means a key exchange, a password login, an
+interactive shell and whatever vendor setup the runner needs (e.g. Cisco's
+"terminal length 0").  Doing this once per command dominates the time it
+takes to refresh a switch, so runners given a pool borrow an already open
+session for their host and hand it back afterwards instead of closing it.
+"""
+
+import atexit
+import logging
+import threading
+import time
+
+from .settings import SSH_CONF
+
+logger = logging.getLogger(__name__)
+
+
+class Session:
+    """
+    An open interactive shell on a switch.
+
+    Parameters
+    ----------
+    ssh : paramiko.SSHClient
+        The connected client that owns the transport.
+
+    chan : paramiko.Channel
+        The interactive shell opened on the client.
+    """
+
+    def __init__(self, ssh, chan):
+        self.ssh = ssh
+        self.chan = chan
+        # Set once the vendor specific setup (runner.enter) has been done
+        self.entered = False
+        # The last mode ('#' or '>') seen in a prompt of this session
+        self.mode = ""
+        # Unread data and the prompt we are sitting at, between runs
+        self.rbuffer = b""
+        self.prompt = ""
+        self.last_used = time.monotonic()
+
+    @property
+    def alive(self):
+        """
+        Whether the transport and shell are still open.
+        """
+        transport = self.ssh.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        return not (self.chan.closed or self.chan.exit_status_ready())
+
+    def close(self):
+        """
+        Close the shell and the underlying connection.
+        """
+        try:
+            self.chan.close()
+        finally:
+            self.ssh.close()
+
+
+class SessionPool:
+    """
+    Idle SSH sessions keyed by (host, port, user, vendor).
+
+    A session is checked out with `acquire` and must be given back with
+    `release` (or dropped with `discard`) once the caller is done with it, so
+    a session is never used by two runners at the same time.
+
+    Parameters
+    ----------
+    keepalive : float, optional
+        Interval in seconds between SSH keepalive packets sent on pooled
+        sessions, so that idle connections are not dropped by the switch.
+
+    max_idle : float, optional
+        Sessions that have not been used for longer than this many seconds
+        are closed instead of being reused.
+    """
+
+    def __init__(self, keepalive=None, max_idle=None):
+        if keepalive is None:
+            keepalive = SSH_CONF.get("keepalive", 30)
+        if max_idle is None:
+            max_idle = SSH_CONF.get("max_idle", 300)
+        self.keepalive = keepalive
+        self.max_idle = max_idle
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key):
+        """
+        Check out the idle session for key.
+
+        Returns None if there is no session for key, or if the pooled session
+        has dropped or been idle for too long; in that case the caller should
+        open a new one.
+        """
+        with self._lock:
+            session = self._sessions.pop(key, None)
+        if session is None:
+            return None
+        idle = time.monotonic() - session.last_used
+        if idle > self.max_idle or not session.alive:
+            logger.debug("Dropping stale session for %s", key[0])
+            self._close(session)
+            return None
+        logger.debug("Reusing session for %s", key[0])
+        return session
+
+    def release(self, key, session):
+        """
+        Return a session to the pool once a runner is done with it.
+        """
+        session.last_used = time.monotonic()
+        if not session.alive:
+            self._close(session)
+            return
+        transport = session.ssh.get_transport()
+        transport.set_keepalive(self.keepalive)
+        with self._lock:
+            previous = self._sessions.get(key)
+            if previous is None:
+                self._sessions[key] = session
+                return
+        # Another runner already put a session back for this key
+        self._close(session)
+
+    def discard(self, key, session):
+        """
+        Close a session that is in an unknown state instead of pooling it.
+        """
+        logger.debug("Discarding session for %s", key[0])
+        self._close(session)
+
+    def close(self, host=None):
+        """
+        Close the idle sessions for host, or every idle session.
+        """
+        with self._lock:
+            keys = [k for k in self._sessions if host is None or k[0] == host]
+            sessions = [self._sessions.pop(k) for k in keys]
+        for session in sessions:
+            self._close(session)
+
+    def __len__(self):
+        return len(self._sessions)
+
+    @staticmethod
+    def _close(session):
+        try:
+            session.close()
+        except Exception:
+            logger.debug("Error closing pooled session", exc_info=True)
+
+
+# Shared by every Switch in the process
+SESSION_POOL = SessionPool()
+atexit.register(SESSION_POOL.close)
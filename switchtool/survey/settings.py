@@ -30,6 +30,15 @@ SSH_CONF = {
     "timeout": 2.5,
     "private_key": False,
     "failed_backup_file": "failed_backups.pkl",
+    "keepalive": 30,  # seconds between keepalives on pooled sessions
+    "max_idle": 300,  # seconds before an unused pooled session is closed
+    "connect_retries": 5,  # attempts to connect before giving up
+    "retry_backoff": 0.5,  # seconds before the first retry, doubling each time
+    "retry_backoff_max": 8.0,  # longest delay between retries
+    "deadline": None,  # seconds a whole run may take, None for no limit
+    "breaker_threshold": 3,  # failed connects in a row before a host is skipped
+    "breaker_reset": 60,  # seconds a host is skipped for
+    "cache_ttl": 10,  # seconds the output of a survey command is reused for
 }
 
 # Telnet setting for connection to digis
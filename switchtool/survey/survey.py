@@ -1,6 +1,12 @@
-import re
+import itertools
+import logging
+from operator import itemgetter
 
-from . import command, utils
+import simplejson
+
+from . import aio, command, templates, utils
+
+logger = logging.getLogger(__name__)
 
 
 class Surveyer:
@@ -8,33 +14,38 @@ class Surveyer:
     Class to survey devices on switch.
     """
 
-    # The specific values for these must be set in the subclass
-    _vlan_format: re.Pattern[str]
-    _port_format: re.Pattern[str]
-    _pwr_format: re.Pattern[str]
-    _lbl_format: re.Pattern[str]
-    _mac_format: re.Pattern[str]
-    _lbl_cmd_port: str
-    _pwr_cmd_port: str
+    # The specific values for these must be set in the subclass.  The
+    # templates describe the tables in the output of the commands.
+    _vlan_template: templates.TableTemplate | templates.BlockTemplate
+    _mac_template: templates.TableTemplate
+    _pwr_template: templates.TableTemplate | None = None
+    _lbl_template: templates.TableTemplate | None = None
     _cmd_runner: type[
         command.AristaCommandRunner
         | command.BrocadeCommandRunner
         | command.CiscoCommandRunner
         | command.RuckusCommandRunner
     ]
+    _async_cmd_runner: type[aio.AsyncCommandRunner]
 
-    def __init__(self, user, pw, enablepw, port=None, timeout=None):
+    def __init__(
+        self, user, pw, enablepw, port=None, timeout=None, pool=None, cache=None
+    ):
         self.user = user
         self.pw = pw
         self.enablepw = enablepw
         self.port = port
         self.timeout = timeout
+        self.pool = pool
+        # Read-through cache of the command output, cache.ResultCache
+        self.cache = cache
         self._vlan_cmd = "show vlan"
         self._mac_cmd = "show mac-address"
         self._mac_cmd_port = "show mac-address ethernet %s"
         self._pwr_cmd = None
+        self._pwr_cmd_port = None
         self._lbl_cmd = None
-        self._vlan_formatter = None
+        self._lbl_cmd_port = None
 
     def show_vlan(self, host, vlan_no=None):
         """
@@ -44,42 +55,19 @@ class Surveyer:
         host (str)    - Name of host
         vlan_no (str) - Number of vlan to be observed.
         """
-        vlan_info = {}
-        cmd = [self._vlan_cmd]
-
+        cmd = self._vlan_cmd
         if vlan_no:
-            cmd[0] = "{:} {:}".format(cmd[0].rstrip("\n"), vlan_no)
-
-        cmdr = self._cmd_runner(
-            self.user, self.pw, self.enablepw, self.port, cmd, timeout=self.timeout
-        )
-        # Parse output
-        out_code, raw_vlan = cmdr.run(host)
-        if self._vlan_formatter is not None:
-            raw_vlan = self._vlan_formatter(raw_vlan)
-        vlan = self._vlan_format.findall(raw_vlan)
-
-        for vlan_no, raw_ports in vlan:
-            ports = self._port_format.findall(raw_ports)
-            vlan_info[vlan_no] = ports
-        return vlan_info
+            cmd = self._add_args(cmd, str(vlan_no))
+        return self._parse_vlan(self._iter_lines(host, cmd))
 
     def show_mac(self, host, vlan_no=None):
         """
         Create a dictionary of MAC addresses found on each port.
         """
-        cmd = [self._mac_cmd]
+        cmd = self._mac_cmd
         if vlan_no:
-            cmd[0] = "{:} vlan {:}".format(cmd[0].rstrip("\n"), vlan_no)
-
-        cmdr = self._cmd_runner(
-            self.user, self.pw, self.enablepw, self.port, cmd, timeout=self.timeout
-        )
-        out_code, raw_mac = cmdr.run(host)
-
-        # Parse output
-        mac = self._mac_format.findall(raw_mac)
-        return dict([(j, utils.convert_eth(i)) for i, j in mac])
+            cmd = self._add_args(cmd, "vlan {:}".format(vlan_no))
+        return self._parse_mac(self._iter_lines(host, cmd))
 
     def show_power(self, host):
         """
@@ -87,13 +75,7 @@ class Surveyer:
         """
         if self._pwr_cmd is None:
             return {}
-
-        cmd = [self._pwr_cmd]
-        cmdr = self._cmd_runner(
-            self.user, self.pw, self.enablepw, self.port, cmd, timeout=self.timeout
-        )
-        out_code, raw_pwr = cmdr.run(host)
-        return dict([(p, (a, o)) for p, a, o in self._pwr_format.findall(raw_pwr)])
+        return self._parse_power(self._iter_lines(host, self._pwr_cmd))
 
     def show_labels(self, host):
         """
@@ -101,192 +83,337 @@ class Surveyer:
         """
         if self._lbl_cmd is None:
             return {}
+        return self._parse_labels(self._iter_lines(host, self._lbl_cmd))
+
+    @staticmethod
+    def _add_args(cmd, args):
+        """
+        Add args to cmd, before any "| json" and the like at its end.
+        """
+        cmd, pipe, rest = cmd.rstrip("\n").partition(" | ")
+        return "{:} {:}{:}{:}".format(cmd, args, pipe, rest)
+
+    def collect_all(self, host):
+        """
+        Fetch the VLAN, MAC, PoE and port-name tables in a single session.
+
+        Returns a dictionary with "vlan", "mac", "power" and "labels" keys,
+        holding what show_vlan, show_mac, show_power and show_labels would
+        return.
+        """
+        queries = self._queries()
+        output = self._iter_each(host, [cmd for _, cmd, _ in queries])
+        # Each parser consumes the lines of its command as they arrive
+        parsed = {}
+        for i, lines in itertools.groupby(output, key=itemgetter(0)):
+            parsed[i] = queries[i][2](line for _, line in lines)
+        return self._snapshot(queries, [parsed.get(i) for i in range(len(queries))])
+
+    async def collect_all_async(self, host):
+        """
+        Like collect_all, but using the asyncio command runner for the vendor.
+
+        Lets one event loop survey many switches at once.
+        """
+        queries = self._queries()
+        cmdr = self._async_cmd_runner(
+            self.user,
+            self.pw,
+            self.enablepw,
+            self.port,
+            [cmd for _, cmd, _ in queries],
+            timeout=self.timeout,
+        )
+        out_code, outputs = await cmdr.run_each(host)
+        parsed = [
+            parse(raw.splitlines(True)) for (_, _, parse), raw in zip(queries, outputs)
+        ]
+        return self._snapshot(queries, parsed)
+
+    def _queries(self):
+        """
+        The (key, command, parser) of each table collect_all needs.
+        """
+        queries = [
+            ("vlan", self._vlan_cmd, self._parse_vlan),
+            ("mac", self._mac_cmd, self._parse_mac),
+            ("power", self._pwr_cmd, self._parse_power),
+            ("labels", self._lbl_cmd, self._parse_labels),
+        ]
+        return [q for q in queries if q[1] is not None]
+
+    def _snapshot(self, queries, parsed):
+        """
+        Key the parsed tables of the _queries commands into a snapshot.
+
+        Commands that had no output at all have None in parsed.
+        """
+        snapshot = {"power": {}, "labels": {}}
+        for (key, _, parse), table in zip(queries, parsed):
+            snapshot[key] = parse([]) if table is None else table
+        return snapshot
+
+    def _parse_vlan(self, lines):
+        """
+        Parse the lines of the VLAN command into {vlan_no: [ports]}.
+        """
+        return {r.vlan: r.ports for r in self._vlan_template.parse(lines)}
+
+    def _parse_mac(self, lines):
+        """
+        Parse the lines of the MAC command into {port: mac_address}.
+        """
+        return {r.port: r.mac for r in self._mac_template.parse(lines)}
+
+    def _parse_power(self, lines):
+        """
+        Parse the lines of the PoE command into {port: (admin, oper)}.
+        """
+        return {r.port: (r.admin, r.oper) for r in self._pwr_template.parse(lines)}
+
+    def _parse_labels(self, lines):
+        """
+        Parse the lines of the port-name command into {port: name}.
+        """
+        return {r.port: r.name for r in self._lbl_template.parse(lines)}
 
-        cmd = [self._lbl_cmd]
-        cmdr = self._cmd_runner(
-            self.user, self.pw, self.enablepw, self.port, cmd, timeout=self.timeout
+    def _runner(self, cmds, priv=False):
+        """
+        Create a command runner for cmds that uses our session pool.
+        """
+        return self._cmd_runner(
+            self.user,
+            self.pw,
+            self.enablepw,
+            self.port,
+            cmds,
+            timeout=self.timeout,
+            priv=priv,
+            pool=self.pool,
         )
-        out_code, raw_lbl = cmdr.run(host)
-        return dict([(p, el) for p, el in self._lbl_format.findall(raw_lbl)])
 
-    # Let's claim no one needs an enable command by default!
-    def check_mode(self, host) -> bool:
-        return False
+    def _iter_lines(self, host, cmd):
+        """
+        Run cmd on host and yield the lines of its output as they arrive.
+        """
+        for _, line in self._iter_each(host, [cmd]):
+            yield line
+
+    def _iter_each(self, host, cmds):
+        """
+        Like CommandRunner.iter_each for cmds, but reading through our cache.
+
+        Only the commands without cached output are run on the switch, in a
+        single session, and their output is cached once it is complete.
+        """
+        if self.cache is None:
+            yield from self._runner(cmds).iter_each(host)
+            return
+        missing = []
+        for i, cmd in enumerate(cmds):
+            lines = self.cache.get(host, self.port, cmd)
+            if lines is None:
+                missing.append(i)
+            else:
+                for line in lines:
+                    yield i, line
+        if not missing:
+            return
+        outputs = {i: [] for i in missing}
+        for j, line in self._runner([cmds[i] for i in missing]).iter_each(host):
+            outputs[missing[j]].append(line)
+            yield missing[j], line
+        for i in missing:
+            self.cache.put(host, self.port, cmds[i], outputs[i])
 
     def update_port(self, host, port):
         """
         Return (power, portname, mac_address) tuple for the specified port.
         """
-        cmd = []
-        if self._mac_cmd_port is not None:
-            cmd.extend([self._mac_cmd_port % port])
-        if self._lbl_cmd_port is not None:
-            cmd.extend([self._lbl_cmd_port % port])
-        if self._pwr_cmd_port is not None:
-            cmd.extend([self._pwr_cmd_port % port])
-        cmdr = self._cmd_runner(
-            self.user, self.pw, self.enablepw, self.port, cmd, timeout=self.timeout
-        )
-        out_code, raw = cmdr.run(host)
-        mac = self._mac_format.findall(raw)
-        m = ""
-        for i, j in mac:
-            if j == port:
-                m = utils.convert_eth(i)
-                break
-        if self._lbl_format is not None:
-            lbl = self._lbl_format.findall(raw)
-            el = ""
-            for i, j in lbl:
-                if i == port:
-                    el = j
-                    break
-        else:
-            el = ""
-        if self._pwr_format is not None:
-            pwr = self._pwr_format.findall(raw)
-            p = "Non-PD"
-            for i, j, k in pwr:
-                if i == port:
-                    p = k
-                    break
-        else:
-            p = "Non-PD"
-        return (p, el, m)
+        (_, power), name, address = self.update_ports(host, [port])[port]
+        return (power, name, address)
+
+    def update_ports(self, host, ports):
+        """
+        Return {port: ((admin, oper) power, portname, mac_address)} for the
+        specified ports.
+
+        The per-port commands for all of the ports are run in a single
+        session, and the output of each is parsed as it arrives.
+        """
+        queries = [
+            ("mac", self._mac_cmd_port, self._parse_mac),
+            ("labels", self._lbl_cmd_port, self._parse_labels),
+            ("power", self._pwr_cmd_port, self._parse_power),
+        ]
+        queries = [
+            (port, key, cmd % port, parse)
+            for port in ports
+            for key, cmd, parse in queries
+            if cmd
+        ]
+        output = self._iter_each(host, [cmd for _, _, cmd, _ in queries])
+        tables = {}
+        for i, lines in itertools.groupby(output, key=itemgetter(0)):
+            port, key, _, parse = queries[i]
+            tables[port, key] = parse(line for _, line in lines)
+        return {
+            port: (
+                tables.get((port, "power"), {}).get(port, (None, "Non-PD")),
+                tables.get((port, "labels"), {}).get(port, ""),
+                tables.get((port, "mac"), {}).get(port, ""),
+            )
+            for port in ports
+        }
 
 
 class BrocadeSurveyer(Surveyer):
-    _vlan_format = re.compile(
-        r"PORT-VLAN ([\d]+), Name [\D]+,.+?\r\n(.+?)Monitoring", re.DOTALL
-    )
-    _port_format = re.compile(r"Untagged Ports: \(U(\d+)/M(\d+)\)(.+)\r")
-    _mac_format = re.compile(r"([\S]{14})[\s]+?([\S]+)[\s]+?Dynamic")
+    _vlan_template = templates.FASTIRON_VLAN
+    _mac_template = templates.FASTIRON_MAC
     _cmd_runner = command.BrocadeCommandRunner
+    _async_cmd_runner = aio.AsyncBrocadeCommandRunner
 
-    def __init__(self, user, pw, enablepw, port=22, timeout=None):
+    def __init__(
+        self, user, pw, enablepw, port=22, timeout=None, pool=None, cache=None
+    ):
         super(BrocadeSurveyer, self).__init__(
-            user, pw, enablepw, port=port, timeout=timeout
+            user, pw, enablepw, port=port, timeout=timeout, pool=pool, cache=cache
         )
 
-    def show_vlan(self, host, vlan_no=None):
-        """Python 2.7 :  for vlan,port_info in vlan_info.iteritems():"""
-        """ Python 3.5 :  for vlan,port_info in vlan_info.items():     """
-        """
-        Create a dictionary of each VLAN with untagged ports.
-
-        An extra complication is added because of the way the ports are
-        displayed by the Brocade.
-        """
-        vlan_info = super(BrocadeSurveyer, self).show_vlan(host, vlan_no=vlan_no)
-        # for vlan,port_info in vlan_info.iteritems():
-        for vlan, port_info in vlan_info.items():
-            full_ports = []
-            if port_info:
-                for line in port_info:
-                    stack = list(line[:2])
-                    for port in re.findall(r"([\d]+)", line[2]):
-                        full_ports.append("/".join(stack + [port]))
-            vlan_info[vlan] = full_ports
-        return vlan_info
-
 
 class RuckusSurveyer(Surveyer):
-    _vlan_format = re.compile(
-        r"PORT-VLAN ([\d]+), Name [\D]+,.+?\r\n(.+?)Monitoring", re.DOTALL
-    )
-    _port_format = re.compile(r"Untagged Ports: \(U(\d+)/M(\d+)\)(.+)\r")
-    _mac_format = re.compile(r"([\S]{14})[\s]+?([\S]+)[\s]+?Dynamic")
-    _pwr_format = re.compile(
-        r"^[\s]*([\S]*)[\s]*(On|Off)[\s]*(On|Off|Non-PD)[\s]*", re.M
-    )
-    # Port Link State Dupl Speed Trunk Tag Pvid Pri MAC Name
-    # We want field0 and field10!
-    _lbl_format = re.compile(
-        r"^[\t ]*([\S]+)[\t ]+[\S]+[\t ]+[\S]+[\t ]+[\S]+[\t ]+[\S]+[\t ]+[\S]+[\t ]+[\S]+[\t ]+[\S]+[\t ]+[\S]+[\t ]+[\S]+[\t ]+([\S]+)",
-        re.M,
-    )
+    _vlan_template = templates.FASTIRON_VLAN
+    _mac_template = templates.FASTIRON_MAC
+    _pwr_template = templates.RUCKUS_POWER
+    _lbl_template = templates.RUCKUS_LABELS
     _cmd_runner = command.RuckusCommandRunner
+    _async_cmd_runner = aio.AsyncRuckusCommandRunner
 
-    def __init__(self, user, pw, enablepw, port=22, timeout=None):
+    def __init__(
+        self, user, pw, enablepw, port=22, timeout=None, pool=None, cache=None
+    ):
         super(RuckusSurveyer, self).__init__(
-            user, pw, enablepw, port=port, timeout=timeout
+            user, pw, enablepw, port=port, timeout=timeout, pool=pool, cache=cache
         )
         self._pwr_cmd = "show inline power"
         self._pwr_cmd_port = "show inline power %s"
         self._lbl_cmd = "show interfaces brief"
         self._lbl_cmd_port = "show interfaces brief ethernet %s"
 
-    def show_vlan(self, host, vlan_no=None):
-        """Python 2.7 :  for vlan,port_info in vlan_info.iteritems():"""
-        """ Python 3.5 :  for vlan,port_info in vlan_info.items():     """
-        """
-        Create a dictionary of each VLAN with untagged ports.
-
-        An extra complication is added because of the way the ports are
-        displayed by the Brocade.
-        """
-        vlan_info = super(RuckusSurveyer, self).show_vlan(host, vlan_no=vlan_no)
-        # for vlan,port_info in vlan_info.iteritems():
-        for vlan, port_info in vlan_info.items():
-            full_ports = []
-            if port_info:
-                for line in port_info:
-                    stack = list(line[:2])
-                    for port in re.findall(r"([\d]+)", line[2]):
-                        full_ports.append("/".join(stack + [port]))
-            vlan_info[vlan] = full_ports
-        return vlan_info
-
-    # Return True if we need to enable!
-    def check_mode(self, host):
-        cmdr = self._cmd_runner(
-            self.user,
-            self.pw,
-            self.enablepw,
-            self.port,
-            ["show clock"],
-            timeout=self.timeout,
-        )
-        cmdr.run(host)
-        return cmdr.mode == ">"
-
 
 class CiscoSurveyer(Surveyer):
-    _vlan_format = re.compile(r"([\d]+).+active[\s]+(.+)")
-    _port_format = re.compile(r"(Gi0/[\d]{1:2})")
-    _mac_format = re.compile(r" [\d]{3}[\s]+?(\S+)[\s]+?DYNAMIC[\s]+(.+)")
+    _vlan_template = templates.IOS_VLAN
+    _mac_template = templates.IOS_MAC
     _cmd_runner = command.CiscoCommandRunner
+    _async_cmd_runner = aio.AsyncCiscoCommandRunner
 
-    def __init__(self, user, pw, enablepw, port=22, timeout=None):
+    def __init__(
+        self, user, pw, enablepw, port=22, timeout=None, pool=None, cache=None
+    ):
         super(CiscoSurveyer, self).__init__(
-            user, pw, enablepw, port=port, timeout=timeout
+            user, pw, enablepw, port=port, timeout=timeout, pool=pool, cache=cache
         )
 
 
 class AristaSurveyer(Surveyer):
-    _vlan_format = re.compile(r"([\d]+).*active(.*)")
-    _port_format = re.compile(r"(Et[\d]{1,2})")
-    _mac_format = re.compile(r" [\d]{3}[\s]+?(\S+)[\s]+?DYNAMIC[\s]+(\S+)")
-    _cmd_runner = command.AristaCommandRunner
+    """
+    Surveyer for the Arista.
 
-    def __init__(self, user, pw, enablepw, port=22, timeout=None):
+    By default the tables are requested as JSON ("| json"), which saves
+    scraping the text and re-joining the port lists that wrap there.  Pass
+    structured=False for the text output, e.g. for an old EOS.
+    """
+
+    # Same tables as the Cisco, the port lists wrap onto the next lines
+    _vlan_template = templates.IOS_VLAN
+    _mac_template = templates.IOS_MAC
+    _cmd_runner = command.AristaCommandRunner
+    _async_cmd_runner = aio.AsyncAristaCommandRunner
+    # The (admin, oper) of each PoE port state, like the Ruckus show them.
+    # EOS is "detecting" on a port waiting for a device.
+    _poe_states = {
+        "disabled": ("Off", "Off"),
+        "detecting": ("On", "Off"),
+        "powered": ("On", "On"),
+        "fault": ("On", "Off"),
+    }
+
+    def __init__(
+        self,
+        user,
+        pw,
+        enablepw,
+        port=22,
+        timeout=None,
+        pool=None,
+        cache=None,
+        structured=True,
+    ):
         super(AristaSurveyer, self).__init__(
-            user, pw, enablepw, port=port, timeout=timeout
+            user, pw, enablepw, port=port, timeout=timeout, pool=pool, cache=cache
         )
+        self.structured = structured
         self._mac_cmd = "show mac address-table"
-        self._vlan_formatter = self.__vlan_format
-
-    def __vlan_format(self, l1):
-        ll = l1.split("\n")
-        cont = False
-        l2 = ""
-        for el in ll:
-            if cont and len(el) > 0 and el[0] >= "0" and el[0] <= "9":
-                l2 += "\n"
-                cont = False
-            if len(el) > 0 and el[0] >= "0" and el[0] <= "9":
-                l2 += el.strip()
-                cont = True
-            elif cont:
-                l2 += ", " + el.strip()
-        return l2
+        self._mac_cmd_port = "show mac address-table interface %s"
+        if structured:
+            self._vlan_cmd = "show vlan | json"
+            self._mac_cmd = "show mac address-table | json"
+            self._mac_cmd_port = "show mac address-table interface %s | json"
+            self._pwr_cmd = "show poe | json"
+            self._pwr_cmd_port = "show poe interface %s | json"
+            self._lbl_cmd = "show interfaces description | json"
+            self._lbl_cmd_port = "show interfaces %s description | json"
+
+    def _load(self, lines):
+        """
+        Decode the JSON output of a command, {} if there was none.
+        """
+        text = "".join(lines).strip()
+        if not text:
+            return {}
+        try:
+            return simplejson.loads(text)
+        except simplejson.JSONDecodeError:
+            logger.warning("Unable to decode the switch output: %.80r", text)
+            return {}
+
+    def _parse_vlan(self, lines):
+        if not self.structured:
+            return super()._parse_vlan(lines)
+        # Only the Ethernet ports, not the Cpu and the like
+        return {
+            vlan_no: [
+                utils.short_interface(name)
+                for name in vlan.get("interfaces", {})
+                if name.startswith("Ethernet")
+            ]
+            for vlan_no, vlan in self._load(lines).get("vlans", {}).items()
+            if vlan.get("status") == "active"
+        }
+
+    def _parse_mac(self, lines):
+        if not self.structured:
+            return super()._parse_mac(lines)
+        entries = self._load(lines).get("unicastTable", {}).get("tableEntries", [])
+        return {
+            utils.short_interface(entry["interface"]): entry["macAddress"]
+            for entry in entries
+            if entry.get("entryType") == "dynamic"
+        }
+
+    def _parse_power(self, lines):
+        ports = self._load(lines).get("poePorts", {})
+        return {
+            utils.short_interface(name): self._poe_states.get(
+                port.get("portState"), ("On", "Off")
+            )
+            for name, port in ports.items()
+        }
+
+    def _parse_labels(self, lines):
+        descriptions = self._load(lines).get("interfaceDescriptions", {})
+        return {
+            utils.short_interface(name): interface["description"]
+            for name, interface in descriptions.items()
+            if interface.get("description")
+        }
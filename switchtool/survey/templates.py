@@ -0,0 +1,302 @@
+"""
+Templates describing the tables in the output of the switch commands.
+
+Rather than a regex per vendor and command, the surveyers describe each
+table they read as data, and the engine here turns the output lines into
+records in a single pass:
+
+* TableTemplate is for column aligned tables with a header line, like the
+  MAC tables.  The column positions are taken from the header, so each row
+  is sliced instead of being matched by a long, backtracking regex.
+
+* BlockTemplate is for records that span several lines, like a VLAN in
+  the Brocade "show vlan".
+
+Supporting a new switch model should only need new templates.
+"""
+
+import collections
+import re
+
+from . import utils
+
+# Lines of a table that separate the header from the rows
+_RULE = re.compile(r"^[\s=+-]*$")
+_LIST_SEP = re.compile(r"[,\s]+")
+
+
+class TableTemplate:
+    """
+    A table with a header line, that the columns of the rows line up with.
+
+    Parameters
+    ----------
+    name : str
+        The name of the records.
+
+    header : str
+        Regex matching the header line.  A table can appear several times,
+        every header line starts a new one.
+
+    columns : dict
+        {field: label} of the columns wanted, by their label in the header.
+        The first of them has to be filled in on every row.
+
+    filters : dict, optional
+        {field: regex} that the start of a field has to match for a row to be
+        kept, e.g. to only keep dynamic MAC addresses.
+
+    lists : list, optional
+        Fields holding comma or space separated lists.  A row that has
+        nothing in its first column continues these lists of the row above,
+        for tables that wrap long lists onto the next lines.
+
+    items : dict, optional
+        {field: regex} that each item of a list field has to match in full to
+        be kept, e.g. to only keep the front panel ports.
+
+    convert : dict, optional
+        {field: function} applied to the value of a field.
+    """
+
+    def __init__(
+        self, name, header, columns, filters=None, lists=(), items=None, convert=None
+    ):
+        self.header = re.compile(header)
+        self.columns = columns
+        self.record = collections.namedtuple(name, list(columns))
+        # Everything by the index of the field in the record, for parse
+        index = {field: i for i, field in enumerate(columns)}
+        self._filters = [
+            (index[field], re.compile(r).match) for field, r in (filters or {}).items()
+        ]
+        self._lists = [index[field] for field in lists]
+        self._items = {
+            index[field]: re.compile(r).fullmatch for field, r in (items or {}).items()
+        }
+        self._convert = [(index[field], f) for field, f in (convert or {}).items()]
+
+    def _layout(self, header):
+        """
+        The layout of the wanted columns, for a header line.
+
+        A column runs from the start of its label to the start of the next
+        label in the header, wanted or not.  The first column also takes
+        anything to its left, and the last anything to its right.
+
+        Returns the (start, end) of each column, and a regex matching the
+        rows that have a space just before every column boundary, which can
+        be sliced without looking for values running across the boundaries.
+        """
+        labels = [m.start() for m in re.finditer(r"\S+", header)]
+        spans = []
+        for label in self.columns.values():
+            m = re.search(r"(?<!\S)%s(?!\S)" % re.escape(label), header)
+            if m is None:
+                raise ValueError("No %r column in header %r" % (label, header))
+            start = 0 if m.start() == labels[0] else m.start()
+            end = next((i for i in labels if i >= m.end()), None)
+            spans.append((start, end))
+        pattern, last = "", 0
+        for i in sorted({i for span in spans for i in span if i}):
+            pattern += ".{%d} " % (i - 1 - last)
+            last = i
+        return spans, re.compile(pattern, re.DOTALL).match
+
+    @staticmethod
+    def _boundary(line, i):
+        """
+        Move the column boundary i past a value that runs across it, as a long
+        port name does.
+        """
+        n = len(line)
+        while i < n and line[i - 1] != " " and line[i] != " ":
+            i += 1
+        return i
+
+    def parse(self, lines):
+        """
+        Yield a record for each row of the table in lines.
+        """
+        header = self.header.match
+        boundary = self._boundary
+        filters = self._filters
+        lists = self._lists
+        converts = self._convert
+        make = self.record._make
+        spans = None
+        pending = None
+        for line in lines:
+            if header(line):
+                if pending is not None:
+                    yield self._record(pending)
+                    pending = None
+                spans, aligned = self._layout(line.rstrip())
+                slices = [slice(start, end) for start, end in spans]
+                continue
+            if spans is None or _RULE.match(line):
+                continue
+            if aligned(line):
+                row = [line[i].strip() for i in slices]
+            else:
+                line = line.rstrip()
+                n = len(line)
+                row = []
+                for start, end in spans:
+                    if 0 < start < n and line[start - 1] != " " and line[start] != " ":
+                        start = boundary(line, start)
+                    if end is None or end >= n:
+                        end = n
+                    elif line[end - 1] != " " and line[end] != " ":
+                        end = boundary(line, end)
+                    row.append(line[start:end].strip())
+            if not row[0]:
+                # Wrapped onto another line
+                if pending is not None:
+                    for i in lists:
+                        pending[i].extend(_LIST_SEP.split(row[i]))
+                continue
+            if pending is not None:
+                yield self._record(pending)
+                pending = None
+            for i, match in filters:
+                if not match(row[i]):
+                    break
+            else:
+                if not lists:
+                    for i, convert in converts:
+                        row[i] = convert(row[i])
+                    yield make(row)
+                    continue
+                # Hold on to the row, in case its lists wrap
+                for i in lists:
+                    row[i] = _LIST_SEP.split(row[i])
+                pending = row
+        if pending is not None:
+            yield self._record(pending)
+
+    def _record(self, row):
+        for i in self._lists:
+            keep = self._items.get(i, bool)
+            row[i] = [v for v in row[i] if v and keep(v)]
+        for i, convert in self._convert:
+            row[i] = convert(row[i])
+        return self.record._make(row)
+
+
+class BlockTemplate:
+    """
+    Records spread over a block of lines.
+
+    Parameters
+    ----------
+    name : str
+        The name of the records.
+
+    start : str
+        Regex matching the first line of a record.  Its named groups are the
+        single valued fields of the record.
+
+    rows : dict
+        {field: (regex, function)} for the list fields of the record.  Each
+        line of the block matching regex adds function(match) to the list.
+
+    end : str
+        Regex matching the last line of a record.
+    """
+
+    def __init__(self, name, start, rows, end):
+        self.start = re.compile(start)
+        self.rows = [(field, re.compile(r), f) for field, (r, f) in rows.items()]
+        self.end = re.compile(end)
+        self.record = collections.namedtuple(
+            name, list(self.start.groupindex) + list(rows)
+        )
+
+    def parse(self, lines):
+        """
+        Yield a record for each block in lines.
+        """
+        current = None
+        for line in lines:
+            if current is None:
+                m = self.start.search(line)
+                if m:
+                    current = m.groupdict()
+                    current.update((field, []) for field, _, _ in self.rows)
+                continue
+            if self.end.search(line):
+                yield self.record(**current)
+                current = None
+                continue
+            for field, pattern, f in self.rows:
+                m = pattern.search(line)
+                if m:
+                    current[field].extend(f(m))
+                    break
+
+
+def stack_ports(match):
+    """
+    The ports of a Brocade/Ruckus "(U1/M1) 1 2 3" port list, as "1/1/1"...
+    """
+    unit, module = match.group("unit", "module")
+    ports = re.findall(r"\d+", match.group("ports"))
+    return ["%s/%s/%s" % (unit, module, n) for n in ports]
+
+
+# Brocade and Ruckus
+
+FASTIRON_VLAN = BlockTemplate(
+    "Vlan",
+    start=r"PORT-VLAN (?P<vlan>\d+), Name ",
+    rows={
+        "ports": (
+            r"Untagged Ports: \(U(?P<unit>\d+)/M(?P<module>\d+)\)(?P<ports>.*)",
+            stack_ports,
+        )
+    },
+    end=r"^\s*Monitoring",
+)
+
+FASTIRON_MAC = TableTemplate(
+    "Mac",
+    header=r"^\s*MAC-Address\s+Port",
+    columns={"mac": "MAC-Address", "port": "Port", "type": "Type", "vlan": "VLAN"},
+    filters={"mac": r"\S{14}$", "type": "Dynamic"},
+    convert={"mac": utils.convert_eth},
+)
+
+RUCKUS_POWER = TableTemplate(
+    "Power",
+    header=r"^\s*Port\s+Admin\s+Oper",
+    columns={"port": "Port", "admin": "Admin", "oper": "Oper"},
+    filters={"admin": "(On|Off)$", "oper": "(On|Off|Non-PD)$"},
+)
+
+RUCKUS_LABELS = TableTemplate(
+    "Label",
+    header=r"^\s*Port\s+Link\s+State.*\sName",
+    columns={"port": "Port", "name": "Name"},
+    filters={"name": r"\S"},
+)
+
+# Cisco and Arista
+
+IOS_VLAN = TableTemplate(
+    "Vlan",
+    header=r"^\s*VLAN\s+Name\s+Status\s+Ports",
+    columns={"vlan": "VLAN", "status": "Status", "ports": "Ports"},
+    filters={"vlan": r"\d+$", "status": "active"},
+    lists=["ports"],
+    # Only the front panel ports, not the Cpu, port channels or MLAG peer
+    items={"ports": r"(Et|Fa|Gi|Te)\d+(/\d+)*"},
+)
+
+IOS_MAC = TableTemplate(
+    "Mac",
+    header=r"^\s*Vlan\s+Mac Address\s+Type\s+Ports",
+    columns={"mac": "Mac Address", "type": "Type", "port": "Ports", "vlan": "Vlan"},
+    filters={"type": "DYNAMIC"},
+    convert={"mac": utils.convert_eth},
+)
@@ -1,3 +1,4 @@
+import functools
 import getpass
 import logging
 import re
@@ -28,10 +29,33 @@ def convert_eth(ethernet):
     """
     Convert MAC-address separated by decimal to colon.
     """
+    e = ethernet
+    if len(e) == 14:
+        # The usual xxxx.xxxx.xxxx, done the quick way
+        return "%s:%s:%s:%s:%s:%s" % (e[:2], e[2:4], e[5:7], e[7:9], e[10:12], e[12:])
     parts = ethernet.split(".")
     return ":".join([part[:2] + ":" + part[2:] for part in parts])
 
 
+# The abbreviations the Arista use for their interfaces in text output
+__INTERFACE_ABBREV = {"Ethernet": "Et", "Port-Channel": "Po", "Management": "Ma"}
+__INTERFACE_REGEX = re.compile(r"^(?P<kind>[A-Za-z-]+)(?P<number>\d.*)$")
+
+
+# There are only so many ports, and they are looked up for each MAC address
+@functools.lru_cache(maxsize=4096)
+def short_interface(interface):
+    """
+    Abbreviate an Arista interface name as in the text output, e.g. Ethernet1
+    to Et1.  Names that are short already are left alone.
+    """
+    m = __INTERFACE_REGEX.match(interface)
+    if m is None:
+        return interface
+    kind = m.group("kind")
+    return __INTERFACE_ABBREV.get(kind, kind) + m.group("number")
+
+
 def _get_ethe_addr(netconf_data):
     last_host = None
     mac_pairs = []
@@ -340,6 +364,31 @@ def add_telnet_opts(parser):
     )
 
 
+def add_fleet_opts(parser):
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        metavar="N",
+        default=1,
+        type=int,
+        help="The number of hosts to run the commands on at once (default: 1)",
+    )
+
+    parser.add_argument(
+        "--deadline",
+        metavar="SECONDS",
+        default=None,
+        type=float,
+        help="Give up on a host that takes longer than this (default: no limit)",
+    )
+
+    parser.add_argument(
+        "--prefix",
+        action="store_true",
+        help="Prefix every line of output with the name of its host",
+    )
+
+
 def add_con_opts(parser):
     group = parser.add_argument_group(
         "remote connection options",
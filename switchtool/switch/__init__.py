@@ -1,4 +1,4 @@
 # from switch import Switch
-from . import switch
+from . import fleet, switch
 
-__all__ = ["switch"]
+__all__ = ["fleet", "switch"]
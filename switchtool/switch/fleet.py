@@ -0,0 +1,210 @@
+"""
+Many switches, loaded at the same time.
+
+Creating a Switch waits on sdfconfig for its type and on ping, and updating
+it on the SSH sessions, so going through the switches of a site one by one
+takes the sum of all of that.  A Fleet does it for all of its switches at
+once, on a bounded number of threads, so an audit of the site takes about as
+long as its slowest switch:
+
+    fleet = Fleet(["switch-a", "switch-b"], pw=pw)
+    fleet.update()
+    for name, devices in fleet.misplaced().items():
+        print(name, devices)
+"""
+
+import collections
+import concurrent.futures
+import logging
+import time
+
+from .switch import Switch
+
+module_logger = logging.getLogger(__name__)
+
+# Seconds spent creating a switch (finding its type and pinging it), and on
+# its last update
+Timing = collections.namedtuple("Timing", ["resolve", "update"])
+
+
+class Fleet:
+    """
+    A set of managed network switches.
+
+    Parameters
+    ----------
+    names : list[str]
+        The hostnames of the switches.
+
+    user : str, optional
+        The username used to log into the switches.
+
+    pw : str, optional
+        The read-only (login) password of the switches.
+
+    enablepw : str, optional
+        The write (enable) password of the switches.
+
+    switch_types : dict, optional
+        {name: switch type} for the switches whose type is known, the others
+        are looked up in sdfconfig.
+
+    jobs : int, optional
+        The most switches worked on at the same time.
+
+    switch_class : type, optional
+        The Switch class to create the switches with.
+    """
+
+    def __init__(
+        self,
+        names,
+        user="admin",
+        pw=None,
+        enablepw=None,
+        switch_types=None,
+        jobs=8,
+        switch_class=Switch,
+    ):
+        self.names = list(names)
+        self.jobs = jobs
+        self._user = user
+        self._pw = pw
+        self._enablepw = enablepw
+        self._switch_types = dict(switch_types or {})
+        self._switch_class = switch_class
+        # {name: Switch} of the switches created so far
+        self.switches = {}
+        # {name: Timing} and {name: exception} from the last update
+        self.timings = {}
+        self.errors = {}
+
+    def __getitem__(self, name):
+        return self.switches[name]
+
+    def __iter__(self):
+        return iter(self.switches.values())
+
+    def __len__(self):
+        return len(self.switches)
+
+    def _map(self, func, names):
+        """
+        Call func(name) for each name on the thread pool.
+
+        Returns {name: result} of the calls that worked, in the order of
+        names, and {name: exception} of those that raised.
+        """
+        results, errors = {}, {}
+        if not names:
+            return results, errors
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(min(self.jobs, len(names)), 1)
+        ) as executor:
+            futures = {name: executor.submit(func, name) for name in names}
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as exc:
+                    module_logger.error("Failed on {:}: {:}".format(name, exc))
+                    errors[name] = exc
+        return results, errors
+
+    def _update_switch(self, name, incremental):
+        """
+        Create the switch if needed, then update it.
+        """
+        resolve = 0.0
+        switch = self.switches.get(name)
+        if switch is None:
+            start = time.monotonic()
+            switch = self._switch_class(
+                name,
+                user=self._user,
+                pw=self._pw,
+                enablepw=self._enablepw,
+                switch_type=self._switch_types.get(name),
+            )
+            resolve = time.monotonic() - start
+            self.switches[name] = switch
+        start = time.monotonic()
+        switch.update(incremental=incremental)
+        return Timing(resolve, time.monotonic() - start)
+
+    def update(self, incremental=False):
+        """
+        Create the switches not created yet and update all of them.
+
+        The switches that fail, because sdfconfig doesn't know their type,
+        they don't answer ping or the update raised, are left in errors.
+
+        :param incremental: Only apply what changed since the last update of
+                            each switch, see Switch.update
+        :type  incremental: bool
+        """
+        start = time.monotonic()
+        self.timings, self.errors = self._map(
+            lambda name: self._update_switch(name, incremental), self.names
+        )
+        # In the order of names, rather than the order they were created in
+        self.switches = {
+            name: self.switches[name] for name in self.names if name in self.switches
+        }
+        module_logger.info(
+            "Updated {:} of {:} switches in {:.1f} seconds".format(
+                len(self.timings), len(self.names), time.monotonic() - start
+            )
+        )
+
+    @property
+    def slowest(self):
+        """
+        The name of the switch that took the longest in the last update.
+        """
+        if not self.timings:
+            return None
+        return max(self.timings, key=lambda name: sum(self.timings[name]))
+
+    @property
+    def devices(self):
+        """
+        Return a dictionary of all of the devices on the switches.
+
+        Each device has the sub-dictionary of Switch.devices, with the name of
+        its switch added as "switch".
+        """
+        devices = {}
+        for name, switch in self.switches.items():
+            for device, info in switch.devices.items():
+                devices[device] = dict(info, switch=name)
+        return devices
+
+    @property
+    def unknown_devices(self):
+        """
+        Return a dictionary of the ethernet addresses on the switches that are
+        not associated with an entry in sdfconfig.
+
+        Each address has the sub-dictionary of Switch.unknown_devices, with
+        the name of its switch added as "switch".
+        """
+        unknown = {}
+        for name, switch in self.switches.items():
+            for address, info in switch.unknown_devices.items():
+                unknown[address] = dict(info, switch=name)
+        return unknown
+
+    def misplaced(self):
+        """
+        Find the devices on the wrong subnet, on all of the switches at once.
+
+        :return: {name: devices on the wrong subnet} of the switches that have
+                 any
+        :rtype: dict
+        """
+        surveys, errors = self._map(
+            lambda name: self.switches[name].survey(),
+            [name for name in self.names if name in self.switches],
+        )
+        self.errors.update(errors)
+        return {name: devices for name, devices in surveys.items() if devices}
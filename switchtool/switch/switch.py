@@ -1,4 +1,7 @@
+import contextlib
 import logging
+import re
+import string
 import subprocess
 import time
 from os import path
@@ -6,8 +9,16 @@ from pathlib import Path
 
 import simplejson
 
-from ..sdfconfig import get_description_for_host, get_host_for_mac, get_subnet_for_host
+from ..sdfconfig import (
+    get_description_for_host,
+    get_host_for_mac,
+    get_hosts_for_macs,
+    get_subnet_for_host,
+    get_subnets_for_hosts,
+)
 from ..survey import survey
+from ..survey.cache import RESULT_CACHE
+from ..survey.pool import SESSION_POOL
 
 module_logger = logging.getLogger(__name__)
 
@@ -21,6 +32,9 @@ SWITCH_NAME_TO_SURVEYER = {
 
 CONFIG_DIR = str(Path(__file__).parent.parent.parent / "config")
 
+# The start of the complaint of a switch about a config command
+_CONFIG_ERROR = re.compile(r"^\s*(?:%|Error|Invalid input).*$", re.MULTILINE)
+
 
 def determine_type(hostname: str):
     """
@@ -64,7 +78,9 @@ def determine_type(hostname: str):
 What do we have in here?
     _vlan: list of Vlan objects.
     _portmap: map from port name to vlan number.
-    _power: map from port name to PoE state.
+    _mac: map from port name to the mac address last seen on it.
+    _nodes: map from mac address to sdfconfig name, None if unknown.
+    _power: map from port name to (admin, oper) PoE state.
     _labels: map from port name to port name.
 """
 
@@ -100,6 +116,9 @@ class Switch:
     _vlan_alias = "VLAN_{:}"
     _vlan = []
     _user = "admin"
+    # Logged in sessions, and recent survey output, are shared by every Switch
+    _pool = SESSION_POOL
+    _cache = RESULT_CACHE
 
     def __init__(
         self, switch_name, user="admin", pw=None, enablepw=None, switch_type=None
@@ -122,6 +141,12 @@ class Switch:
         self._user = user
         self._pw = pw
         self._enablepw = enablepw
+        # The last {port: mac_address} table, and the sdfconfig name of each
+        # address in it (None if unknown), to find what changed since
+        self._mac = {}
+        self._nodes = {}
+        # The Transaction queueing our changes, if we are in one
+        self._transaction = None
 
     @property
     def subnets(self):
@@ -131,15 +156,10 @@ class Switch:
         subnets = [(vlan._vlan_no, vlan.subnet) for vlan in self._vlan]
         return sorted(subnets, key=lambda sub: int(sub[0]))
 
-    # This is either "EtXX" or "X/Y/Z".  Convert this to an int in order in either case.
+    # This is "EtXX", "Et49/1", "Gi0/1" or "X/Y/Z".  Sort by the numbers in
+    # each case, ignoring the name of the interface.
     def _portKey(self, k):
-        if k[:2] == "Et":
-            return int(k[2:])
-        nums = [int(x) for x in k.split("/")]
-        s = 0
-        for x in nums:
-            s = 1000 * s + x
-        return s
+        return tuple(int(x) for x in k.lstrip(string.ascii_letters).split("/"))
 
     @property
     def ports(self):
@@ -165,37 +185,160 @@ class Switch:
         """
         ...
 
-    def set_power(self, port, state):
-        # This is a privileged command: do we need/have the enable password?
-        if not self._enablepw and self._surveyer().check_mode(self.name):
-            self.get_enablepw()
-        commands = [
-            "config terminal",
+    def _ask_enablepw(self):
+        """
+        The enable password, for a runner that found out it needs one.
+        """
+        self.get_enablepw()
+        return self._enablepw
+
+    def _privileged_runner(self, commands):
+        """
+        Create a command runner for privileged commands.
+
+        The runner learns from the prompt of its session whether it has to
+        enable, and only then asks for the enable password if we don't have it.
+        """
+        cmd = self._surveyer()._runner(commands, priv=True)
+        cmd.ask_enablepw = self._ask_enablepw
+        return cmd
+
+    def _configure(self, commands):
+        """
+        Run commands in the config mode of the switch.
+
+        Returns the output of each command, None if we couldn't enable.
+        """
+        cmd = self._privileged_runner(["config terminal"] + commands + ["exit"])
+        try:
+            out_code, outputs = cmd.run_each(self.name)
+        except IOError:
+            module_logger.info("Bad enable password!")
+            self._enablepw = None
+            return None
+        module_logger.info("Finished running switch commands")
+        return outputs[1:-1]
+
+    def _power_commands(self, port, state):
+        return [
             "interface ethernet %s" % port,
             "%sinline power" % ("no " if state == 0 else ""),
             "exit",
-            "exit",
         ]
-        # Run commands
+
+    @contextlib.contextmanager
+    def transaction(self, delay=0.5):
+        """
+        Make the changes of a block in a single session.
+
+        The set_power, set_name and move_port calls made in the block are
+        queued, and once it ends they are run as one config script, in order,
+        then checked with a single read back from the switch:
+
+            with switch.transaction() as changes:
+                for port in ports:
+                    switch.set_name(port, "rack-3")
+            failed = [c for c in changes if not c.ok]
+
+        Nothing is run if the block raises.
+
+        :param delay: Seconds to let the switch settle before reading back,
+                      15 at least if PoE is turned off, 20 if it is turned on
+        :type  delay: float
+
+        :return: The Transaction, a list of the queued Change objects, each
+                 saying whether it worked once the block is over
+        :rtype: Transaction
+        """
+        if self._transaction is not None:
+            raise RuntimeError("Already in a transaction on {:}".format(self.name))
+        transaction = Transaction()
+        self._transaction = transaction
+        try:
+            yield transaction
+        finally:
+            self._transaction = None
+        self._commit(transaction, delay)
+
+    def _commit(self, transaction, delay):
+        """
+        Make the changes of a transaction, and check how each went.
+        """
+        if not transaction:
+            return
         module_logger.info(
-            "Turning %s power for %s" % ("off" if state == 0 else "on", port)
+            "Making {:} changes in a single session".format(len(transaction))
         )
-        cmd = self._surveyer()._cmd_runner(
-            self._user,
-            self._pw,
-            self._enablepw,
-            self._port,
-            commands,
-            timeout=self.timeout,
-            priv=True,
+        outputs = self._configure(
+            [c for change in transaction for c in change.commands]
         )
-        try:
-            out_code, resp = cmd.run(self.name)
-        except IOError:
-            module_logger.info("Bad enable password!")
-            self._enablepw = None
+        if outputs is None:
+            for change in transaction:
+                change.fail("Bad enable password")
+            return
+        # Anything the switch complained about
+        for change in transaction:
+            output = "".join(outputs[: len(change.commands)])
+            outputs = outputs[len(change.commands) :]
+            m = _CONFIG_ERROR.search(output)
+            if m:
+                change.fail(m.group(0).strip())
+
+        # Read back what the changes were about, giving PoE as long to settle
+        # as set_power does
+        power = [change.value for change in transaction if change.kind == "power"]
+        if power:
+            delay = max(delay, 20 if any(power) else 15)
+        module_logger.info("Delaying %g seconds for switch to settle." % delay)
+        time.sleep(delay)
+        if any(change.kind == "move" for change in transaction):
+            self.update(incremental=True)
+        else:
+            self.update_ports(sorted({change.port for change in transaction}), delay=0)
+        # Not all switch types have their port names surveyed
+        names = self._surveyer()._lbl_cmd is not None
+        for change in transaction:
+            if change.ok is not None:
+                continue
+            if change.kind == "move" and self.find_port(change.port) != change.value:
+                change.fail("Port is on VLAN {:}".format(self.find_port(change.port)))
+            elif (
+                change.kind == "name"
+                and names
+                and self._labels.get(change.port, "") != change.value
+            ):
+                change.fail('Port name is "{:}"'.format(self._labels.get(change.port)))
+            elif change.kind == "power" and not self._power_is(
+                change.port, change.value
+            ):
+                change.fail(
+                    'PoE is "{:}"'.format(self._power.get(change.port, (None,))[0])
+                )
+            else:
+                change.ok = True
+        for change in transaction:
+            if not change.ok:
+                module_logger.warning("{!r} failed: {:}".format(change, change.error))
 
-        module_logger.info("Finished running switch commands")
+    def _power_is(self, port, state):
+        """
+        Whether the PoE of port reads back as turned off (0) or on (1).
+
+        This is the admin state, the oper state of a port that is turned on
+        with nothing connected is "Off" too.
+        """
+        admin, _ = self._power.get(port, (None, None))
+        return admin == ("Off" if state == 0 else "On")
+
+    def set_power(self, port, state):
+        module_logger.info(
+            "Turning %s power for %s" % ("off" if state == 0 else "on", port)
+        )
+        commands = self._power_commands(port, state)
+        if self._transaction is not None:
+            self._transaction.add("power", port, state, commands)
+            return
+        self._configure(commands)
         self.update_port(port, 15 if state == 0 else 20)
 
     def labels(self):
@@ -204,33 +347,18 @@ class Switch:
         """
         return self._labels
 
-    def set_name(self, port, name):
-        # This is a privileged command: do we need/have the enable password?
-        if not self._enablepw and self._surveyer().check_mode(self.name):
-            self.get_enablepw()
-
-        commands = ["config terminal", "interface ethernet %s" % port]
+    def _name_commands(self, port, name):
         if name == "":
-            commands.extend(["no port-name", "exit", "exit"])
-        else:
-            commands.extend(["port-name %s" % name, "exit", "exit"])
-        # Run commands
+            return ["interface ethernet %s" % port, "no port-name", "exit"]
+        return ["interface ethernet %s" % port, "port-name %s" % name, "exit"]
+
+    def set_name(self, port, name):
         module_logger.info('Setting port-name for %s to "%s"' % (port, name))
-        cmd = self._surveyer()._cmd_runner(
-            self._user,
-            self._pw,
-            self._enablepw,
-            self._port,
-            commands,
-            timeout=self.timeout,
-            priv=True,
-        )
-        try:
-            out_code, resp = cmd.run(self.name)
-        except IOError:
-            module_logger.info("Bad enable password!")
-            self._enablepw = None
-        module_logger.info("Finished running switch commands")
+        commands = self._name_commands(port, name)
+        if self._transaction is not None:
+            self._transaction.add("name", port, name, commands)
+            return
+        self._configure(commands)
         self.update_port(port)
 
     def find_vlans(self, plist):
@@ -269,11 +397,23 @@ class Switch:
         """
         Load the ports found on each VLAN
         """
-        self._vlan = []
         # Load vlan information
         module_logger.info("Loading port locations from switch")
-        vlan = self._surveyer().show_vlan(self.name)
+        self._set_ports(self._surveyer().show_vlan(self.name))
 
+    def _set_ports(self, vlan, incremental=False):
+        """
+        Rebuild our Vlan objects from a {vlan_no: [ports]} table
+
+        With incremental, the Vlan objects and the devices found on them are
+        kept if the table hasn't changed.
+        """
+        if incremental and vlan == {v._vlan_no: v.ports for v in self._vlan}:
+            module_logger.debug("VLAN layout unchanged")
+            return
+        self._vlan = []
+        # The devices have to be found again on the new Vlan objects
+        self._mac = {}
         # Organize
         self._portmap = {}
         for vlan_no, ports in vlan.items():
@@ -284,53 +424,160 @@ class Switch:
             for p in ports:
                 self._portmap[p] = vlan_no
 
-    def find_connections(self):
+    def find_connections(self, incremental=False, vlan_no=None):
         """
         Load the devices connected to the switch
+
+        :param incremental: Only apply what changed since the MAC addresses
+                            were last loaded, instead of starting over
+        :type  incremental: bool
+
+        :param vlan_no: Only request the MAC addresses of this VLAN from the
+                        switch. This is always incremental
+        :type  vlan_no: str
+
+        :raises ValueError: If the switch has no VLAN vlan_no
+        """
+        if vlan_no:
+            vlan = getattr(self, self._vlan_alias.format(vlan_no), None)
+            if vlan is None:
+                raise ValueError(
+                    "VLAN {:} is not on switch {:}".format(vlan_no, self.name)
+                )
+        module_logger.info("Requesting mac addresses from switch")
+        mac = self._surveyer().show_mac(self.name, vlan_no=vlan_no)
+        if vlan_no:
+            self._update_connections(mac, ports=set(vlan.ports))
+        elif incremental:
+            self._update_connections(mac)
+        else:
+            self._set_connections(mac)
+
+    def _set_connections(self, mac):
+        """
+        Sort a {port: mac_address} table into the devices of each VLAN
         """
         for vlan in self._vlan:
             vlan._devices = {}
             vlan._unknown = {}
+        self._mac = {}
+        self._nodes = {}
+        self._update_connections(mac)
 
-        module_logger.info("Requesting mac addresses from switch")
-        mac = self._surveyer().show_mac(self.name)
-        module_logger.info("Searching for mac addresses in sdfconfig")
-        for port, address in mac.items():
-            module_logger.debug("Found {:} on port {:}.".format(port, address))
-            vlan_no = self.find_port(port)
-            if not vlan_no:
+    def _update_connections(self, mac, ports=None):
+        """
+        Apply the changes between a {port: mac_address} table and the one
+        last seen to the devices of each VLAN.
+
+        Only the MAC addresses that were added are looked up in sdfconfig, the
+        ones that moved port keep their device.  If ports is given, the table
+        only covers those ports, and whatever else it has, e.g. on the tagged
+        ports of a VLAN, is left out.
+        """
+        old = self._mac
+        if ports is not None:
+            old = {p: a for p, a in old.items() if p in ports}
+            mac = {p: a for p, a in mac.items() if p in ports}
+        removed = {p: a for p, a in old.items() if mac.get(p) != a}
+        added = {p: a for p, a in mac.items() if old.get(p) != a}
+        moved = set(removed.values()) & set(added.values())
+        module_logger.info(
+            "{:} mac addresses added, {:} removed and {:} moved".format(
+                len(added) - len(moved), len(removed) - len(moved), len(moved)
+            )
+        )
+        for port, address in removed.items():
+            self._remove_connection(port, address, forget=address not in moved)
+        if added:
+            module_logger.info("Searching for mac addresses in sdfconfig")
+            self._lookup_nodes(
+                {a for p, a in added.items() if a not in moved and self.find_port(p)}
+            )
+        for port, address in added.items():
+            self._add_connection(port, address, lookup=False)
+        module_logger.info("Mac address processing complete")
+
+    def _lookup_nodes(self, addresses):
+        """
+        Find the sdfconfig names of many MAC addresses at once
+        """
+        if not addresses:
+            return
+        try:
+            hosts = get_hosts_for_macs(sorted(a.lower() for a in addresses))
+        except RuntimeError:
+            module_logger.error("sdfconfig is not configured for user")
+            hosts = {}
+        for address in addresses:
+            self._nodes[address] = hosts.get(address.lower())
+
+    def _add_connection(self, port, address, lookup=True):
+        """
+        Add the device with a MAC address to the VLAN of its port
+        """
+        module_logger.debug("Found {:} on port {:}.".format(address, port))
+        self._mac[port] = address
+        vlan_no = self.find_port(port)
+        if not vlan_no:
+            module_logger.debug(
+                "{:} is a tagged port, ignoring mac address".format(port)
+            )
+            return
+        vlan = getattr(self, self._vlan_alias.format(vlan_no))
+        if lookup or address not in self._nodes:
+            try:
+                self._nodes[address] = get_host_for_mac(address.lower())
+            except (KeyError, RuntimeError):
                 module_logger.debug(
-                    "{:} is a tagged port, ignoring mac address".format(port)
-                )
-                pass
-            else:
-                # Find VLAN
-                vlan_name = self._vlan_alias.format(vlan_no)
-                vlan = getattr(self, vlan_name)
-                try:
-                    node = get_host_for_mac(address.lower())
-                    vlan._devices[node] = {
-                        "ethernet_address": address,
-                        "port": port,
-                        "vlan": vlan_no,
-                    }
-                except (KeyError, RuntimeError):
-                    module_logger.debug(
-                        "Unable to find sdfconfig entry for {:} on port {:}".format(
-                            address, port
-                        )
+                    "Unable to find sdfconfig entry for {:} on port {:}".format(
+                        address, port
                     )
-                    vlan._unknown[address] = {"port": port, "vlan": vlan_no}
-        module_logger.info("Mac address processing complete")
+                )
+                self._nodes[address] = None
+        node = self._nodes[address]
+        if node is None:
+            vlan._unknown[address] = {"port": port, "vlan": vlan_no}
+        else:
+            vlan._devices[node] = {
+                "ethernet_address": address,
+                "port": port,
+                "vlan": vlan_no,
+            }
 
-    def update(self):
+    def _remove_connection(self, port, address, forget=True):
+        """
+        Remove the device with a MAC address from the VLAN of its port
+        """
+        module_logger.debug("Lost {:} on port {:}.".format(address, port))
+        del self._mac[port]
+        node = self._nodes.pop(address, None) if forget else self._nodes.get(address)
+        vlan_no = self.find_port(port)
+        if not vlan_no:
+            return
+        vlan = getattr(self, self._vlan_alias.format(vlan_no))
+        if node is not None and vlan._devices.get(node, {}).get("port") == port:
+            del vlan._devices[node]
+        elif vlan._unknown.get(address, {}).get("port") == port:
+            del vlan._unknown[address]
+
+    def update(self, incremental=False):
         """
         Load both the current port locations as well as the connected devices.
+
+        All of the tables are requested from the switch in a single session.
+        With incremental, only the MAC addresses that changed since the last
+        update are looked up, which makes refreshing a switch where little
+        happened cheap.
         """
-        self.load_ports()
-        self.find_connections()
-        self.load_power()
-        self.load_labels()
+        module_logger.info("Loading VLAN, MAC, PoE and port-name tables from switch")
+        snapshot = self._surveyer().collect_all(self.name)
+        self._set_ports(snapshot["vlan"], incremental=incremental)
+        if incremental:
+            self._update_connections(snapshot["mac"])
+        else:
+            self._set_connections(snapshot["mac"])
+        self._power = snapshot["power"]
+        self._labels = snapshot["labels"]
         module_logger.info("Switch information updated")
 
     def update_port(self, port, delay=0.5):
@@ -339,51 +586,46 @@ class Switch:
 
         We'll assume the VLAN hasn't changed... that needs a full layout.
         """
+        self.update_ports([port], delay=delay)
+
+    def update_ports(self, ports, delay=0.5):
+        """
+        Update the power, port-name, and mac address information for many ports.
+
+        The ports are all requested from the switch in a single session, and
+        the GUI is told about them at once.  As with update_port, we'll assume
+        the VLANs haven't changed.
+        """
         module_logger.info("Delaying %g seconds for switch to settle." % delay)
         time.sleep(delay)
-        module_logger.info("Updating switch information for port %s" % port)
-        (pwr, name, address) = self._surveyer().update_port(self.name, port)
-        self._power[port] = pwr
-        self._labels[port] = name
-        vlan_no = self.find_port(port)
-        if vlan_no:
-            vlan_name = self._vlan_alias.format(vlan_no)
-            vlan = getattr(self, vlan_name)
-            dname = ""
-            if address == "":
-                found = False
-                for node, d in vlan._devices.items():
-                    if d["port"] == port:
-                        del vlan._devices[node]
-                        found = True
-                        break
-                if not found:
-                    for a, d in vlan._unknown.items():
-                        if d["port"] == port:
-                            del vlan._unknown[a]
-                            break
-            else:
-                try:
-                    node = get_host_for_mac(address.lower())
-                    dname = node
-                    vlan._devices[node] = {
-                        "ethernet_address": address,
-                        "port": port,
-                        "vlan": vlan_no,
-                    }
-                except (KeyError, RuntimeError):
-                    module_logger.debug(
-                        "Unable to find sdfconfig entry for {:} on port {:}".format(
-                            address, port
-                        )
-                    )
-                    vlan._unknown[address] = {"port": port, "vlan": vlan_no}
-            self.update_port_gui(port, vlan_no, address, name, dname, pwr)
+        module_logger.info("Updating switch information for %d ports" % len(ports))
+        states = self._surveyer().update_ports(self.name, ports)
+        mac = {}
+        for port, (pwr, name, address) in states.items():
+            self._power[port] = pwr
+            self._labels[port] = name
+            if address:
+                mac[port] = address
+        self._update_connections(mac, ports=set(ports))
+        updates = []
+        for port, (pwr, name, address) in states.items():
+            vlan_no = self.find_port(port)
+            if vlan_no:
+                dname = self._nodes.get(address) or ""
+                updates.append((port, vlan_no, address, name, dname, pwr[1]))
+        self.update_ports_gui(updates)
         module_logger.info("Switch information updated")
 
     def update_port_gui(self, port, vlan, mac, name, dname, pwr):
         pass
 
+    def update_ports_gui(self, updates):
+        """
+        Show the (port, vlan, mac, name, dname, pwr) of each updated port.
+        """
+        for update in updates:
+            self.update_port_gui(*update)
+
     def load_power(self):
         module_logger.info("Loading Power over Ethernet information")
         self._power = self._surveyer().show_power(self.name)
@@ -497,6 +739,23 @@ class Switch:
 
         return vlan, subnet
 
+    def find_subnets_for_hosts(self, hosts):
+        """
+        Return the correct vlan and subnet name for many hosts
+
+        The hosts are looked up in sdfconfig at the same time.
+
+        :param hosts: The names of the hosts
+        :type  hosts: list
+
+        :return: The (vlan number, subnet) of each host, in order
+        :rtype: list
+        """
+        subnets = get_subnets_for_hosts(hosts)
+        return [
+            (self.find_vlan_for_subnet(subnets[host]), subnets[host]) for host in hosts
+        ]
+
     def move_port(self, port, vlan_no, verify=True):
         """
         Move a port to a specified VLAN
@@ -523,11 +782,7 @@ class Switch:
 
         :rtype: bool
         """
-        # This is a privileged command: do we need/have the enable password?
-        if not self._enablepw and self._surveyer().check_mode(self.name):
-            self.get_enablepw()
-
-        commands = ["config terminal"]
+        commands = []
         vlan_no = str(vlan_no)
 
         # Find origin of port
@@ -563,33 +818,18 @@ class Switch:
                         "vlan {:}".format(vlan_no),
                         "untag ethernet {:}".format(port),
                         "exit",
-                        "exit",
                     ]
                 )
             else:
                 module_logger.error("VLAN {:} is not on this switch".format(vlan_no))
                 return False
 
-        else:
-            commands.extend(["exit"])
+        if self._transaction is not None:
+            self._transaction.add("move", port, vlan_no, commands)
+            return True
 
         # Run commands
-        cmd = self._surveyer()._cmd_runner(
-            self._user,
-            self._pw,
-            self._enablepw,
-            self._port,
-            commands,
-            timeout=self.timeout,
-            priv=True,
-        )
-
-        try:
-            out_code, resp = cmd.run(self.name)
-        except IOError:
-            module_logger.info("Bad enable password!")
-            self._enablepw = None
-        module_logger.info("Finished running switch commands")
+        self._configure(commands)
 
         if not verify:
             return True
@@ -674,8 +914,16 @@ class Switch:
         :return: A list of devices on the wrong subnet
         :rtype: list
         """
+        # Look up the subnets of the devices on every VLAN at once
+        try:
+            host_subnets = get_subnets_for_hosts(
+                [device for device in self.devices if device.strip()]
+            )
+        except RuntimeError:
+            module_logger.error("sdfconfig is not configured for user")
+            return []
         misplaced = []
-        [misplaced.extend(vlan.survey()) for vlan in self._vlan]
+        [misplaced.extend(vlan.survey(host_subnets)) for vlan in self._vlan]
         return misplaced
 
     def auto_configure(self):
@@ -690,23 +938,26 @@ class Switch:
         misplaced = self.survey()
         if not misplaced:
             return
-        for device in misplaced:
-            module_logger.info("Attempting to move {:}".format(device))
-            vlan, subnet = self.find_subnet_for_host(device)
-            if vlan:
-                verify = self.move_device(device, subnet=subnet, verify=False)
-                if not verify:
+        # Make all the moves in one session
+        with self.transaction():
+            targets = self.find_subnets_for_hosts(misplaced)
+            for device, (vlan, subnet) in zip(misplaced, targets):
+                module_logger.info("Attempting to move {:}".format(device))
+                if vlan:
+                    verify = self.move_device(device, subnet=subnet, verify=False)
+                    if not verify:
+                        module_logger.warning(
+                            "Unable to move device {:} to subnet {:}".format(
+                                device, subnet
+                            )
+                        )
+                else:
                     module_logger.warning(
-                        "Unable to move device {:} to subnet {:}".format(device, subnet)
+                        "Device {:} can not be moved to the subnet "
+                        "{:} because it is not present on the "
+                        "switch".format(device, subnet)
                     )
-            else:
-                module_logger.warning(
-                    "Device {:} can not be moved to the subnet "
-                    "{:} because it is not present on the "
-                    "switch".format(device, subnet)
-                )
 
-        self.update()
         unmoveable = self.survey()
         for device in unmoveable:
             module_logger.warning("{:} remains on the wrong subnet".format(unmoveable))
@@ -715,20 +966,8 @@ class Switch:
         """
         Save the current config to the switch so that it persists after next reboot.
         """
-        # This is a privileged command: do we need/have the enable password?
-        if not self._enablepw and self._surveyer().check_mode(self.name):
-            self.get_enablepw()
-
         commands = ["write memory"]
-        cmd = self._surveyer()._cmd_runner(
-            self._user,
-            self._pw,
-            self._enablepw,
-            self._port,
-            commands,
-            timeout=self.timeout,
-            priv=True,
-        )
+        cmd = self._privileged_runner(commands)
         try:
             out_code, resp = cmd.run(self.name)
         except IOError:
@@ -891,11 +1130,64 @@ class Switch:
             raise ValueError("{:} is not a valid switch type".format(self.switch_type))
 
         surveyer = survey_type(
-            self._user, self._pw, self._enablepw, port=self._port, timeout=self.timeout
+            self._user,
+            self._pw,
+            self._enablepw,
+            port=self._port,
+            timeout=self.timeout,
+            pool=self._pool,
+            cache=self._cache,
         )
         return surveyer
 
 
+class Change:
+    """
+    A change queued by a Switch transaction.
+
+    :param kind: "power", "name" or "move"
+    :param port: The port changed
+    :param value: The power state, port name or VLAN number
+    :param commands: The config commands making the change
+
+    ok is None until the transaction has run, then whether the switch took
+    the change and it was read back; if not error says why.
+    """
+
+    def __init__(self, kind, port, value, commands):
+        self.kind = kind
+        self.port = port
+        self.value = value
+        self.commands = commands
+        self.ok = None
+        self.error = ""
+
+    def fail(self, error):
+        self.ok = False
+        self.error = error
+
+    def __repr__(self):
+        return "Change({:}, {:}, {!r})".format(self.kind, self.port, self.value)
+
+
+class Transaction(list):
+    """
+    The Changes queued by Switch.transaction, in order.
+    """
+
+    def add(self, kind, port, value, commands):
+        change = Change(kind, port, value, commands)
+        self.append(change)
+        return change
+
+    @property
+    def failed(self):
+        """
+        The changes that didn't work.
+        """
+        return [change for change in self if change.ok is False]
+
+
 class Vlan:
     _devices = {}
 
@@ -915,6 +1207,7 @@ class Vlan:
     def __init__(self, vlan_no, ports, switch=None):
         self._vlan_no = vlan_no
         self._switch = switch
+        self._devices = {}
         self._unknown = {}
         self._nodes = []
         self.ports = ports
@@ -962,7 +1255,7 @@ class Vlan:
             module_logger.critical("Unable to locate subnet JSON file")
             return None
 
-    def survey(self):
+    def survey(self, host_subnets=None):
         """
         Find devices on this VLAN who belong to the wrong subnet
 
@@ -971,6 +1264,11 @@ class Vlan:
         name of the subnet associated with the VLAN to the information in
         sdfconfig.
 
+        Parameters
+        host_subnets : dict, optional
+            {hostname: subnet} already looked up for the devices, as
+            Switch.survey does for all of its VLANs at once
+
         Returns
         devices : list[str]
             A list of devices on the wrong subnet
@@ -978,15 +1276,16 @@ class Vlan:
         misplaced = []
         subnet = self.subnet
 
-        for device in self.devices:
-            if not device.strip():
-                # No hostname information...
-                continue
+        # No hostname information for blank devices
+        devices = [device for device in self.devices if device.strip()]
+        if host_subnets is None:
             try:
-                host_subnet = get_subnet_for_host(device)
+                host_subnets = get_subnets_for_hosts(devices)
             except RuntimeError:
                 module_logger.error("sdfconfig is not configured for user")
                 return []
+        for device in devices:
+            host_subnet = host_subnets[device]
             if host_subnet != subnet:
                 module_logger.warning(
                     "{:} is not on the correct subnet, it should be on {:}".format(
@@ -0,0 +1,31 @@
+"""
+The asyncio command runners, without a switch.
+"""
+
+import asyncio
+
+import pytest
+
+from ..survey import aio, command
+
+
+def runner(deadline):
+    runner = aio.AsyncCommandRunner(
+        "admin", "pw", None, 22, ["show version"], "%s%s", "\n"
+    )
+    runner.deadline = deadline
+    return runner
+
+
+async def timing_out(host):
+    raise asyncio.TimeoutError
+
+
+@pytest.mark.parametrize(
+    "deadline, error", [(None, asyncio.TimeoutError), (5, command.DeadlineExceeded)]
+)
+def test_run_each_timeout(deadline, error):
+    r = runner(deadline)
+    r._run_each = timing_out
+    with pytest.raises(error):
+        asyncio.run(r.run_each("switch-test"))
@@ -0,0 +1,43 @@
+"""
+The line splitting of the command runners.
+"""
+
+import collections
+import socket
+import threading
+import time
+
+import pytest
+
+from ..survey import command
+
+
+def reader():
+    reader = command.PromptReader()
+    reader._rbuffer = bytearray()
+    reader._lines = collections.deque()
+    return reader
+
+
+def test_undecodable_bytes():
+    # Latin-1 in a port description mustn't end the session
+    r = reader()
+    r._feed(b"caf\xe9\r\nport caf\xe9")
+    assert r._next_line() == "caf\ufffd\r\n"
+    assert r._flush_partial() == "port caf\ufffd"
+
+
+def test_close_while_connecting():
+    # A switch that accepts the connection but never sends its banner
+    with socket.socket() as server:
+        server.bind(("127.0.0.1", 0))
+        server.listen()
+        port = server.getsockname()[1]
+        runner = command.RuckusCommandRunner(
+            "admin", "pw", None, port, ["show version"]
+        )
+        threading.Timer(0.2, runner.close).start()
+        started = time.monotonic()
+        with pytest.raises(command.ConnectError):
+            runner.run("127.0.0.1")
+        assert time.monotonic() - started < 5
@@ -0,0 +1,37 @@
+"""
+The surveyers against fake switches served on one host.
+"""
+
+import pytest
+
+from ..survey import survey
+from ..survey.cache import ResultCache
+from ..survey.fakeswitch import FakeSwitch, serve_fleet
+from ..survey.pool import SessionPool
+
+
+@pytest.fixture
+def servers():
+    switches = [FakeSwitch("ruckus", macs=20, seed=seed) for seed in (1, 2)]
+    servers = serve_fleet(switches)
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def test_switches_on_one_host(servers):
+    # The switches only differ by their port, the sessions and the output
+    # of one mustn't be used for the other
+    pool = SessionPool()
+    cache = ResultCache(ttl=60)
+    tables = []
+    for server in servers:
+        surveyer = survey.RuckusSurveyer(
+            "admin", "pw", None, port=server.port, timeout=5, pool=pool, cache=cache
+        )
+        tables.append(surveyer.show_mac("127.0.0.1"))
+    pool.close()
+    for server, table in zip(servers, tables):
+        surveyer = survey.RuckusSurveyer("admin", "pw", None, port=server.port)
+        assert surveyer.show_mac("127.0.0.1") == table
+    assert tables[0] != tables[1]
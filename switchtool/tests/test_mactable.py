@@ -0,0 +1,30 @@
+"""
+The fleet wide MAC address table, joined against sdfconfig.
+"""
+
+from ..survey.mactable import HostIndex, MacTable
+
+SNAPSHOTS = {
+    "switch-1": {
+        "vlan": {"1": ["1/1/1"], "100": ["1/1/2", "1/1/3"]},
+        "mac": {
+            "1/1/1": "00:00:00:00:00:01",
+            "1/1/2": "00:00:00:00:00:02",
+            "1/1/3": "00:00:00:00:00:03",
+        },
+    },
+}
+HOSTS = {
+    "00:00:00:00:00:01": ("host-1", "PCDSN-CDS"),
+    "00:00:00:00:00:02": ("host-2", "PCDSN-CDS"),
+    "00:00:00:00:00:03": ("host-3", "PCDSN-DEV"),
+}
+
+
+def test_misplaced():
+    table = MacTable.from_snapshots(SNAPSHOTS)
+    # VLAN 1 has a null subnet, so host-1 on it isn't checked
+    misplaced = table.misplaced(HostIndex(HOSTS), {"1": None, "100": "PCDSN-CDS"})
+    assert [(entry.host, entry.subnet) for entry in misplaced] == [
+        ("host-3", "PCDSN-DEV")
+    ]
@@ -0,0 +1,75 @@
+"""
+The sdfconfig lookups, answered by a FakeBackend.
+"""
+
+import pytest
+
+from .. import sdfconfig
+from ..sdfbackend import FakeBackend, NotConfiguredError, NotFoundError
+from ..sdfindex import SdfconfigIndex
+
+RECORDS = [
+    {"Name": "host-1.pcdsn", "Ethernet Address": "00:00:00:00:00:01"},
+    {"Name": "host-2.pcdsn", "Ethernet Address": "00:00:00:00:00:02"},
+]
+
+
+class NoBatchBackend(FakeBackend):
+    """
+    A backend whose search for many MAC addresses at once fails.
+    """
+
+    def __init__(self, records=(), error=RuntimeError):
+        super().__init__(records)
+        self.error = error
+        self.batches = 0
+
+    def hosts_for_macs(self, mac_addrs):
+        self.batches += 1
+        raise self.error("sdfconfig search failed")
+
+
+@pytest.fixture
+def backend():
+    backend = NoBatchBackend(RECORDS)
+    sdfconfig.set_backend(backend)
+    yield backend
+    sdfconfig.set_backend(None)
+
+
+def test_hosts_for_macs_batch_failure(backend):
+    macs = ["00:00:00:00:00:01", "00:00:00:00:00:02", "00:00:00:00:00:03"]
+    assert sdfconfig.get_hosts_for_macs(macs) == {
+        "00:00:00:00:00:01": "host-1",
+        "00:00:00:00:00:02": "host-2",
+    }
+    assert backend.batches == 1
+    # The failing search isn't tried again
+    sdfconfig.refresh(mac_addrs=macs)
+    backend.calls = 0
+    assert len(sdfconfig.get_hosts_for_macs(macs)) == 2
+    assert backend.batches == 1
+    assert backend.calls == 3
+
+
+def test_hosts_for_macs_not_configured(backend):
+    backend.error = NotConfiguredError
+    with pytest.raises(NotConfiguredError):
+        sdfconfig.get_hosts_for_macs(["00:00:00:00:00:01", "00:00:00:00:00:02"])
+
+
+def test_hosts_for_macs_batch_not_found(backend):
+    # A batch search answering nothing isn't taken as none of them existing
+    backend.error = NotFoundError
+    macs = ["00:00:00:00:00:01", "00:00:00:00:00:02"]
+    assert sdfconfig.get_hosts_for_macs(macs) == {}
+    assert sdfconfig.get_host_for_mac("00:00:00:00:00:01") == "host-1"
+    assert sdfconfig.get_hosts_for_macs(macs) == {"00:00:00:00:00:01": "host-1"}
+    assert backend.batches == 2
+
+
+def test_index_len():
+    # The MAC addresses, not the hosts with a subnet
+    macs = "00:00:00:00:00:03, 00:00:00:00:00:04"
+    index = SdfconfigIndex(RECORDS + [{"Name": "host-3", "Ethernet Address": macs}])
+    assert len(index) == 4
@@ -0,0 +1,85 @@
+"""
+Switch, with the surveyer and sdfconfig replaced by tables in memory.
+"""
+
+from unittest import mock
+
+import pytest
+
+from ..switch import switch as switch_module
+
+VLANS = {"100": ["1/1/1", "1/1/2"], "200": ["1/1/3"]}
+HOSTS = {
+    "00:00:00:00:00:01": "host-1",
+    "00:00:00:00:00:02": "host-2",
+    "00:00:00:00:00:03": "host-3",
+    "00:00:00:00:00:04": "host-4",
+}
+
+
+@pytest.fixture
+def surveyer():
+    surveyer = mock.Mock()
+    surveyer.show_vlan.return_value = VLANS
+    surveyer.show_power.return_value = {}
+    surveyer.show_labels.return_value = {}
+    surveyer._lbl_cmd = None
+    return surveyer
+
+
+@pytest.fixture
+def switch(surveyer, monkeypatch):
+    monkeypatch.setattr(switch_module, "ping", lambda name: True)
+    monkeypatch.setattr(switch_module.Switch, "_surveyer", lambda self: surveyer)
+    monkeypatch.setattr(
+        switch_module,
+        "get_hosts_for_macs",
+        lambda macs: {m: HOSTS[m] for m in macs if m in HOSTS},
+    )
+    switch = switch_module.Switch("switch-test", switch_type="ruckus")
+    switch._cache = None
+    switch.load_ports()
+    switch.load_power()
+    switch.load_labels()
+    return switch
+
+
+def test_find_connections_vlan(switch, surveyer):
+    surveyer.show_mac.return_value = {
+        "1/1/1": "00:00:00:00:00:01",
+        "1/1/3": "00:00:00:00:00:03",
+    }
+    switch.find_connections()
+    # VLAN 100 as seen on the switch, with host-4 on 1/1/3, which also
+    # carries VLAN 100 tagged, and on the uplink
+    surveyer.show_mac.return_value = {
+        "1/1/2": "00:00:00:00:00:01",
+        "1/1/3": "00:00:00:00:00:04",
+        "1/2/1": "00:00:00:00:00:04",
+    }
+    switch.find_connections(vlan_no="100")
+    assert switch.VLAN_100.devices == ["host-1"]
+    assert switch.VLAN_200.devices == ["host-3"]
+    assert switch.devices["host-1"]["port"] == "1/1/2"
+    assert switch.devices["host-3"]["port"] == "1/1/3"
+
+
+def test_find_connections_unknown_vlan(switch, surveyer):
+    with pytest.raises(ValueError):
+        switch.find_connections(vlan_no="300")
+    surveyer.show_mac.assert_not_called()
+
+
+def test_transaction_power(switch, surveyer, monkeypatch):
+    monkeypatch.setattr(switch_module.time, "sleep", lambda seconds: None)
+    switch._configure = lambda commands: [""] * len(commands)
+    # Turned on with nothing connected, and failed to turn off
+    surveyer.update_ports.return_value = {
+        "1/1/1": (("On", "Off"), "", ""),
+        "1/1/2": (("On", "On"), "", ""),
+    }
+    with switch.transaction() as changes:
+        switch.set_power("1/1/1", 1)
+        switch.set_power("1/1/2", 0)
+    assert [change.ok for change in changes] == [True, False]
+    assert switch.power()["1/1/1"] == ("On", "Off")
@@ -0,0 +1,384 @@
+"""
+The surveyer parsers, against output captured from the switches.
+
+The expected tables are what the regexes the surveyers used before the
+templates found in the same output, except where noted.
+"""
+
+import pytest
+
+from ..survey import survey
+
+RUCKUS_VLAN = """\
+Total PORT-VLAN entries: 3
+Maximum PORT-VLAN entries: 1024
+
+Legend: [Stk=Stack-Id, S=Slot]
+
+PORT-VLAN 1, Name DEFAULT-VLAN, Priority level0, Spanning tree Off
+ Untagged Ports: (U1/M1)  21  22  23  24
+ Untagged Ports: (U1/M2)   2   3   4
+   Tagged Ports: None
+   Uplink Ports: None
+ DualMode Ports: None
+ Mac-Vlan Ports: None
+     Monitoring: Disabled
+PORT-VLAN 100, Name PCDSN-TST, Priority level0, Spanning tree Off
+ Untagged Ports: (U1/M1)   1   2   3   4   5   6   7   8   9  10  11  12
+ Untagged Ports: (U1/M1)  13  14  15  16  17  18  19  20
+   Tagged Ports: (U1/M2)   1
+   Uplink Ports: None
+ DualMode Ports: None
+ Mac-Vlan Ports: None
+     Monitoring: Disabled
+PORT-VLAN 200, Name PCDSN-CTL, Priority level0, Spanning tree Off
+ Untagged Ports: None
+   Tagged Ports: (U1/M2)   1
+   Uplink Ports: None
+ DualMode Ports: None
+ Mac-Vlan Ports: None
+     Monitoring: Disabled
+"""
+
+FASTIRON_VLAN = """\
+Total PORT-VLAN entries: 2
+Maximum PORT-VLAN entries: 64
+
+Legend: [Stk=Stack-Unit, S=Slot]
+
+PORT-VLAN 1, Name DEFAULT-VLAN, Priority level0, Spanning tree Off
+ Untagged Ports: (U1/M1)  47  48
+ Untagged Ports: (U2/M1)  47  48
+   Tagged Ports: None
+   Uplink Ports: None
+ DualMode Ports: None
+     Monitoring: Disabled
+PORT-VLAN 300, Name PCDSN-DEV, Priority level0, Spanning tree Off
+ Untagged Ports: (U1/M1)   1   2   3
+ Untagged Ports: (U2/M1)   1   2
+   Tagged Ports: (U1/M2)   1   2
+   Uplink Ports: None
+ DualMode Ports: None
+     Monitoring: Disabled
+"""
+
+RUCKUS_MAC = """\
+Total active entries from all ports = 5
+MAC-Address     Port           Type          VLAN
+0050.56a1.2b3c  1/1/3          Dynamic       100
+0050.56a1.2b3d  1/1/4          Dynamic       100
+001b.2c3d.4e5f  1/2/1          Dynamic       200
+748e.f8d5.1e80  1/1/24         Static        1
+748e.f8d5.1e7f  CPU            Static        1
+"""
+
+RUCKUS_POWER = """\
+                    Power Capacity:       Total is 740000 mWatts. Current Free is 724600 mWatts.
+
+                    Power Allocations:    Requests Honored 3 times
+
+                                        --- Power(mWatts) ---
+ Port   Admin    Oper    ---Power(mWatts)---  PD Type  PD Class  Pri  Fault/
+        State    State   Consumed  Allocated                          Error
+--------------------------------------------------------------------------
+ 1/1/1  On       On      4200      15400      802.3af  Class 0   3    n/a
+ 1/1/2  On       Off     0         0          n/a      n/a       3    n/a
+ 1/1/3  Off      Off     0         0          n/a      n/a       3    n/a
+ 1/1/4  On       Non-PD  0         0          n/a      n/a       3    n/a
+--------------------------------------------------------------------------
+ Total                   4200      15400
+"""
+
+RUCKUS_LABELS = """\
+
+Port       Link    State   Dupl Speed Trunk Tag Pvid Pri MAC             Name
+1/1/1      Up      Forward Full 1G    None  No  100  0   748e.f8d5.1e80  hutch-cam-1
+1/1/2      Down    None    None None  None  No  100  0   748e.f8d5.1e81
+1/1/3      Up      Forward Full 1G    None  No  100  0   748e.f8d5.1e82  ioc-tst-01
+1/2/1      Up      Forward Full 10G   1     Yes N/A  0   748e.f8d5.1e99  uplink
+"""
+
+IOS_VLAN = """\
+
+VLAN Name                             Status    Ports
+---- -------------------------------- --------- -------------------------------
+1    default                          active    Gi0/5, Gi0/6, Gi0/7, Gi0/8
+                                                Gi0/9, Gi0/10
+100  PCDSN-TST                        active    Gi0/1, Gi0/2
+200  PCDSN-CTL                        active    Po1
+1002 fddi-default                     act/unsup
+1003 token-ring-default               act/unsup
+
+VLAN Type  SAID       MTU   Parent RingNo BridgeNo Stp  BrdgMode Trans1 Trans2
+---- ----- ---------- ----- ------ ------ -------- ---- -------- ------ ------
+1    enet  100001     1500  -      -      -        -    -        0      0
+100  enet  100100     1500  -      -      -        -    -        0      0
+"""
+
+IOS_MAC = """\
+          Mac Address Table
+-------------------------------------------
+
+Vlan    Mac Address       Type        Ports
+----    -----------       --------    -----
+ All    0100.0ccc.cccc    STATIC      CPU
+ All    0100.0ccc.cccd    STATIC      CPU
+ 100    0050.56a1.2b3c    DYNAMIC     Gi0/1
+ 100    0050.56a1.2b3d    DYNAMIC     Gi0/2
+ 200    001b.2c3d.4e5f    DYNAMIC     Po1
+Total Mac Addresses for this criterion: 5
+"""
+
+EOS_VLAN = """\
+VLAN  Name                             Status    Ports
+----- -------------------------------- --------- -------------------------------
+1     default                          active    Cpu, Et47, Et48, PEt47, PEt48
+                                                 Po1, PPo1
+100   PCDSN-TST                        active    Cpu, Et1, Et2, Et3, Et4, Et5
+                                                 Et6, Et7, Et8, Et9, Et10
+101   PCDSN-CTL                        active    Et11, Et12, Et49/1
+4094  MLAG-PEER                        suspended Po1000
+"""
+
+EOS_MAC = """\
+          Mac Address Table
+------------------------------------------------------------------
+
+Vlan    Mac Address       Type        Ports      Moves   Last Move
+----    -----------       ----        -----      -----   ---------
+ 100    0050.56a1.2b3c    DYNAMIC     Et1        1       10 days, 2:03:04 ago
+ 100    0050.56a1.2b3d    DYNAMIC     Et2        1       3:01:02 ago
+ 101    001c.7300.0001    DYNAMIC     Po1        1       5 days, 1:00:00 ago
+ 101    001c.7300.0002    STATIC      Cpu
+Total Mac Addresses for this criterion: 3
+
+          Multicast Mac Address Table
+------------------------------------------------------------------
+
+Vlan    Mac Address       Type        Ports
+----    -----------       ----        -------
+Total Mac Addresses for this criterion: 0
+"""
+
+EOS_VLAN_JSON = """\
+{
+    "vlans": {
+        "1": {"name": "default", "status": "active", "dynamic": false,
+              "interfaces": {"Cpu": {"privatePromoted": false},
+                             "Ethernet47": {"privatePromoted": false},
+                             "PeerEthernet47": {"privatePromoted": false},
+                             "Port-Channel1": {"privatePromoted": false}}},
+        "101": {"name": "PCDSN-CTL", "status": "active", "dynamic": false,
+                "interfaces": {"Ethernet11": {"privatePromoted": false},
+                               "Ethernet49/1": {"privatePromoted": false}}},
+        "4094": {"name": "MLAG-PEER", "status": "suspended", "dynamic": false,
+                 "interfaces": {"Port-Channel1000": {"privatePromoted": false}}}
+    },
+    "sourceDetail": ""
+}
+"""
+
+EOS_POE_JSON = """\
+{
+    "poePorts": {
+        "Ethernet1": {"portPresent": true, "portState": "powered",
+                      "portPriority": "low", "pdClass": "class2",
+                      "grantedPower": 30.0, "grantedPowerType": "class",
+                      "power": 4.4, "voltage": 53.6, "current": 82.0},
+        "Ethernet2": {"portPresent": true, "portState": "detecting",
+                      "portPriority": "low", "pdClass": "",
+                      "grantedPower": 0.0, "grantedPowerType": "class",
+                      "power": 0.0, "voltage": 0.0, "current": 0.0},
+        "Ethernet3": {"portPresent": true, "portState": "disabled",
+                      "portPriority": "low", "pdClass": "",
+                      "grantedPower": 0.0, "grantedPowerType": "class",
+                      "power": 0.0, "voltage": 0.0, "current": 0.0},
+        "Ethernet4": {"portPresent": true, "portState": "fault",
+                      "portPriority": "low", "pdClass": "",
+                      "grantedPower": 0.0, "grantedPowerType": "class",
+                      "power": 0.0, "voltage": 0.0, "current": 0.0}
+    }
+}
+"""
+
+
+def lines(text):
+    # As the command runners give them
+    return text.replace("\n", "\r\n").splitlines(True)
+
+
+def make(cls, **kwargs):
+    return cls("admin", "pw", "enablepw", **kwargs)
+
+
+@pytest.mark.parametrize(
+    "cls, text, expected",
+    [
+        (
+            survey.RuckusSurveyer,
+            RUCKUS_VLAN,
+            {
+                "1": [
+                    "1/1/21",
+                    "1/1/22",
+                    "1/1/23",
+                    "1/1/24",
+                    "1/2/2",
+                    "1/2/3",
+                    "1/2/4",
+                ],
+                # Only the untagged ports, not the trunk
+                "100": ["1/1/%d" % n for n in range(1, 21)],
+                "200": [],
+            },
+        ),
+        (
+            survey.BrocadeSurveyer,
+            FASTIRON_VLAN,
+            {
+                "1": ["1/1/47", "1/1/48", "2/1/47", "2/1/48"],
+                "300": ["1/1/1", "1/1/2", "1/1/3", "2/1/1", "2/1/2"],
+            },
+        ),
+        (
+            # The old port regex, "Gi0/[\d]{1:2}", found no ports at all
+            survey.CiscoSurveyer,
+            IOS_VLAN,
+            {
+                "1": ["Gi0/5", "Gi0/6", "Gi0/7", "Gi0/8", "Gi0/9", "Gi0/10"],
+                "100": ["Gi0/1", "Gi0/2"],
+                "200": [],
+            },
+        ),
+        (
+            # The old port regex also found "Et47" in "PEt47", and "Et49" in
+            # "Et49/1"
+            survey.AristaSurveyer,
+            EOS_VLAN,
+            {
+                "1": ["Et47", "Et48"],
+                "100": ["Et%d" % n for n in range(1, 11)],
+                "101": ["Et11", "Et12", "Et49/1"],
+            },
+        ),
+    ],
+)
+def test_parse_vlan(cls, text, expected):
+    kwargs = {"structured": False} if cls is survey.AristaSurveyer else {}
+    assert make(cls, **kwargs)._parse_vlan(lines(text)) == expected
+
+
+def test_parse_vlan_json():
+    surveyer = make(survey.AristaSurveyer)
+    assert surveyer._parse_vlan(lines(EOS_VLAN_JSON)) == {
+        "1": ["Et47"],
+        "101": ["Et11", "Et49/1"],
+    }
+
+
+@pytest.mark.parametrize(
+    "cls, text, expected",
+    [
+        (
+            survey.RuckusSurveyer,
+            RUCKUS_MAC,
+            {
+                "1/1/3": "00:50:56:a1:2b:3c",
+                "1/1/4": "00:50:56:a1:2b:3d",
+                "1/2/1": "00:1b:2c:3d:4e:5f",
+            },
+        ),
+        (
+            # The old regex kept the "\r" at the end of the port
+            survey.CiscoSurveyer,
+            IOS_MAC,
+            {
+                "Gi0/1": "00:50:56:a1:2b:3c",
+                "Gi0/2": "00:50:56:a1:2b:3d",
+                "Po1": "00:1b:2c:3d:4e:5f",
+            },
+        ),
+        (
+            survey.AristaSurveyer,
+            EOS_MAC,
+            {
+                "Et1": "00:50:56:a1:2b:3c",
+                "Et2": "00:50:56:a1:2b:3d",
+                "Po1": "00:1c:73:00:00:01",
+            },
+        ),
+    ],
+)
+def test_parse_mac(cls, text, expected):
+    kwargs = {"structured": False} if cls is survey.AristaSurveyer else {}
+    assert make(cls, **kwargs)._parse_mac(lines(text)) == expected
+
+
+def test_parse_power():
+    surveyer = make(survey.RuckusSurveyer)
+    assert surveyer._parse_power(lines(RUCKUS_POWER)) == {
+        "1/1/1": ("On", "On"),
+        "1/1/2": ("On", "Off"),
+        "1/1/3": ("Off", "Off"),
+        "1/1/4": ("On", "Non-PD"),
+    }
+
+
+def test_parse_power_json():
+    surveyer = make(survey.AristaSurveyer)
+    assert surveyer._parse_power(lines(EOS_POE_JSON)) == {
+        "Et1": ("On", "On"),
+        "Et2": ("On", "Off"),
+        "Et3": ("Off", "Off"),
+        "Et4": ("On", "Off"),
+    }
+
+
+def test_update_ports(monkeypatch):
+    surveyer = make(survey.RuckusSurveyer)
+    outputs = {
+        "show mac-address ethernet 1/1/2": "",
+        "show interfaces brief ethernet 1/1/2": RUCKUS_LABELS,
+        "show inline power 1/1/2": RUCKUS_POWER,
+    }
+
+    def iter_each(host, cmds):
+        for i, cmd in enumerate(cmds):
+            for line in lines(outputs[cmd]):
+                yield i, line
+
+    monkeypatch.setattr(surveyer, "_iter_each", iter_each)
+    # Both states, PoE turned on with nothing connected reads "Off" too
+    assert surveyer.update_ports("switch", ["1/1/2"]) == {
+        "1/1/2": (("On", "Off"), "", "")
+    }
+    assert surveyer.update_port("switch", "1/1/2") == ("Off", "", "")
+
+
+def test_parse_labels():
+    # The old regex also took the header for a port named "Port"
+    surveyer = make(survey.RuckusSurveyer)
+    assert surveyer._parse_labels(lines(RUCKUS_LABELS)) == {
+        "1/1/1": "hutch-cam-1",
+        "1/1/3": "ioc-tst-01",
+        "1/2/1": "uplink",
+    }
+
+
+def test_port_key():
+    from ..switch.switch import Switch
+
+    ports = ["Et49/1", "Et10", "Et2", "Et50"]
+    assert sorted(ports, key=lambda p: Switch._portKey(None, p)) == [
+        "Et2",
+        "Et10",
+        "Et49/1",
+        "Et50",
+    ]
+    ports = ["1/2/1", "1/1/10", "1/1/2", "Gi0/1"]
+    assert sorted(ports, key=lambda p: Switch._portKey(None, p)) == [
+        "Gi0/1",
+        "1/1/2",
+        "1/1/10",
+        "1/2/1",
+    ]
@@ -16,6 +16,7 @@ class SwitchWidget(QtWidgets.QWidget):
     misplaced = pyqtSignal(str)
     updated = pyqtSignal()
     update_port = pyqtSignal(str, str, str, str, str, str)
+    update_ports = pyqtSignal(list)
 
     def __init__(
         self, switch, user="admin", pw=None, switch_type=None, timeout=1.0, parent=None
@@ -122,6 +123,7 @@ class SwitchWidget(QtWidgets.QWidget):
     def initial_update(self):
         self.updated.connect(self.refresh)
         self.update_port.connect(self.refresh_port)
+        self.update_ports.connect(self.refresh_ports)
         self._switch.update()
 
     def survey(self):
@@ -213,7 +215,7 @@ class SwitchWidget(QtWidgets.QWidget):
 
     @pyqtSlot()
     def do_update(self):
-        self._switch.update()
+        self._switch.update(incremental=True)
 
     @pyqtSlot(str, int)
     def do_set_power(self, port, state):
@@ -389,6 +391,16 @@ class SwitchWidget(QtWidgets.QWidget):
         self._complete.refresh_port(port, mac, name, dname, pwr)
         self._vlan[vlan].refresh_port(port, mac, name, dname, pwr)
 
+    @pyqtSlot(list)
+    def refresh_ports(self, updates):
+        # Repaint once, rather than for every port
+        self.setUpdatesEnabled(False)
+        try:
+            for update in updates:
+                self.refresh_port(*update)
+        finally:
+            self.setUpdatesEnabled(True)
+
     def select_vlan(self, vlan_no, port=None):
         """
         Select a VLAN in the tab
@@ -419,7 +431,9 @@ class SwitchWidget(QtWidgets.QWidget):
 
         if devices:
             ports = [self._switch.find_device(dev)[1] for dev in devices]
-            subnets = [self._switch.find_subnet_for_host(dev)[1] for dev in devices]
+            subnets = [
+                subnet for _, subnet in self._switch.find_subnets_for_hosts(devices)
+            ]
             devices = zip(devices, ports, subnets)
 
         dialog = dialogs.ConfigureDialog(devices, parent=self)
@@ -458,11 +472,11 @@ class PyQtSwitch(Switch):
             switch_type=switch_type,
         )
 
-    def update(self):
+    def update(self, incremental=False):
         """
         Update switch configuration and emit signal
         """
-        super(PyQtSwitch, self).update()
+        super(PyQtSwitch, self).update(incremental=incremental)
         if self.parent:
             self.parent.updated.emit()
 
@@ -470,6 +484,10 @@ class PyQtSwitch(Switch):
         if self.parent:
             self.parent.update_port.emit(port, vlan, mac, name, dname, pwr)
 
+    def update_ports_gui(self, updates):
+        if self.parent:
+            self.parent.update_ports.emit(updates)
+
     def get_enablepw(self):
         if isinstance(self.parent, SwitchWidget):
             self.parent.switch_log.info("Prompting for enable password")